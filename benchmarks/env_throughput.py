@@ -0,0 +1,232 @@
+"""
+Throughput of the Clue environments, to catch performance regressions.
+
+    python -m benchmarks.env_throughput run --out bench.json
+    python -m benchmarks.env_throughput compare baseline.json bench.json
+
+run plays each environment version with random legal actions from a fixed
+seed, timing observe(), legal_actions(), step() and reset() separately, and
+times the board's legal_positions() and build_distances(). observe() builds
+the action mask with legal_actions(), so observe_us includes it: legal_actions
+is that part of the observation timed again on its own. The results are
+written as JSON, with the environment and machine they were measured on, and
+run exits with status 1 if any version failed. v0 fails on its first game, so
+it's only measured if asked for with --versions.
+
+compare lists each metric of two runs (or of a baseline and a fresh run) and
+exits with status 1 if any got worse by more than --threshold. Metrics ending
+in _per_sec are better when higher, the times (_us, microseconds) when lower,
+and the change is shown as positive when it is an improvement.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, cast
+
+import numpy as np
+
+from clue.env import clue_environment_v0, clue_environment_v1, clue_environment_v2
+from clue.map import Board
+
+# The versions don't share a base class beyond AECEnv, which has no .clue
+ENV_VERSIONS: Dict[str, Callable[..., Any]] = {
+    "v0": clue_environment_v0.ClueEnvironment,
+    "v1": clue_environment_v1.ClueEnvironment,
+    "v2": clue_environment_v2.ClueEnvironment,
+}
+# Those that play a game
+DEFAULT_VERSIONS = ("v1", "v2")
+
+MAX_EPISODE_STEPS = 500
+
+
+def time_env(version: str, steps: int, seed: int) -> Dict[str, float]:
+    """Play steps random legal actions, resetting whenever a game ends"""
+    env = ENV_VERSIONS[version](max_episode_steps=MAX_EPISODE_STEPS)
+    rng = np.random.default_rng(seed)
+    totals = {"observe": 0.0, "legal_actions": 0.0, "step": 0.0, "reset": 0.0}
+    resets = 0
+    games = 0
+
+    start = time.perf_counter()
+    before = time.perf_counter()
+    env.reset(seed=seed)
+    totals["reset"] += time.perf_counter() - before
+    resets += 1
+    for _ in range(steps):
+        before = time.perf_counter()
+        obs = cast(dict, env.observe(env.agent_selection))
+        after_observe = time.perf_counter()
+        # Again, as observe() has just done for the mask
+        env.clue.legal_actions()
+        after_legal = time.perf_counter()
+        action = int(rng.choice(np.flatnonzero(obs["action_mask"])))
+        before_step = time.perf_counter()
+        env.step(action)
+        after_step = time.perf_counter()
+        totals["observe"] += after_observe - before
+        totals["legal_actions"] += after_legal - after_observe
+        totals["step"] += after_step - before_step
+
+        if env.clue.game_over or any(env.truncations.values()):
+            games += 1
+            before = time.perf_counter()
+            env.reset()
+            totals["reset"] += time.perf_counter() - before
+            resets += 1
+    elapsed = time.perf_counter() - start
+
+    metrics = {
+        f"{version}.steps_per_sec": steps / elapsed,
+        f"{version}.games_per_sec": games / elapsed,
+        f"{version}.reset_us": totals["reset"] / resets * 1e6,
+    }
+    for name in ("observe", "legal_actions", "step"):
+        metrics[f"{version}.{name}_us"] = totals[name] / steps * 1e6
+    return metrics
+
+
+def best_time(function: Callable[[], object], number: int, repeat: int = 5) -> float:
+    """The fastest average time of a call, over repeat runs of number calls"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def time_board(map_csv: str, seed: int) -> Dict[str, float]:
+    board = Board(map_csv)
+    rng = np.random.default_rng(seed)
+    # Spread the players over the board so the moves aren't all from the start
+    board.restore_positions(
+        [int(p) for p in rng.choice(board.num_positions, size=6, replace=False)]
+    )
+
+    cases = [(player, throw) for player in range(6) for throw in range(1, 7)]
+
+    def legal_positions() -> None:
+        for player, throw in cases:
+            board.legal_positions(player, throw)
+
+    return {
+        "board.legal_positions_us": best_time(legal_positions, 10) / len(cases) * 1e6,
+        "board.build_distances_us": best_time(
+            lambda: board.build_distances(thru_room=False), 3
+        )
+        * 1e6,
+        "board.build_distances_thru_room_us": best_time(
+            lambda: board.build_distances(thru_room=True), 3
+        )
+        * 1e6,
+    }
+
+
+def run(steps: int, seed: int, versions: List[str]) -> Dict:
+    metrics: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
+    for version in versions:
+        try:
+            metrics.update(time_env(version, steps, seed))
+        # An old environment being broken is worth reporting, not stopping for
+        except Exception as e:
+            errors[version] = f"{type(e).__name__}: {e}"
+    metrics.update(time_board(clue_environment_v2.MAP_LOCATION, seed))
+    return {
+        "meta": {
+            "steps": steps,
+            "seed": seed,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "metrics": metrics,
+        "errors": errors,
+    }
+
+
+def regression(name: str, baseline: float, current: float) -> float:
+    """How much worse current is, as a fraction of the baseline"""
+    if baseline == 0:
+        return 0.0
+    change = (current - baseline) / baseline
+    return -change if name.endswith("_per_sec") else change
+
+
+def compare(
+    baseline: Dict, current: Dict, threshold: float
+) -> Tuple[List[str], List[str]]:
+    """A line per metric, and the names of those that regressed by more than
+    threshold. Metrics missing from the current run count as regressions."""
+    lines = []
+    regressed = []
+    for name, before in sorted(baseline["metrics"].items()):
+        after: Optional[float] = current["metrics"].get(name)
+        if after is None:
+            lines.append(f"{name:<40} {before:>12.1f} {'missing':>12}")
+            regressed.append(name)
+            continue
+        worse = regression(name, before, after)
+        flag = "  REGRESSED" if worse > threshold else ""
+        lines.append(f"{name:<40} {before:>12.1f} {after:>12.1f} {-worse:>+8.1%}{flag}")
+        if worse > threshold:
+            regressed.append(name)
+    return lines, regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="measure and write JSON")
+    run_parser.add_argument("--out", default="bench.json")
+
+    compare_parser = commands.add_parser("compare", help="compare two runs")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument(
+        "current", nargs="?", help="a saved run, or measure now if not given"
+    )
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+
+    for sub in (run_parser, compare_parser):
+        sub.add_argument("--steps", type=int, default=5000)
+        sub.add_argument("--seed", type=int, default=0)
+        sub.add_argument("--versions", default=",".join(DEFAULT_VERSIONS))
+    args = parser.parse_args()
+    versions = args.versions.split(",")
+
+    if args.command == "run":
+        results = run(args.steps, args.seed, versions)
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        for name, value in sorted(results["metrics"].items()):
+            print(f"{name:<40} {value:>12.1f}")
+        for version, error in results["errors"].items():
+            print(f"{version} failed: {error}")
+        if results["errors"]:
+            sys.exit(1)
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = run(args.steps, args.seed, versions)
+    lines, regressed = compare(baseline, current, args.threshold)
+    print(f"{'metric':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+    print("\n".join(lines))
+    if regressed:
+        print(f"{len(regressed)} metrics regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""
+Scripted agents that play from the CardState itself, for baselines and as
+opponents to train against.
+
+- RoomSweep: the simple human strategy - visit every room first, suggesting
+  cards it hasn't seen, then keep to the rooms it hasn't seen. It only uses
+  the cards it has been shown, ignoring everyone else's suggestions.
+- KnowledgeGreedy: heads for the nearest room it hasn't seen and suggests the
+  unseen cards it has asked about least, to learn a new card with each
+  suggestion.
+- DeductionAccuser: KnowledgeGreedy steered by what clue.deduction can infer
+  from the whole suggestion history, accusing as soon as that pins down the
+  envelope.
+- InformationSeeker: DeductionAccuser choosing suggestions, and rooms, by
+  their expected information gain.
+
+Every agent is a SeatPolicy, acting for a batch of games at once with numpy
+over the batch, and an in-engine callable:
+
+    agents = [RoomSweep(rng)] + [KnowledgeGreedy(rng)] * 5
+    while not state.game_over:
+        state.apply_action(agents[state.current_player](state))
+
+ScriptedBasePolicy adapts one to tianshou. It reads the games from the
+vector env, so the envs must be made with ClueEnvironment(env_index=i), i
+being the env's index in it.
+"""
+from abc import abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+from weakref import WeakKeyDictionary
+
+import numpy as np
+from tianshou.data import Batch
+from tianshou.env import BaseVectorEnv
+from tianshou.policy import BasePolicy
+
+from clue.deduction import Contradiction, Deduction, DeductionTracker
+from clue.information import NUM_SAMPLES, suggestion_gains
+from clue.policies import SeatPolicy
+from clue.posterior import ENVELOPE_SHAPE
+from clue.sampling import sample_weighted_deals
+from clue.state import (
+    DISPROVE_ACTION_OFFSET,
+    NO_ACCUSATION_ACTION,
+    NUM_MOVE_ACTIONS,
+    SUGGESTION_ACTION_OFFSET,
+    CardState,
+    StepKind,
+)
+
+PEOPLE = slice(0, 6)
+WEAPONS = slice(6, 12)
+ROOMS = slice(12, 21)
+
+
+def seen_cards(states: Sequence[CardState]) -> np.ndarray:
+    """Bx21, the cards each player to move has seen, including their own"""
+    seen: np.ndarray = np.stack(
+        [state.player_card_knowledge[state.current_player] for state in states]
+    ).any(axis=1)
+    return seen
+
+
+def own_suggestions(states: Sequence[CardState]) -> np.ndarray:
+    """Bx21, how often each card is in the recent suggestions of the player to
+    move"""
+    history = np.stack([state.suggestions for state in states])
+    suggestor = np.array([21 + state.current_player for state in states])
+    mine = history[np.arange(len(states)), :, suggestor]
+    counts: np.ndarray = np.einsum("bs,bsc->bc", mine, history[:, :, :21])
+    return counts
+
+
+def room_distances(states: Sequence[CardState]) -> np.ndarray:
+    """Bx9, the number of squares from each player to move to each room"""
+    return np.stack(
+        [
+            state.board.distances[
+                state.board.player_positions[state.current_player], :NUM_MOVE_ACTIONS
+            ]
+            for state in states
+        ]
+    )
+
+
+def nearest(
+    distances: np.ndarray, targets: np.ndarray, legal: np.ndarray
+) -> np.ndarray:
+    """The nearest legal target in each row, or nearest legal room if there
+    is none"""
+    legal = legal.astype(bool)
+    wanted = targets & legal
+    wanted[~wanted.any(axis=1)] = legal[~wanted.any(axis=1)]
+    actions: np.ndarray = np.argmin(np.where(wanted, distances, np.inf), axis=1)
+    return actions
+
+
+class ScriptedAgent(SeatPolicy):
+    """Plays a batch of games, each in the step kind of its player to move.
+    Subclasses choose moves and suggestions, and may override the others."""
+
+    def __init__(self, rng: Optional[np.random.Generator] = None) -> None:
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+    def __call__(self, state: CardState) -> int:
+        """The action for the player to move"""
+        masks = state.legal_actions()[None]
+        return int(self.act([state], np.empty((1, 0)), masks)[0])
+
+    def act(
+        self,
+        states: Sequence[CardState],
+        observations: np.ndarray,
+        masks: np.ndarray,
+    ) -> np.ndarray:
+        choosers: Dict[StepKind, Callable[[List[CardState], np.ndarray], Any]] = {
+            StepKind.MOVE: self.move,
+            StepKind.SUGGESTION: self.suggest,
+            StepKind.DISPROVE_SUGGESTION: self.disprove,
+            StepKind.ACCUSATION: self.accuse,
+        }
+        kinds = np.array([state.current_step_kind.value for state in states])
+        actions = np.zeros(len(states), dtype=np.int64)
+        for kind, choose in choosers.items():
+            rows = np.flatnonzero(kinds == kind.value)
+            if len(rows):
+                actions[rows] = choose([states[i] for i in rows], masks[rows])
+        return actions
+
+    @abstractmethod
+    def move(self, states: List[CardState], masks: np.ndarray) -> np.ndarray:
+        """The room to head for in each game"""
+
+    @abstractmethod
+    def suggest(self, states: List[CardState], masks: np.ndarray) -> np.ndarray:
+        """The suggestion to make in each game"""
+
+    def disprove(self, states: List[CardState], masks: np.ndarray) -> np.ndarray:
+        """Show a card the suggestor has already been shown, if there is one,
+        so they learn nothing new"""
+        shown = np.stack(
+            [
+                state.player_card_knowledge[
+                    state.get_last_suggestor(), state.current_player
+                ]
+                for state in states
+            ]
+        )
+        legal = masks[:, DISPROVE_ACTION_OFFSET:]
+        keys = legal * (2 + shown) + self.rng.random(legal.shape)
+        actions: np.ndarray = DISPROVE_ACTION_OFFSET + np.argmax(keys, axis=1)
+        return actions
+
+    def accuse(self, states: List[CardState], masks: np.ndarray) -> np.ndarray:
+        """Accuse when the cards seen leave only one possible answer"""
+        accusations = masks[:, SUGGESTION_ACTION_OFFSET:NO_ACCUSATION_ACTION]
+        return np.where(
+            accusations.sum(axis=1) == 1,
+            SUGGESTION_ACTION_OFFSET + np.argmax(accusations, axis=1),
+            NO_ACCUSATION_ACTION,
+        )
+
+    def unknown_cards(self, states: List[CardState]) -> np.ndarray:
+        """Bx21, the cards that might be in the envelope"""
+        unknown: np.ndarray = ~seen_cards(states)
+        return unknown
+
+    def suggestion(
+        self, masks: np.ndarray, person_keys: np.ndarray, weapon_keys: np.ndarray
+    ) -> np.ndarray:
+        """The suggestion of the highest keyed person and weapon in the room
+        the player is in"""
+        legal = masks[:, SUGGESTION_ACTION_OFFSET:NO_ACCUSATION_ACTION]
+        room = legal.reshape((-1,) + ENVELOPE_SHAPE)[:, 0, 0].argmax(axis=1)
+        person = np.argmax(person_keys + self.rng.random(person_keys.shape), axis=1)
+        weapon = np.argmax(weapon_keys + self.rng.random(weapon_keys.shape), axis=1)
+        actions: np.ndarray = SUGGESTION_ACTION_OFFSET + np.ravel_multi_index(
+            (person, weapon, room), ENVELOPE_SHAPE
+        )
+        return actions
+
+
+class RoomSweep(ScriptedAgent):
+    def move(self, states: List[CardState], masks: np.ndarray) -> np.ndarray:
+        unvisited = own_suggestions(states)[:, ROOMS] == 0
+        unseen = ~seen_cards(states)[:, ROOMS]
+        # Until every room has been visited, only go to the unvisited ones
+        targets = np.where(unvisited.any(axis=1, keepdims=True), unvisited, unseen)
+        return nearest(room_distances(states), targets, masks[:, :NUM_MOVE_ACTIONS])
+
+    def suggest(self, states: List[CardState], masks: np.ndarray) -> np.ndarray:
+        unseen = ~seen_cards(states)
+        return self.suggestion(masks, unseen[:, PEOPLE], unseen[:, WEAPONS])
+
+
+class KnowledgeGreedy(ScriptedAgent):
+    def move(self, states: List[CardState], masks: np.ndarray) -> np.ndarray:
+        targets = self.unknown_cards(states)[:, ROOMS]
+        return nearest(room_distances(states), targets, masks[:, :NUM_MOVE_ACTIONS])
+
+    def suggest(self, states: List[CardState], masks: np.ndarray) -> np.ndarray:
+        # Unknown cards first, then the ones asked about least. Ties are broken
+        #  by the random part of the keys, which is below 1.
+        asked = own_suggestions(states)
+        keys = self.unknown_cards(states) * (asked.max() + 1) - asked
+        return self.suggestion(masks, keys[:, PEOPLE], keys[:, WEAPONS])
+
+
+class DeductionAccuser(KnowledgeGreedy):
+    def __init__(self, rng: Optional[np.random.Generator] = None) -> None:
+        super().__init__(rng)
+        # Each player's deductions, kept up to date from turn to turn
+        self.tracker = DeductionTracker()
+
+    def unknown_cards(self, states: List[CardState]) -> np.ndarray:
+        candidates = np.array(
+            [
+                sum(deduction.envelope_candidates())
+                for deduction in self.deductions(states)
+            ]
+        )
+        unknown: np.ndarray = (candidates[:, None] >> np.arange(21)) & 1 == 1
+        return unknown
+
+    def accuse(self, states: List[CardState], masks: np.ndarray) -> np.ndarray:
+        """Accuse as soon as the envelope can be deduced"""
+        actions = np.full(len(states), NO_ACCUSATION_ACTION)
+        for row, deduction in enumerate(self.deductions(states)):
+            solution = deduction.solution()
+            if solution is not None:
+                accusation = SUGGESTION_ACTION_OFFSET + int(
+                    np.ravel_multi_index(solution, ENVELOPE_SHAPE)
+                )
+                if masks[row, accusation]:
+                    actions[row] = accusation
+        return actions
+
+    def deductions(self, states: List[CardState]) -> List[Deduction]:
+        return [self.tracker.get(state, state.current_player) for state in states]
+
+
+class InformationSeeker(DeductionAccuser):
+    """Makes the suggestion expected to tell it the most about the envelope
+    (see clue.information), and heads for the room with the best suggestion
+    for the turns it takes to get there.
+
+    The gains are worked out once a turn: those for the move are kept for the
+    suggestion, and for the next move if no one has suggested since. It's
+    still the slowest agent by far, a few ms a decision.
+    """
+
+    def __init__(
+        self,
+        rng: Optional[np.random.Generator] = None,
+        num_samples: int = NUM_SAMPLES // 4,
+    ) -> None:
+        super().__init__(rng)
+        self.num_samples = num_samples
+        # The last gains worked out for each game, and what they were for
+        self._gains: "WeakKeyDictionary[CardState, Tuple[tuple, np.ndarray]]" = (
+            WeakKeyDictionary()
+        )
+
+    def move(self, states: List[CardState], masks: np.ndarray) -> np.ndarray:
+        best = self.gains(states).max(axis=(1, 2))
+        # A roll of the die is 3.5 squares on average
+        turns = np.maximum(np.ceil(room_distances(states) / 3.5), 1)
+        legal = masks[:, :NUM_MOVE_ACTIONS].astype(bool)
+        actions: np.ndarray = np.argmax(np.where(legal, best / turns, -1), axis=1)
+        return actions
+
+    def suggest(self, states: List[CardState], masks: np.ndarray) -> np.ndarray:
+        legal = masks[:, SUGGESTION_ACTION_OFFSET:NO_ACCUSATION_ACTION]
+        # Small random keys break ties between suggestions worth the same
+        keys = self.gains(states).reshape(len(states), -1)
+        keys = keys + 1e-6 * self.rng.random(keys.shape)
+        actions: np.ndarray = SUGGESTION_ACTION_OFFSET + np.argmax(
+            np.where(legal, keys, -1), axis=1
+        )
+        return actions
+
+    def gains(self, states: List[CardState]) -> np.ndarray:
+        """Bx6x6x9 information gain of each suggestion for each player to move"""
+        return np.stack([self._state_gains(state) for state in states])
+
+    def _state_gains(self, state: CardState) -> np.ndarray:
+        player = state.current_player
+        # What the player knows, but not where anyone is
+        key = (
+            player,
+            state.suggestion_count,
+            state.suggestion_hash,
+            state.players_hash,
+            state.knowledge_hashes[player],
+        )
+        cached = self._gains.get(state)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        gains = np.zeros(ENVELOPE_SHAPE)
+        try:
+            deals, weights = sample_weighted_deals(
+                self.tracker.get(state, player), self.num_samples, self.rng
+            )
+            gains = suggestion_gains(deals, weights, player)
+        except Contradiction:
+            # No consistent deals turned up: every suggestion looks the same
+            pass
+        self._gains[state] = (key, gains)
+        return gains
+
+
+AGENTS: Dict[str, Callable[..., ScriptedAgent]] = {
+    "sweep": RoomSweep,
+    "knowledge": KnowledgeGreedy,
+    "deduction": DeductionAccuser,
+    "information": InformationSeeker,
+}
+
+
+class ScriptedBasePolicy(BasePolicy):
+    """A scripted agent as a tianshou policy. It doesn't learn.
+
+    The games are read from envs, by the "env_index" of the batch's info,
+    which ClueEnvironment(env_index=i) provides. Nothing but the index goes in
+    the info, so it works with any vector env and the replay buffer doesn't
+    hold on to the games. With a SubprocVectorEnv each game is copied over
+    from its process on every call.
+    """
+
+    def __init__(self, agent: ScriptedAgent, envs: BaseVectorEnv) -> None:
+        super().__init__()
+        self.agent = agent
+        self.envs = envs
+
+    def forward(
+        self,
+        batch: Batch,
+        state: Optional[Union[dict, Batch, np.ndarray]] = None,
+        **kwargs: Any,
+    ) -> Batch:
+        indices = np.asarray(batch.info.env_index).ravel().tolist()
+        # The AEC env of each PettingZooEnv
+        envs = self.envs.get_env_attr("env", indices)
+        states = [env.clue for env in envs]
+        masks = np.asarray(batch.obs.mask)
+        return Batch(act=self.agent.act(states, np.asarray(batch.obs.obs), masks))
+
+    def learn(self, batch: Batch, **kwargs: Any) -> Dict[str, float]:
+        return {}
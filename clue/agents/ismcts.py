@@ -0,0 +1,354 @@
+"""
+Information set Monte Carlo tree search (single observer ISMCTS).
+
+The player to move doesn't know the deal, so each iteration of the search
+starts by sampling a deal that is consistent with what they do know
+(clue.sampling) and loading it into a scratch copy of the game. The iteration
+then walks one shared tree - keyed on actions only - choosing among the actions
+that are legal in that deal, expands one new action and plays the game out
+with a cheap rollout policy.
+
+Because different deals allow different actions (e.g. which cards an opponent
+can show), a child is scored against the number of times it was available
+rather than the number of visits to its parent. Different deals can also put a
+different player on the move at the same node (whoever holds a suggested card
+disproves it), so each visit credits the player who actually chose the action.
+
+Searches can be split across processes: each worker gets a snapshot of the
+game, grows its own tree, and the root statistics are summed (root
+parallelisation).
+"""
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from clue.deduction import Deduction
+from clue.sampling import sample_deals
+from clue.state import (
+    NO_ACCUSATION_ACTION,
+    SUGGESTION_ACTION_OFFSET,
+    CardState,
+    CardStateSnapshot,
+    StepKind,
+)
+
+MAP_LOCATION = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "map49.csv"
+)
+
+# Total of the action statistics at the root: action -> (visits, reward)
+RootStats = Dict[int, Tuple[int, float]]
+
+
+@dataclass
+class SearchConfig:
+    # Stop after this many iterations, or this many seconds, whichever is first.
+    # With several workers both budgets apply to each worker.
+    iterations: Optional[int] = 1000
+    time_limit: Optional[float] = None
+    workers: int = 1
+    exploration: float = 0.7
+    # Steps to play out before scoring the game with evaluate()
+    max_depth: int = 60
+    # Accusations are only searched when there are at most this many left to
+    # choose from, otherwise the only option considered is not to accuse.
+    max_accusations: int = 4
+    # Deals are sampled this many at a time
+    deal_batch: int = 256
+
+
+@dataclass
+class SearchResult:
+    action: int
+    iterations: int
+    elapsed: float
+    visits: Dict[int, int] = field(default_factory=dict)
+    values: Dict[int, float] = field(default_factory=dict)
+
+    @property
+    def rollouts_per_second(self) -> float:
+        return self.iterations / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class Node:
+    __slots__ = ("children", "visits", "availability", "reward")
+
+    def __init__(self) -> None:
+        self.children: Dict[int, Node] = {}
+        self.visits = 0
+        self.availability = 0
+        self.reward = 0.0
+
+
+class ISMCTS:
+    def __init__(
+        self, config: Optional[SearchConfig] = None, seed: Optional[int] = None
+    ) -> None:
+        self.config = config if config is not None else SearchConfig()
+        self.rng = np.random.default_rng(seed)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def choose_action(self, state: CardState) -> int:
+        return self.search(state).action
+
+    def search(self, state: CardState) -> SearchResult:
+        """Search from the current player's point of view"""
+        start = time.perf_counter()
+        actions = candidate_actions(state, self.config.max_accusations)
+        if len(actions) == 1:
+            return SearchResult(actions[0], 0, time.perf_counter() - start)
+
+        snapshot = state.snapshot()
+        observer = state.current_player
+        seeds = self.rng.integers(2**32, size=self.config.workers)
+
+        if self.config.workers == 1:
+            scratch = state.clone()
+            scratch.should_log_actions = False
+            stats, iterations = _search(
+                scratch, snapshot, observer, self.config, int(seeds[0])
+            )
+        else:
+            pool = self._get_pool()
+            futures = [
+                pool.submit(_search_worker, snapshot, observer, self.config, int(seed))
+                for seed in seeds
+            ]
+            stats, iterations = {}, 0
+            for future in futures:
+                worker_stats, worker_iterations = future.result()
+                iterations += worker_iterations
+                for action, (count, reward) in worker_stats.items():
+                    total_count, total_reward = stats.get(action, (0, 0.0))
+                    stats[action] = (total_count + count, total_reward + reward)
+
+        visits = {action: count for action, (count, _) in stats.items()}
+        values = {
+            action: reward / count for action, (count, reward) in stats.items() if count
+        }
+        best = max(visits, key=lambda action: (visits[action], values.get(action, 0)))
+        return SearchResult(
+            action=best,
+            iterations=iterations,
+            elapsed=time.perf_counter() - start,
+            visits=visits,
+            values=values,
+        )
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.config.workers,
+                initializer=_init_worker,
+                initargs=(MAP_LOCATION,),
+            )
+        return self._pool
+
+
+def candidate_actions(state: CardState, max_accusations: int) -> List[int]:
+    """The legal actions worth searching"""
+    legal = state.legal_actions()
+    if state.current_step_kind == StepKind.ACCUSATION:
+        accusations = np.flatnonzero(
+            legal[SUGGESTION_ACTION_OFFSET:NO_ACCUSATION_ACTION]
+        )
+        if len(accusations) > max_accusations:
+            return [NO_ACCUSATION_ACTION]
+        return [int(a) + SUGGESTION_ACTION_OFFSET for a in accusations] + [
+            NO_ACCUSATION_ACTION
+        ]
+    return [int(a) for a in np.flatnonzero(legal)]
+
+
+def rollout_action(state: CardState, rng: np.random.Generator) -> int:
+    """Random play, except only accusing when there is no doubt"""
+    legal = state.legal_actions()
+    if state.current_step_kind == StepKind.ACCUSATION:
+        accusations = np.flatnonzero(
+            legal[SUGGESTION_ACTION_OFFSET:NO_ACCUSATION_ACTION]
+        )
+        if len(accusations) == 1:
+            return int(accusations[0]) + SUGGESTION_ACTION_OFFSET
+        return NO_ACCUSATION_ACTION
+    actions = np.flatnonzero(legal)
+    return int(actions[rng.integers(len(actions))])
+
+
+def evaluate(state: CardState) -> np.ndarray:
+    """The reward for each player: 1 for the winner, or for an unfinished game a
+    guess at each player's chances from how many cards they have seen"""
+    rewards = np.zeros(CardState.MAX_PLAYERS)
+    if state.winner is not None:
+        rewards[state.winner] = 1
+    elif not state.game_over:
+        seen = state.player_card_knowledge.any(axis=1).sum(axis=1)
+        still_playing = state.active_players * (1 - state.false_accusers)
+        # Being close to solving it matters much more than a card or two early on
+        rewards = 0.5 * (seen / 18) ** 2 * still_playing
+    return rewards
+
+
+def _search(
+    state: CardState,
+    root: CardStateSnapshot,
+    observer: int,
+    config: SearchConfig,
+    seed: int,
+) -> Tuple[RootStats, int]:
+    """Grow a tree from the root snapshot, using state as scratch space"""
+    dice, choices = np.random.SeedSequence(seed).spawn(2)
+    rng = np.random.default_rng(choices)
+    deadline = (
+        time.perf_counter() + config.time_limit
+        if config.time_limit is not None
+        else math.inf
+    )
+    state.restore(root)
+    state.seed(dice)
+    deduction = Deduction.from_card_state(state, observer)
+    others = [player for player in range(CardState.MAX_PLAYERS) if player != observer]
+
+    tree = Node()
+    deals = np.empty((0, 21))
+    iterations = 0
+    while (
+        config.iterations is None or iterations < config.iterations
+    ) and time.perf_counter() < deadline:
+        if iterations % config.deal_batch == 0:
+            deals = sample_deals(deduction, config.deal_batch, rng)
+
+        # What the other players have seen is hidden from the observer too, so
+        # they only know their own cards.
+        state.restore(root, restore_rng=False)
+        state.player_card_knowledge[others] = 0
+        state.load_deal(deals[iterations % config.deal_batch])
+
+        # Each node with the player who chose the action leading to it this time
+        path = [(tree, observer)]
+        node = tree
+        depth = 0
+        while not state.game_over and depth < config.max_depth:
+            actions = candidate_actions(state, config.max_accusations)
+            untried = [action for action in actions if action not in node.children]
+            for action in actions:
+                if action in node.children:
+                    node.children[action].availability += 1
+
+            if untried:
+                action = untried[rng.integers(len(untried))]
+                child = Node()
+                child.availability = 1
+                node.children[action] = child
+            else:
+                action = max(
+                    actions,
+                    key=lambda a: _ucb(node.children[a], config.exploration),
+                )
+                child = node.children[action]
+
+            path.append((child, state.current_player))
+            state.apply_action(action)
+            node = child
+            depth += 1
+            if untried:
+                break
+
+        while not state.game_over and depth < config.max_depth:
+            state.apply_action(rollout_action(state, rng))
+            depth += 1
+
+        rewards = evaluate(state)
+        for node, player in path:
+            node.visits += 1
+            node.reward += rewards[player]
+        iterations += 1
+
+    stats = {
+        action: (child.visits, child.reward) for action, child in tree.children.items()
+    }
+    return stats, iterations
+
+
+def _ucb(node: Node, exploration: float) -> float:
+    return node.reward / node.visits + exploration * math.sqrt(
+        math.log(node.availability) / node.visits
+    )
+
+
+# Each worker process keeps one game to restore snapshots into
+_worker_state: Optional[CardState] = None
+
+
+def _init_worker(map_csv: str) -> None:
+    global _worker_state
+    _worker_state = CardState(map_csv, max_players=CardState.MAX_PLAYERS)
+    _worker_state.should_log_actions = False
+
+
+def _search_worker(
+    root: CardStateSnapshot, observer: int, config: SearchConfig, seed: int
+) -> Tuple[RootStats, int]:
+    if _worker_state is None:
+        raise ValueError("The worker was not initialised")
+    return _search(_worker_state, root, observer, config, seed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Let ISMCTS play every seat and report the search speed"
+    )
+    parser.add_argument("--decisions", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--time-limit", type=float, default=None)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    state = CardState(MAP_LOCATION, max_players=CardState.MAX_PLAYERS, seed=args.seed)
+    state.should_log_actions = False
+    config = SearchConfig(
+        iterations=args.iterations, time_limit=args.time_limit, workers=args.workers
+    )
+    total_iterations = 0
+    total_time = 0.0
+    with_search = 0
+    agent = ISMCTS(config, seed=args.seed)
+    try:
+        for _ in range(args.decisions):
+            if state.game_over:
+                break
+            player, step_kind = state.current_player, state.current_step_kind
+            result = agent.search(state)
+            state.apply_action(result.action)
+            if result.iterations:
+                with_search += 1
+                total_iterations += result.iterations
+                total_time += result.elapsed
+                print(
+                    f"player {player} {step_kind.name:<19} action {result.action:>3}"
+                    f"  {result.iterations} rollouts"
+                    f"  {result.rollouts_per_second:,.0f}/s"
+                )
+    finally:
+        agent.close()
+
+    if total_time:
+        print(
+            f"{with_search} searches, {total_iterations} rollouts in "
+            f"{total_time:.1f}s: {total_iterations / total_time:,.0f} rollouts/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
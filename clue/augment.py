@@ -0,0 +1,193 @@
+"""
+Data augmentation by relabelling the cards within each category.
+
+Renaming the weapons changes nothing about the game, so a transition with the
+weapons relabelled is another transition just as likely to be seen. The same
+goes for the rooms once the distances to them are relabelled too - it's the
+same game on a board with the room names swapped - and, nearly, for the
+people: only which token a suggestion moves into the room is tied to the
+person card.
+
+A relabelling is a permutation of the 21 cards that keeps each card in its
+category. It moves the card columns of the flat v2 observation - the card
+locations, the suggestion history and the room distances, plus the value of
+suggestions channel if the observation has it - and the move, suggestion,
+accusation and disprove actions. Every column of the observation and action
+space that depends on the cards is a fixed base plus the cards' indices times
+strides, so the index tables are computed once and a batch is relabelled with
+one gather per array, a different permutation for each row:
+
+    perms = random_permutations(len(batch), rng)
+    obs = permute_observations(obs, perms)
+    masks = permute_masks(masks, perms)
+    actions = permute_actions(actions, perms)
+
+augment_batch() does all of this for a tianshou batch sampled from a replay
+buffer.
+"""
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from clue.posterior import CATEGORY_OFFSETS, ENVELOPE_SHAPE
+from clue.state import DISPROVE_ACTION_OFFSET, NUM_ACTIONS, SUGGESTION_ACTION_OFFSET
+
+NUM_CARDS = 21
+CATEGORIES = ("people", "weapons", "rooms")
+
+# The flat v2 observation, whose keys are flattened in sorted order
+CARD_LOCATIONS = 6  # 6 players x 21 cards
+ROOM_DISTANCES = CARD_LOCATIONS + 6 * NUM_CARDS  # 6 players x (9 direct, 9 via)
+SUGGESTIONS = ROOM_DISTANCES + 6 * 18 + 4  # 50 x (21 cards, 18 players)
+VALUE_OF_SUGGESTIONS = SUGGESTIONS + 50 * 39  # 6 x 6 x 9, if it's there
+OBS_SIZE = VALUE_OF_SUGGESTIONS
+OBS_SIZE_WITH_VALUES = VALUE_OF_SUGGESTIONS + int(np.prod(ENVELOPE_SHAPE))
+
+# A table of the columns that depend on the cards: column = base + the sum of
+#  strides times cards, with up to three (card, stride) pairs per column
+Table = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def _columns(rows: List[Tuple[int, Tuple[int, ...], Tuple[int, ...]]]) -> Table:
+    columns = np.array([column for column, _, _ in rows])
+    cards = np.zeros((len(rows), 3), dtype=np.int64)
+    strides = np.zeros((len(rows), 3), dtype=np.int64)
+    for i, (_, row_cards, row_strides) in enumerate(rows):
+        cards[i, : len(row_cards)] = row_cards
+        strides[i, : len(row_strides)] = row_strides
+    base = columns - (cards * strides).sum(axis=1)
+    return columns, base, cards, strides
+
+
+def _card_columns(start: int, cards: range) -> List:
+    return [(start + i, (card,), (1,)) for i, card in enumerate(cards)]
+
+
+def _suggestion_columns(start: int) -> List:
+    people, weapons, rooms = (
+        offset + np.arange(size)
+        for offset, size in zip(CATEGORY_OFFSETS, ENVELOPE_SHAPE)
+    )
+    strides = (ENVELOPE_SHAPE[1] * ENVELOPE_SHAPE[2], ENVELOPE_SHAPE[2], 1)
+    return [
+        (start + i, (int(person), int(weapon), int(room)), strides)
+        for i, (person, weapon, room) in enumerate(
+            (person, weapon, room)
+            for person in people
+            for weapon in weapons
+            for room in rooms
+        )
+    ]
+
+
+ROOMS = range(CATEGORY_OFFSETS[2], NUM_CARDS)
+
+OBS_COLUMNS = _columns(
+    [
+        row
+        for player in range(6)
+        for row in _card_columns(CARD_LOCATIONS + player * NUM_CARDS, range(NUM_CARDS))
+        + _card_columns(ROOM_DISTANCES + player * 18, ROOMS)
+        + _card_columns(ROOM_DISTANCES + player * 18 + 9, ROOMS)
+    ]
+    + [
+        row
+        for suggestion in range(50)
+        for row in _card_columns(SUGGESTIONS + suggestion * 39, range(NUM_CARDS))
+    ]
+)
+OBS_COLUMNS_WITH_VALUES = _columns(
+    [
+        (column, tuple(cards), tuple(strides))
+        for column, cards, strides in zip(OBS_COLUMNS[0], *OBS_COLUMNS[2:])
+    ]
+    + _suggestion_columns(VALUE_OF_SUGGESTIONS)
+)
+ACTION_COLUMNS = _columns(
+    _card_columns(0, ROOMS)
+    + _suggestion_columns(SUGGESTION_ACTION_OFFSET)
+    + _card_columns(DISPROVE_ACTION_OFFSET, range(NUM_CARDS))
+)
+
+
+def random_permutations(
+    size: int,
+    rng: Optional[np.random.Generator] = None,
+    categories: Tuple[str, ...] = CATEGORIES,
+) -> np.ndarray:
+    """size x 21, for each row the card each card is relabelled as. Only the
+    cards of the given categories are shuffled, each within its category."""
+    rng = rng if rng is not None else np.random.default_rng()
+    perms = np.tile(np.arange(NUM_CARDS), (size, 1))
+    for category, offset, count in zip(CATEGORIES, CATEGORY_OFFSETS, ENVELOPE_SHAPE):
+        if category in categories:
+            perms[:, offset : offset + count] = offset + rng.permuted(
+                np.tile(np.arange(count), (size, 1)), axis=1
+            )
+    return perms
+
+
+def invert(perms: np.ndarray) -> np.ndarray:
+    inverse = np.empty_like(perms)
+    np.put_along_axis(inverse, perms, np.arange(NUM_CARDS)[None], axis=1)
+    return inverse
+
+
+def _gather(values: np.ndarray, perms: np.ndarray, table: Table) -> np.ndarray:
+    """values with each row's card columns moved by its permutation"""
+    columns, base, cards, strides = table
+    # The column each new column comes from: where the card relabelled as its
+    #  card was
+    sources = invert(perms)[:, cards]
+    index = np.tile(np.arange(values.shape[1]), (len(values), 1))
+    index[:, columns] = base + (sources * strides).sum(axis=2)
+    gathered: np.ndarray = np.take_along_axis(values, index, axis=1)
+    return gathered
+
+
+def permute_observations(observations: np.ndarray, perms: np.ndarray) -> np.ndarray:
+    """Relabel the cards in flat v2 observations, with or without the value of
+    suggestions channel"""
+    if observations.shape[1] == OBS_SIZE:
+        return _gather(observations, perms, OBS_COLUMNS)
+    if observations.shape[1] == OBS_SIZE_WITH_VALUES:
+        return _gather(observations, perms, OBS_COLUMNS_WITH_VALUES)
+    raise ValueError(
+        f"Expected observations of size {OBS_SIZE} or {OBS_SIZE_WITH_VALUES}, "
+        f"got {observations.shape[1]}"
+    )
+
+
+def permute_masks(masks: np.ndarray, perms: np.ndarray) -> np.ndarray:
+    if masks.shape[1] != NUM_ACTIONS:
+        raise ValueError(f"Expected {NUM_ACTIONS} actions, got {masks.shape[1]}")
+    return _gather(masks, perms, ACTION_COLUMNS)
+
+
+def permute_actions(actions: np.ndarray, perms: np.ndarray) -> np.ndarray:
+    """The actions with their cards relabelled"""
+    columns, base, cards, strides = ACTION_COLUMNS
+    # Where every action goes, for each row
+    targets = np.tile(np.arange(NUM_ACTIONS), (len(actions), 1))
+    targets[:, columns] = base + (perms[:, cards] * strides).sum(axis=2)
+    permuted: np.ndarray = targets[np.arange(len(actions)), actions]
+    return permuted
+
+
+def augment_batch(
+    batch: Any,
+    rng: Optional[np.random.Generator] = None,
+    categories: Tuple[str, ...] = CATEGORIES,
+) -> Any:
+    """Relabel the cards of a tianshou batch of transitions in place, with
+    the same permutation for a transition's obs, obs_next, masks and action.
+    Returns the batch."""
+    perms = random_permutations(len(batch), rng, categories)
+    for key in ("obs", "obs_next"):
+        if key in batch.keys():
+            observation = batch[key]
+            observation.obs = permute_observations(np.asarray(observation.obs), perms)
+            if "mask" in observation.keys():
+                observation.mask = permute_masks(np.asarray(observation.mask), perms)
+    batch.act = permute_actions(np.asarray(batch.act), perms)
+    return batch
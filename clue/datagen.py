@@ -0,0 +1,328 @@
+"""
+Generate self-play data for offline RL and imitation learning.
+
+    python -m clue.datagen --games 1000 --workers 4 --seats heuristic --out data
+
+Each worker process plays its share of the games, a few at a time in lockstep
+so that the seats' policies (see clue.policies) choose actions for all of them
+at once. Every step is written as a transition of the player who moved:
+
+- obs: the flat ClueEnvironment v2 observation, as float16
+- mask: the legal actions
+- action, reward, done
+- player: who moved
+- game: which game, numbered across all the workers
+
+The reward is the mover's reward for the step. When a game ends the final
+rewards of the other players are added to their last transition, and it is
+marked done.
+
+Transitions go into fixed size shards, one memory-mapped .npy file per field,
+e.g. data/w00_0003.obs.npy. index.json lists the shards and how many
+transitions each holds, the last shard of each worker being part full.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from clue.env.clue_environment_v2 import ClueEnvironment
+from clue.evaluate import GameResult, play_seated
+from clue.policies import make_seats
+from clue.state import CardState
+
+SHARD_SIZE = 16384
+NUM_ACTIONS = 355
+OBS_SIZE = 2194
+
+# name -> (dtype, shape of one transition)
+FIELDS: Dict[str, Tuple[str, Tuple[int, ...]]] = {
+    "obs": ("float16", (OBS_SIZE,)),
+    "mask": ("bool", (NUM_ACTIONS,)),
+    "action": ("int16", ()),
+    "reward": ("float32", ()),
+    "done": ("bool", ()),
+    "player": ("int8", ()),
+    "game": ("int32", ()),
+}
+
+
+@dataclass
+class WorkerJob:
+    worker: int
+    first_game: int
+    num_games: int
+    seed: np.random.SeedSequence
+    seats: Sequence[str]
+    out_dir: str
+    shard_size: int = SHARD_SIZE
+    lockstep: int = 8
+    max_steps: int = 500
+
+
+@dataclass
+class WorkerReport:
+    worker: int
+    games: int
+    transitions: int
+    elapsed: float
+    shards: List[Dict]
+
+
+def shard_path(out_dir: str, name: str, field: str) -> str:
+    return os.path.join(out_dir, f"{name}.{field}.npy")
+
+
+class ShardWriter:
+    """Appends transitions to a series of fixed size memory-mapped shards"""
+
+    def __init__(self, out_dir: str, prefix: str, shard_size: int) -> None:
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self.shard_size = shard_size
+        self.shards: List[Dict] = []
+        self.arrays: Dict[str, np.memmap] = {}
+        self.length = 0
+
+    def write(self, transitions: Dict[str, np.ndarray]) -> None:
+        count = len(transitions["action"])
+        written = 0
+        while written < count:
+            if not self.arrays or self.length == self.shard_size:
+                self._next_shard()
+            n = min(count - written, self.shard_size - self.length)
+            for field, array in self.arrays.items():
+                array[self.length : self.length + n] = transitions[field][
+                    written : written + n
+                ]
+            self.length += n
+            self.shards[-1]["length"] = self.length
+            written += n
+
+    def close(self) -> List[Dict]:
+        for array in self.arrays.values():
+            array.flush()
+        self.arrays = {}
+        return self.shards
+
+    def _next_shard(self) -> None:
+        self.close()
+        name = f"{self.prefix}_{len(self.shards):04d}"
+        self.arrays = {
+            field: np.lib.format.open_memmap(
+                shard_path(self.out_dir, name, field),
+                mode="w+",
+                dtype=dtype,
+                shape=(self.shard_size,) + shape,
+            )
+            for field, (dtype, shape) in FIELDS.items()
+        }
+        self.shards.append({"name": name, "length": 0})
+        self.length = 0
+
+
+class GameRecord:
+    """The transitions of one game, kept until the game ends"""
+
+    def __init__(self, game: int) -> None:
+        self.game = game
+        self.columns: Dict[str, List] = {field: [] for field in FIELDS}
+        self.last_move: Dict[int, int] = {}
+
+    def add(
+        self,
+        obs: np.ndarray,
+        mask: np.ndarray,
+        action: int,
+        reward: float,
+        player: int,
+    ) -> None:
+        self.last_move[player] = len(self.columns["action"])
+        for field, value in (
+            ("obs", obs),
+            ("mask", mask),
+            ("action", action),
+            ("reward", reward),
+            ("done", False),
+            ("player", player),
+            ("game", self.game),
+        ):
+            self.columns[field].append(value)
+
+    def finish(self, mover: int, rewards: Dict[int, float]) -> Dict[str, np.ndarray]:
+        for player, row in self.last_move.items():
+            if player != mover:
+                self.columns["reward"][row] += rewards[player]
+            self.columns["done"][row] = True
+        return {
+            field: np.array(values, dtype=FIELDS[field][0])
+            for field, values in self.columns.items()
+        }
+
+
+def play_games(job: WorkerJob) -> WorkerReport:
+    """Play a worker's share of the games, writing them to its own shards"""
+    start = time.perf_counter()
+    env_seeds, policy_seed = job.seed.spawn(2)
+    seats = make_seats(job.seats, np.random.default_rng(policy_seed))
+    writer = ShardWriter(job.out_dir, f"w{job.worker:02d}", job.shard_size)
+
+    games = [
+        (GameResult(job.first_game + i, 0, -1, 0, 0, 0, False), seed, seats)
+        for i, seed in enumerate(env_seeds.spawn(job.num_games))
+    ]
+    records: Dict[int, GameRecord] = {}
+
+    def record(
+        env: ClueEnvironment,
+        result: GameResult,
+        player: int,
+        obs: np.ndarray,
+        mask: np.ndarray,
+        action: int,
+        done: bool,
+    ) -> None:
+        if result.game not in records:
+            records[result.game] = GameRecord(result.game)
+        reward = env.rewards[env.possible_agents[player]]
+        records[result.game].add(obs, mask, action, reward, player)
+        if done:
+            rewards = {env.agent_map[a]: float(r) for a, r in env.rewards.items()}
+            writer.write(records.pop(result.game).finish(player, rewards))
+
+    transitions = sum(
+        result.steps
+        for result in play_seated(games, job.lockstep, job.max_steps, record)
+    )
+
+    return WorkerReport(
+        worker=job.worker,
+        games=job.num_games,
+        transitions=transitions,
+        elapsed=time.perf_counter() - start,
+        shards=writer.close(),
+    )
+
+
+def generate(
+    out_dir: str,
+    num_games: int,
+    seats: Sequence[str],
+    workers: int = 1,
+    seed: int = 0,
+    shard_size: int = SHARD_SIZE,
+    lockstep: int = 8,
+    max_steps: int = 500,
+) -> Dict:
+    """Play the games, write the shards and index.json to out_dir and return the
+    index"""
+    if len(seats) not in (1, CardState.MAX_PLAYERS):
+        raise ValueError(f"Expected 1 or {CardState.MAX_PLAYERS} seats")
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    shares = np.diff(np.linspace(0, num_games, workers + 1).astype(int))
+    jobs = [
+        WorkerJob(
+            worker=worker,
+            first_game=int(shares[:worker].sum()),
+            num_games=int(share),
+            seed=worker_seed,
+            seats=seats,
+            out_dir=out_dir,
+            shard_size=shard_size,
+            lockstep=lockstep,
+            max_steps=max_steps,
+        )
+        for worker, (share, worker_seed) in enumerate(
+            zip(shares, np.random.SeedSequence(seed).spawn(workers))
+        )
+        if share
+    ]
+    if workers == 1:
+        reports = [play_games(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            reports = list(pool.map(play_games, jobs))
+
+    index = {
+        "fields": {
+            field: {"dtype": dtype, "shape": list(shape)}
+            for field, (dtype, shape) in FIELDS.items()
+        },
+        "shard_size": shard_size,
+        "shards": [shard for report in reports for shard in report.shards],
+        "games": num_games,
+        "transitions": sum(report.transitions for report in reports),
+        "seats": list(seats),
+        "seed": seed,
+        "elapsed": time.perf_counter() - start,
+        "worker_elapsed": [report.elapsed for report in reports],
+    }
+    with open(os.path.join(out_dir, "index.json"), "w") as f:
+        json.dump(index, f, indent=2)
+    return index
+
+
+def load_shard(out_dir: str, name: str) -> Dict[str, np.ndarray]:
+    """The fields of one shard, memory-mapped read only"""
+    return {
+        field: np.load(shard_path(out_dir, name, field), mmap_mode="r")
+        for field in FIELDS
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate self-play transitions")
+    parser.add_argument("--out", default=os.path.join("data", "selfplay"))
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument(
+        "--seats",
+        default="random",
+        help="comma separated policy for each seat, or one for them all: "
+        "random, heuristic, sweep, knowledge, deduction, information, "
+        "checkpoint:PATH or server:SOCKET",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--lockstep", type=int, default=8)
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    parser.add_argument("--max-steps", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    index = generate(
+        args.out,
+        args.games,
+        args.seats.split(","),
+        workers=args.workers,
+        seed=args.seed,
+        shard_size=args.shard_size,
+        lockstep=args.lockstep,
+        max_steps=args.max_steps,
+    )
+
+    transitions = index["transitions"]
+    busy = sum(index["worker_elapsed"])
+    shard_bytes = sum(
+        os.path.getsize(shard_path(args.out, shard["name"], field))
+        for shard in index["shards"]
+        for field in FIELDS
+    )
+    print(
+        f"{index['games']} games, {transitions:,} transitions in "
+        f"{index['elapsed']:.1f}s: {transitions / index['elapsed']:,.0f}/s, "
+        f"{transitions / busy:,.0f}/s per core"
+    )
+    print(
+        f"{len(index['shards'])} shards of {args.shard_size:,} transitions, "
+        f"{shard_bytes / 2**20:,.1f} MiB in {args.out}"
+    )
+
+
+if __name__ == "__main__":
+    main()
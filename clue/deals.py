@@ -0,0 +1,69 @@
+"""
+Deals made in bulk ahead of time so that starting a new game is cheap.
+
+A deal is stored as an ordering of the 21 cards: the first 18 are handed out
+round robin to the players and the last three are the person, weapon and room
+in the envelope. The orderings are made for a whole batch at once by sorting a
+matrix of random keys, with the envelope cards given keys that sort last.
+"""
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+
+from clue.cards import DECK, PEOPLE_CARDS, ROOM_CARDS, WEAPON_CARDS
+
+DEAL_POOL_SIZE = 1024
+
+CATEGORY_OFFSETS = np.array(
+    [PEOPLE_CARDS[0].idx, WEAPON_CARDS[0].idx, ROOM_CARDS[0].idx]
+)
+CATEGORY_SIZES = np.array([len(PEOPLE_CARDS), len(WEAPON_CARDS), len(ROOM_CARDS)])
+
+# Larger than any key from rng.random(), in envelope order
+ENVELOPE_KEYS = np.array([2.0, 3.0, 4.0])
+
+
+def make_deals(rng: np.random.Generator, num_deals: int) -> np.ndarray:
+    """num_deals x 21 orderings of the cards, see the module docstring"""
+    envelope = CATEGORY_OFFSETS + rng.integers(CATEGORY_SIZES, size=(num_deals, 3))
+    keys = rng.random((num_deals, len(DECK)))
+    np.put_along_axis(keys, envelope, ENVELOPE_KEYS, axis=1)
+    return np.argsort(keys, axis=1).astype(np.int8)
+
+
+@lru_cache(maxsize=None)
+def round_robin(players: Tuple[int, ...]) -> np.ndarray:
+    """Who gets each of the 18 cards that aren't in the envelope"""
+    seats: np.ndarray = np.array(players)[np.arange(len(DECK) - 3) % len(players)]
+    seats.flags.writeable = False
+    return seats
+
+
+class DealPool:
+    def __init__(self, size: int = DEAL_POOL_SIZE) -> None:
+        self.size = size
+        self._deals = np.empty((0, len(DECK)), dtype=np.int8)
+        self._next = 0
+
+    def pop(self, rng: np.random.Generator) -> np.ndarray:
+        """The next deal, making another batch with rng if the pool is empty"""
+        if self._next == len(self._deals):
+            self._deals = make_deals(rng, self.size)
+            self._deals.flags.writeable = False
+            self._next = 0
+        deal: np.ndarray = self._deals[self._next]
+        self._next += 1
+        return deal
+
+    def get_state(self) -> Tuple[np.ndarray, int]:
+        """The batch of deals and how far through it the pool is. Batches
+        are never written to, so the state can be kept and set back later."""
+        return self._deals, self._next
+
+    def set_state(self, state: Tuple[np.ndarray, int]) -> None:
+        self._deals, self._next = state
+
+    def clear(self) -> None:
+        self._deals = self._deals[:0]
+        self._next = 0
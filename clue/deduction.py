@@ -0,0 +1,414 @@
+"""
+What a single player can logically infer about where every card is.
+
+Each card is held by exactly one of seven holders: the six players and the
+envelope. For every holder we keep two 21 bit masks - the cards it is known to
+have and the cards it is known to lack - plus a list of "has at least one of"
+clauses that come from watching someone disprove a suggestion without seeing
+the card.
+
+New facts go onto a queue and are propagated one at a time, so the cost of an
+update is proportional to what it changes rather than to the size of the game.
+DeductionTracker keeps one up to date for each game a player is in.
+"""
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+from weakref import WeakKeyDictionary
+
+import numpy as np
+
+from clue.cards import DECK, PEOPLE_CARDS, ROOM_CARDS, WEAPON_CARDS
+from clue.state import CardState
+
+NUM_PLAYERS = 6
+ENVELOPE = NUM_PLAYERS  # holder index used for the envelope
+NUM_HOLDERS = NUM_PLAYERS + 1
+NUM_CARDS = len(DECK)
+
+ALL_CARDS = (1 << NUM_CARDS) - 1
+ALL_HOLDERS = (1 << NUM_HOLDERS) - 1
+
+PEOPLE_MASK = ((1 << len(PEOPLE_CARDS)) - 1) << PEOPLE_CARDS[0].idx
+WEAPON_MASK = ((1 << len(WEAPON_CARDS)) - 1) << WEAPON_CARDS[0].idx
+ROOM_MASK = ((1 << len(ROOM_CARDS)) - 1) << ROOM_CARDS[0].idx
+CATEGORY_MASKS = (PEOPLE_MASK, WEAPON_MASK, ROOM_MASK)
+
+# Which category (person, weapon, room) each card belongs to
+CARD_CATEGORY = tuple(
+    next(i for i, mask in enumerate(CATEGORY_MASKS) if mask & (1 << card))
+    for card in range(NUM_CARDS)
+)
+
+
+def popcount(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+def card_mask(cards: Iterable[int]) -> int:
+    mask = 0
+    for card in cards:
+        mask |= 1 << int(card)
+    return mask
+
+
+def mask_to_cards(mask: int) -> List[int]:
+    return [card for card in range(NUM_CARDS) if mask & (1 << card)]
+
+
+def mask_from_vector(vector: np.ndarray) -> int:
+    """Convert a 21 element indicator vector (e.g. a row of
+    player_card_knowledge) to a bitmask"""
+    return card_mask(np.flatnonzero(vector))
+
+
+def hand_sizes(players: Sequence[int], num_cards: int = NUM_CARDS - 3) -> List[int]:
+    """The number of cards each player is dealt - mirrors the round robin deal
+    in CardState.new_game. Players not in the game hold no cards."""
+    sizes = [0] * NUM_PLAYERS
+    for i in range(num_cards):
+        sizes[players[i % len(players)]] += 1
+    return sizes
+
+
+class Contradiction(ValueError):
+    """The facts given to the engine can not all be true."""
+
+
+class Deduction:
+    """The logical knowledge of one observer.
+
+    Facts are fed in through the add_* and observe_* methods, each of which
+    propagates its consequences before returning.
+    """
+
+    def __init__(self, observer: int, sizes: Sequence[int]) -> None:
+        """
+        observer : the player whose point of view this is.
+        sizes : the number of cards held by each of the six players.
+        """
+        if len(sizes) != NUM_PLAYERS:
+            raise ValueError(f"Expected {NUM_PLAYERS} hand sizes, got {len(sizes)}")
+        self.observer = observer
+        self.sizes = tuple(sizes) + (len(CATEGORY_MASKS),)
+
+        self.has = [0] * NUM_HOLDERS
+        self.lacks = [0] * NUM_HOLDERS
+        # Each clause is a mask of cards, at least one of which the holder has.
+        self.clauses: List[List[int]] = [[] for _ in range(NUM_HOLDERS)]
+        # Bit h of holders_lacking[c] is set when holder h is known to lack c.
+        self.holders_lacking = [0] * NUM_CARDS
+
+        self._queue: Deque[Tuple[int, int, bool]] = deque()
+
+        for holder, size in enumerate(self.sizes):
+            if size == 0:
+                self._queue_all(holder, ALL_CARDS, has_card=False)
+        self.propagate()
+
+    @classmethod
+    def from_card_state(cls, state: CardState, observer: int) -> "Deduction":
+        """Build the observer's knowledge from the current state of a game."""
+        return cls.replay(
+            observer,
+            hand_sizes(state.players),
+            knowledge=state.player_card_knowledge[observer],
+            suggestions=state.suggestions[::-1],
+        )
+
+    @classmethod
+    def replay(
+        cls,
+        observer: int,
+        sizes: Sequence[int],
+        knowledge: np.ndarray,
+        suggestions: np.ndarray,
+    ) -> "Deduction":
+        """Batch path for offline analysis of a whole game.
+
+        knowledge : the observer's 6x21 row of player_card_knowledge - their hand
+          on the diagonal and the cards they were shown elsewhere.
+        suggestions : the suggestion history rows, oldest first, in the format
+          of CardState.encode_suggestion_history. Empty rows are skipped.
+
+        All the facts are queued before anything is propagated, so each one is
+        only processed once.
+        """
+        deduction = cls(observer, sizes)
+        for row in suggestions:
+            deduction._queue_suggestion(row)
+        for holder in range(NUM_PLAYERS):
+            deduction._queue_all(holder, mask_from_vector(knowledge[holder]), True)
+        deduction.propagate()
+        return deduction
+
+    def copy(self) -> "Deduction":
+        other = Deduction.__new__(Deduction)
+        other.observer = self.observer
+        other.sizes = self.sizes
+        other.has = self.has.copy()
+        other.lacks = self.lacks.copy()
+        other.clauses = [clauses.copy() for clauses in self.clauses]
+        other.holders_lacking = self.holders_lacking.copy()
+        other._queue = deque()
+        return other
+
+    # Inputs
+
+    def add_has(self, holder: int, card: int) -> None:
+        self._queue.append((holder, card, True))
+        self.propagate()
+
+    def add_lacks(self, holder: int, card: int) -> None:
+        self._queue.append((holder, card, False))
+        self.propagate()
+
+    def add_hand(self, cards: int) -> None:
+        """The observer's own hand as a bitmask"""
+        self._queue_all(self.observer, cards, has_card=True)
+        self.propagate()
+
+    def add_clause(self, holder: int, cards: int) -> None:
+        """holder has at least one of the cards in the mask"""
+        self._add_clause(holder, cards)
+        self.propagate()
+
+    def observe_suggestion(self, suggestion: np.ndarray) -> None:
+        """A suggestion history vector from CardState.encode_suggestion_history"""
+        self._queue_suggestion(suggestion)
+        self.propagate()
+
+    def observe_card_shown(self, disprover: int, card: int) -> None:
+        """The observer was shown a card by the disprover"""
+        self.add_has(disprover, card)
+
+    # Queries
+
+    def holder_of(self, card: int) -> Optional[int]:
+        bit = 1 << card
+        for holder in range(NUM_HOLDERS):
+            if self.has[holder] & bit:
+                return holder
+        return None
+
+    def known_cards(self) -> int:
+        """Mask of the cards whose holder is known"""
+        known = 0
+        for has in self.has:
+            known |= has
+        return known
+
+    def envelope_candidates(self) -> Tuple[int, int, int]:
+        """For each category, the mask of cards that could be in the envelope"""
+        possible = ALL_CARDS & ~self.lacks[ENVELOPE]
+        return (
+            possible & PEOPLE_MASK,
+            possible & WEAPON_MASK,
+            possible & ROOM_MASK,
+        )
+
+    def solution(self) -> Optional[Tuple[int, int, int]]:
+        """The (person, weapon, room) indices of the envelope if it is known"""
+        if popcount(self.has[ENVELOPE]) != len(CATEGORY_MASKS):
+            return None
+        person, weapon, room = mask_to_cards(self.has[ENVELOPE])
+        return (
+            person - PEOPLE_CARDS[0].idx,
+            weapon - WEAPON_CARDS[0].idx,
+            room - ROOM_CARDS[0].idx,
+        )
+
+    def knowledge_matrix(self) -> np.ndarray:
+        """7x21 matrix of 1 (holder has the card), -1 (lacks it) or 0 (unknown).
+        The last row is the envelope."""
+        matrix = np.zeros((NUM_HOLDERS, NUM_CARDS), dtype=np.int8)
+        for holder in range(NUM_HOLDERS):
+            for card in mask_to_cards(self.has[holder]):
+                matrix[holder, card] = 1
+            for card in mask_to_cards(self.lacks[holder]):
+                matrix[holder, card] = -1
+        return matrix
+
+    # Propagation
+
+    def propagate(self) -> None:
+        while self._queue:
+            holder, card, has_card = self._queue.popleft()
+            if has_card:
+                self._set_has(holder, card)
+            else:
+                self._set_lacks(holder, card)
+
+    def _queue_all(self, holder: int, cards: int, has_card: bool) -> None:
+        for card in mask_to_cards(cards):
+            self._queue.append((holder, card, has_card))
+
+    def _queue_suggestion(self, suggestion: np.ndarray) -> None:
+        if not suggestion.any():
+            return
+        cards = mask_from_vector(suggestion[0:21])
+        for player in np.flatnonzero(suggestion[27:33]):
+            self._queue_all(int(player), cards, has_card=False)
+
+        if suggestion[33:39].any():
+            disprover = int(suggestion[33:39].argmax())
+            if disprover != self.observer:
+                self._add_clause(disprover, cards)
+
+    def _add_clause(self, holder: int, cards: int) -> None:
+        cards &= ~self.lacks[holder]
+        if cards & self.has[holder]:
+            return  # already satisfied
+        if cards == 0:
+            raise Contradiction(f"Player {holder} can not hold any of the cards")
+        if popcount(cards) == 1:
+            self._queue.append((holder, mask_to_cards(cards)[0], True))
+            return
+
+        clauses = self.clauses[holder]
+        if any(clause & cards == clause for clause in clauses):
+            return  # implied by a tighter clause
+        # drop any clauses that this one implies
+        clauses[:] = [clause for clause in clauses if clause & cards != cards]
+        clauses.append(cards)
+
+    def _set_has(self, holder: int, card: int) -> None:
+        bit = 1 << card
+        if self.has[holder] & bit:
+            return
+        if self.lacks[holder] & bit:
+            raise Contradiction(f"{DECK[card].name} can't be held by {holder}")
+        self.has[holder] |= bit
+
+        for other in range(NUM_HOLDERS):
+            if other != holder:
+                self._queue.append((other, card, False))
+
+        if holder == ENVELOPE:
+            # only one card of each kind is in the envelope
+            category = CATEGORY_MASKS[CARD_CATEGORY[card]]
+            self._queue_all(ENVELOPE, category & ~bit, has_card=False)
+
+        count = popcount(self.has[holder])
+        if count > self.sizes[holder]:
+            raise Contradiction(f"Holder {holder} has more than {count - 1} cards")
+        if count == self.sizes[holder]:
+            unknown = ALL_CARDS & ~self.has[holder] & ~self.lacks[holder]
+            self._queue_all(holder, unknown, has_card=False)
+
+        clauses = self.clauses[holder]
+        if clauses:
+            clauses[:] = [clause for clause in clauses if not clause & bit]
+
+    def _set_lacks(self, holder: int, card: int) -> None:
+        bit = 1 << card
+        if self.lacks[holder] & bit:
+            return
+        if self.has[holder] & bit:
+            raise Contradiction(f"Holder {holder} has and lacks {DECK[card].name}")
+        self.lacks[holder] |= bit
+        self.holders_lacking[card] |= 1 << holder
+
+        # Has every other card been ruled out?
+        unknown = ALL_CARDS & ~self.has[holder] & ~self.lacks[holder]
+        possible = popcount(self.has[holder]) + popcount(unknown)
+        if possible < self.sizes[holder]:
+            raise Contradiction(f"Holder {holder} can't have {self.sizes[holder]}")
+        if unknown and possible == self.sizes[holder]:
+            self._queue_all(holder, unknown, has_card=True)
+
+        if holder == ENVELOPE:
+            category = CATEGORY_MASKS[CARD_CATEGORY[card]]
+            remaining = category & ~self.lacks[ENVELOPE]
+            if remaining == 0:
+                raise Contradiction(f"Nothing left in the envelope for {card}")
+            if popcount(remaining) == 1:
+                self._queue.append((ENVELOPE, mask_to_cards(remaining)[0], True))
+
+        # Is there only one place left for the card?
+        possible_holders = ALL_HOLDERS & ~self.holders_lacking[card]
+        if possible_holders == 0:
+            raise Contradiction(f"No one can be holding {DECK[card].name}")
+        if popcount(possible_holders) == 1:
+            other = possible_holders.bit_length() - 1
+            self._queue.append((other, card, True))
+
+        clauses = self.clauses[holder]
+        for i, clause in enumerate(clauses):
+            if not clause & bit:
+                continue
+            clause &= ~bit
+            clauses[i] = clause
+            if clause == 0:
+                raise Contradiction(f"Player {holder} can not hold any of the cards")
+            if popcount(clause) == 1:
+                self._queue.append((holder, mask_to_cards(clause)[0], True))
+
+
+class DeductionTracker:
+    """Keeps a Deduction for each game and observer, feeding it only what has
+    happened in the game since it was last asked for.
+
+    Rebuilding a Deduction from a CardState only replays the last 50
+    suggestions, so in a long game the older ones are forgotten. A tracked
+    Deduction sees every suggestion as long as it is asked for at least once
+    every 50 suggestions. When the game doesn't follow on from what was seen
+    before - a new game, or a restored snapshot - it is rebuilt.
+    """
+
+    def __init__(self) -> None:
+        self._games: "WeakKeyDictionary[CardState, Dict[int, _Tracked]]" = (
+            WeakKeyDictionary()
+        )
+
+    def get(self, state: CardState, observer: int) -> Deduction:
+        """The observer's Deduction for the game, up to date"""
+        tracked = self._games.setdefault(state, {}).get(observer)
+        if tracked is None or not tracked.update(state):
+            tracked = _Tracked(state, observer)
+            self._games[state][observer] = tracked
+        return tracked.deduction
+
+
+class _Tracked:
+    """A Deduction and how much of the game it has seen"""
+
+    def __init__(self, state: CardState, observer: int) -> None:
+        self.deduction = Deduction.from_card_state(state, observer)
+        self.observer = observer
+        self._seen(state)
+
+    def _seen(self, state: CardState) -> None:
+        self.suggestion_count = state.suggestion_count
+        self.latest = state.suggestions[0].copy()
+        self.knowledge = [
+            mask_from_vector(row) for row in state.player_card_knowledge[self.observer]
+        ]
+
+    def update(self, state: CardState) -> bool:
+        """Feed in the suggestions and cards shown since last time. False if
+        the game doesn't follow on from what was seen, or the new facts
+        contradict the old ones."""
+        new = state.suggestion_count - self.suggestion_count
+        if new < 0 or new > CardState.SEQUENCE_MEMORY:
+            return False
+        # The latest suggestion seen should now be new suggestions down
+        if new < CardState.SEQUENCE_MEMORY and not np.array_equal(
+            state.suggestions[new], self.latest
+        ):
+            return False
+        knowledge = [
+            mask_from_vector(row) for row in state.player_card_knowledge[self.observer]
+        ]
+        if any(old & ~now for old, now in zip(self.knowledge, knowledge)):
+            return False
+
+        try:
+            for row in state.suggestions[new - 1 :: -1] if new else ():
+                self.deduction.observe_suggestion(row)
+            for holder, (old, now) in enumerate(zip(self.knowledge, knowledge)):
+                for card in mask_to_cards(now & ~old):
+                    self.deduction.observe_card_shown(holder, card)
+        except Contradiction:
+            return False
+        self._seen(state)
+        return True
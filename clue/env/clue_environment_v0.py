@@ -1,5 +1,4 @@
 import os
-import random
 from typing import Any, Dict, Optional, Tuple, Union, cast
 
 import numpy as np
@@ -108,7 +107,9 @@ class ClueEnvironment(AECEnv):
         self.num_suggestions = 0
         self._elapsed_steps = 0
 
-        random.seed(seed)
+        # Without a seed carry on with the game's current random stream
+        if seed is not None:
+            self.clue.seed(seed)
 
         self.clue.new_game(self.clue.pick_players())
 
@@ -189,8 +190,7 @@ class ClueEnvironment(AECEnv):
             )
 
             # push down the old history and store the new history
-            self.clue.suggestions[1:] = self.clue.suggestions[0:-1]
-            self.clue.suggestions[0] = CardState.encode_suggestion_history(
+            self.clue.record_suggestion(
                 room,
                 person,
                 weapon,
@@ -210,12 +210,14 @@ class ClueEnvironment(AECEnv):
             )
             suggestors_new_knowledge = self.clue.get_knowledge_score(suggestor_idx)
             if suggestors_new_knowledge > suggestors_prior_knowledge:
-                self.clue.log_action(
-                    f"Before Setting rewards on learning old: "
-                    f"{suggestors_prior_knowledge} new {suggestors_new_knowledge} \n"
-                    f" - cum_rew {self._cumulative_rewards.values()}, \n"
-                    f" - rewards {self.rewards.values()} ."
-                )
+                if self.clue.should_log_actions:
+                    self.clue.log_action(
+                        f"Before Setting rewards on learning old: "
+                        f"{suggestors_prior_knowledge} "
+                        f"new {suggestors_new_knowledge} \n"
+                        f" - cum_rew {self._cumulative_rewards.values()}, \n"
+                        f" - rewards {self.rewards.values()} ."
+                    )
 
                 # get points for learning something
                 suggestor_agent = self.possible_agents[suggestor_idx]
@@ -233,11 +235,12 @@ class ClueEnvironment(AECEnv):
             correct = self.clue.make_accusation(accusation)
 
             if correct is True:
-                self.clue.log_action(
-                    f"Before Setting rewards on win\n "
-                    f"- cum_rew {self._cumulative_rewards.values()}, \n"
-                    f" - rewards {self.rewards.values()} ."
-                )
+                if self.clue.should_log_actions:
+                    self.clue.log_action(
+                        f"Before Setting rewards on win\n "
+                        f"- cum_rew {self._cumulative_rewards.values()}, \n"
+                        f" - rewards {self.rewards.values()} ."
+                    )
 
                 self.rewards[self.agent_selection] = (
                     self.rewards[self.agent_selection] + 100
@@ -252,11 +255,12 @@ class ClueEnvironment(AECEnv):
             elif correct is False:
                 # We lost, but still need to stick around to tell the other players
                 # which cards we have.
-                self.clue.log_action(
-                    f"before Setting rewards on lose\n - cum_rew "
-                    f" {self._cumulative_rewards.values()}, \n"
-                    f" - rewards {self.rewards.values()} ."
-                )
+                if self.clue.should_log_actions:
+                    self.clue.log_action(
+                        f"before Setting rewards on lose\n - cum_rew "
+                        f" {self._cumulative_rewards.values()}, \n"
+                        f" - rewards {self.rewards.values()} ."
+                    )
 
                 self.rewards[self.agent_selection] = (
                     self.rewards[self.agent_selection] - 100
@@ -273,10 +277,12 @@ class ClueEnvironment(AECEnv):
         self._elapsed_steps = self._elapsed_steps + 1
 
         if self._max_episode_steps and self._elapsed_steps >= self._max_episode_steps:
-            self.clue.log_action(
-                f"About to truncate \n - cum_rew {self._cumulative_rewards.values()},"
-                f" \n - rewards {self.rewards.values()} ."
-            )
+            if self.clue.should_log_actions:
+                self.clue.log_action(
+                    f"About to truncate \n - cum_rew "
+                    f"{self._cumulative_rewards.values()}, \n"
+                    f" - rewards {self.rewards.values()} ."
+                )
             for player in self.truncations:
                 self.truncations[player] = True
                 self.rewards[player] = self.rewards[player] - 100
@@ -292,7 +298,7 @@ class ClueEnvironment(AECEnv):
         return render_response
 
     def seed(self, seed: Optional[int] = None) -> None:
-        np.random.seed(seed)
+        self.clue.seed(seed)
 
     def close(self) -> None:
         pass
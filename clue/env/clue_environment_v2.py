@@ -1,5 +1,4 @@
 import os
-import random
 from typing import Any, Dict, List, Optional, Tuple, Union, cast
 
 import numpy as np
@@ -7,8 +6,14 @@ from gymnasium import spaces
 from pettingzoo.utils import wrappers
 from pettingzoo.utils.env import ActionType, AECEnv, AgentID, ObsType
 
+from clue.deduction import Contradiction
+from clue.information import MAX_GAIN, suggestion_gains_from_state
+from clue.instrumentation import Stats
 from clue.state import CardState, StepKind
 
+# Deals sampled for the information gain in each observation
+OBS_INFORMATION_SAMPLES = 128
+
 MAP_LOCATION = PARENT_DIR = os.path.dirname(os.path.abspath(__file__)) + "/../map49.csv"
 """
 This one should have the board maintain distances from every board position to the
@@ -43,6 +48,10 @@ class ClueEnvironment(AECEnv):
         render_mode: Optional[str] = None,
         max_episode_steps: int = 0,
         log_actions: bool = False,
+        collect_stats: bool = False,
+        env_index: Optional[int] = None,
+        information_gain: bool = False,
+        hash_in_info: bool = False,
     ) -> None:
         super().__init__()
         if max_players < 3 or max_players > CardState.MAX_PLAYERS:
@@ -53,6 +62,21 @@ class ClueEnvironment(AECEnv):
             max_players=max_players,
             log_actions=(render_mode == "human") or log_actions,
         )
+        # Timings of the hot paths and counts of what happened, see get_stats()
+        self.stats = Stats() if collect_stats else None
+        self.clue.stats = self.stats
+        # Put this env's index in its vector env in every info, for policies
+        #  that play from the CardState itself and look it up there (see
+        #  clue.agents.heuristic.ScriptedBasePolicy)
+        self.env_index = env_index
+        # Add the expected information gain of each suggestion to the
+        #  observations (see clue.information). It's slow: a few ms a step.
+        self.information_gain = information_gain
+        self.information_rng = np.random.default_rng()
+        # Put the information hash of the player to move in their info, e.g.
+        #  to count the duplicate observations in a replay buffer (see
+        #  clue.zobrist)
+        self.hash_in_info = hash_in_info
 
         self.agent_map = {f"player_{i}": i for i in range(self.max_players)}
         self.possible_agents = list(self.agent_map.keys())
@@ -68,7 +92,7 @@ class ClueEnvironment(AECEnv):
         # 324 - accusations or suggestion ( 9 rooms x 6 people x 6 weapons)
         # 1 - choose to make an accusation or not
         # 21 - which card to show accusor to disprove it
-        self.action_spaces = {
+        self.action_spaces: Dict[str, spaces.Space] = {
             i: spaces.Discrete(9 + 324 + 1 + 21) for i in self.possible_agents
         }  # (9+324+1+21 = 355 actions)
 
@@ -85,7 +109,14 @@ class ClueEnvironment(AECEnv):
                             "suggestions": spaces.MultiBinary([50, 39]),  # 50x39 (1950)
                             # Private knowledge:
                             "card locations": spaces.MultiBinary([6, 21]),  # 6x21 (126)
-                        }  # 2194 flattened
+                            # Optional: what each suggestion is worth (324). The keys
+                            #  are sorted, so this one goes on the end.
+                            **(
+                                {"value of suggestions": spaces.Box(0, 1, (324,))}
+                                if information_gain
+                                else {}
+                            ),
+                        }  # 2194 flattened, or 2518 with the information gain
                     ),
                     "action_mask": spaces.MultiBinary(
                         9 + 324 + 1 + 21
@@ -224,7 +255,9 @@ class ClueEnvironment(AECEnv):
         self.num_suggestions = 0
         self._elapsed_steps = 0
 
-        random.seed(seed)
+        # Without a seed carry on with the current random streams
+        if seed is not None:
+            self.seed(seed)
 
         self.clue.new_game(self.clue.pick_players())
 
@@ -234,7 +267,12 @@ class ClueEnvironment(AECEnv):
         self._cumulative_rewards = {i: 0 for i in self.agents}
         self.terminations = {i: False for i in self.agents}
         self.truncations = {i: False for i in self.agents}
-        self.infos: Dict[str, Dict] = {i: {} for i in self.agents}
+        self.infos: Dict[str, Dict] = {
+            i: {} if self.env_index is None else {"env_index": self.env_index}
+            for i in self.agents
+        }
+        if self.hash_in_info:
+            self._hash_info()
 
         # TODO: HERE Need to make the agent names not be ints coz it fails assert
         # current_player when current player is 0
@@ -243,18 +281,36 @@ class ClueEnvironment(AECEnv):
 
     def observe(self, agent: str) -> Optional[ObsType]:
         player_idx = self.agent_map[agent]
+        start = self.stats.now() if self.stats is not None else 0
         knowledge = self.clue.get_player_knowledge_v1(player_idx)
-        legal = self.clue.legal_actions()
-
+        if self.information_gain:
+            knowledge["value of suggestions"] = self.suggestion_information(player_idx)
         flat_knowledge = spaces.flatten(
             self.observation_spaces[agent]["observation"], knowledge
         )  # here copy what FlattenSpaceWrapper does.
+        if self.stats is not None:
+            self.stats.record("observe", self.clue.current_step_kind, start)
 
         return {
             "observation": flat_knowledge,
-            "action_mask": legal,
+            "action_mask": self.action_mask(),
         }
 
+    def action_mask(self) -> np.ndarray:
+        """The legal actions of the player to move"""
+        return self.clue.legal_actions()
+
+    def suggestion_information(self, player_idx: int) -> np.ndarray:
+        """The information gain of each suggestion the player could make,
+        scaled to [0, 1]"""
+        try:
+            gains = suggestion_gains_from_state(
+                self.clue, player_idx, OBS_INFORMATION_SAMPLES, self.information_rng
+            )
+        except Contradiction:
+            return np.zeros(324)
+        return cast(np.ndarray, np.minimum(gains.ravel() / MAX_GAIN, 1))
+
     def step(self, action: ActionType) -> None:
         if (
             self.truncations[self.agent_selection]
@@ -270,6 +326,8 @@ class ClueEnvironment(AECEnv):
         # 21 - which card to show accusor to disprove it
 
         assert self.agent_selection == self.possible_agents[self.clue.current_player]
+        start = self.stats.now() if self.stats is not None else 0
+        step_kind = self.clue.current_step_kind
 
         # # the agent which stepped last had its _cumulative_rewards accounted for
         # # (because it was returned by last()), so the _cumulative_rewards for this
@@ -279,118 +337,108 @@ class ClueEnvironment(AECEnv):
         #     self._cumulative_rewards[k] = 0
         self._clear_rewards()
 
-        # assume that the action is legal?
-        if self.clue.current_step_kind == StepKind.MOVE:
-            if action >= self.clue.NUM_ROOMS:
-                with open("test_output_crashed.txt", "w") as f:
-                    f.write(cast(str, self.render()))
-            # The first 9 values represent the position output
-            self.clue.move_player(action, towards_room=True)
-
-        elif self.clue.current_step_kind == StepKind.SUGGESTION:
-            self.num_suggestions = self.num_suggestions + 1
-            # Decode the suggestion
-            (
-                person,
-                weapon,
-                room,
-            ) = CardState.suggestion_one_hot_decode(action - 9)
-
-            # Who is the suggestor:
-            suggestor_idx = self.clue.current_player
-
-            # Go around the table until someone can disprove it
-            cant_disprove, can_disprove_idx = self.clue.make_suggestion(
-                room_idx=room, person_idx=person, weapon_idx=weapon
-            )
-
-            # push down the old history and store the new history
-            self.clue.suggestions[1:] = self.clue.suggestions[0:-1]
-            self.clue.suggestions[0] = CardState.encode_suggestion_history(
-                room,
-                person,
-                weapon,
-                suggestor_idx=suggestor_idx,
-                cant_disprove=cant_disprove,
-                can_disprove_idx=can_disprove_idx,
-            )
-            assert self.clue.get_last_suggestor() == suggestor_idx
-
-        elif self.clue.current_step_kind == StepKind.DISPROVE_SUGGESTION:
-            suggestor_idx = self.clue.get_last_suggestor()
-            # The card to show is in the last 21 of the action array
-            self.clue.show_player_card(
-                disprover_idx=self.agent_map[self.agent_selection],
-                deck_idx=action - (9 + 324 + 1),
-            )
-
-        elif self.clue.current_step_kind == StepKind.ACCUSATION:
-            # Check for an accusation:
-            accusation = action - 9
-
-            correct = self.clue.make_accusation(accusation)
+        correct, accuser = self.play(action)
 
-            if correct is True:
+        if correct is True:
+            if self.clue.should_log_actions:
                 self.clue.log_action(
                     f"Before Setting rewards on win\n "
                     f"- cum_rew {self._cumulative_rewards.values()}, \n"
                     f" - rewards {self.rewards.values()} ."
                 )
 
-                self.rewards[self.agent_selection] = (
-                    self.rewards[self.agent_selection] + 100
-                )
-                self.terminations[self.agent_selection] = True
-                # remaining players just now lost - end of game
-                for player, terminated in self.terminations.items():
-                    if not terminated:
-                        self.rewards[player] = self.rewards[player] - 100
-                        self.terminations[player] = True
-            elif correct is False:
-                # We lost, but still need to stick around to tell the other players
-                # which cards we have.
+            self.rewards[accuser] = self.rewards[accuser] + 100
+            self.terminations[accuser] = True
+            # remaining players just now lost - end of game
+            for player, terminated in self.terminations.items():
+                if not terminated:
+                    self.rewards[player] = self.rewards[player] - 100
+                    self.terminations[player] = True
+        elif correct is False:
+            # We lost, but still need to stick around to tell the other players
+            # which cards we have.
+            if self.clue.should_log_actions:
                 self.clue.log_action(
                     f"before Setting rewards on lose\n - cum_rew "
                     f" {self._cumulative_rewards.values()}, \n"
                     f" - rewards {self.rewards.values()} ."
                 )
 
-                # if everyone else is terminated then we need to terminate too
-                if self.clue.game_over:
-                    self.terminations[self.agent_selection] = True
-                    for player, terminated in self.terminations.items():
-                        self.terminations[player] = True
-                        self.rewards[self.agent_selection] = (
-                            self.rewards[self.agent_selection] - 100
-                        )
-            # Else correct is None and they decided against making accusation
+            # if everyone else is terminated then we need to terminate too
+            if self.clue.game_over:
+                self.terminations[accuser] = True
+                for player, terminated in self.terminations.items():
+                    self.terminations[player] = True
+                    self.rewards[accuser] = self.rewards[accuser] - 100
+        # Else correct is None and they decided against making accusation
 
         self.agent_selection = self.possible_agents[self.clue.current_player]
+        if self.hash_in_info:
+            self._hash_info()
 
         self._elapsed_steps = self._elapsed_steps + 1
 
         if self._max_episode_steps and self._elapsed_steps >= self._max_episode_steps:
-            self.clue.log_action(
-                f"About to truncate \n - cum_rew {self._cumulative_rewards.values()},"
-                f" \n - rewards {self.rewards.values()} ."
-            )
+            if self.clue.should_log_actions:
+                self.clue.log_action(
+                    f"About to truncate \n - cum_rew "
+                    f"{self._cumulative_rewards.values()}, \n"
+                    f" - rewards {self.rewards.values()} ."
+                )
             for player in self.truncations:
                 self.truncations[player] = True
                 self.rewards[player] = self.rewards[player] - 100
+            if self.stats is not None:
+                self.stats.count("truncations")
 
         self._cumulative_rewards
         self._accumulate_rewards()
 
+        if self.stats is not None:
+            self.stats.record("step", step_kind, start)
+
         if self.render_mode == "human":
             self.render()
 
+    def _hash_info(self) -> None:
+        player_idx = self.clue.current_player
+        self.infos[self.possible_agents[player_idx]]["information_hash"] = np.uint64(
+            self.clue.information_hash(player_idx)
+        )
+
+    def play(self, action: ActionType) -> Tuple[Optional[bool], str]:
+        """Apply the action of the player to move. Returns whether an
+        accusation was correct, or None if there was none, and the agent who
+        made it."""
+        # assume that the action is legal?
+        if self.clue.current_step_kind == StepKind.MOVE:
+            if action >= self.clue.NUM_ROOMS:
+                with open("test_output_crashed.txt", "w") as f:
+                    f.write(cast(str, self.render()))
+        elif self.clue.current_step_kind == StepKind.SUGGESTION:
+            self.num_suggestions = self.num_suggestions + 1
+
+        # Move, suggest, disprove or accuse - correct is only set by accusations
+        return self.clue.apply_action(action), self.agent_selection
+
     def render(self) -> Optional[Union[np.ndarray, str, list]]:
         render_response = self.clue.render()
         print(render_response)
         return render_response
 
     def seed(self, seed: Optional[int] = None) -> None:
-        np.random.seed(seed)
+        self.clue.seed(seed)
+        self.information_rng = np.random.default_rng(seed)
+
+    def get_stats(self, reset: bool = False) -> Dict:
+        """The timings and event counts since the env was made (or last reset
+        with reset=True), or {} if it wasn't made with collect_stats=True"""
+        if self.stats is None:
+            return {}
+        stats = self.stats.as_dict()
+        if reset:
+            self.stats.reset()
+        return stats
 
     def close(self) -> None:
         pass
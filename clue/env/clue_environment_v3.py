@@ -0,0 +1,133 @@
+from typing import Any, Optional, Tuple
+
+import numpy as np
+from gymnasium import spaces
+from pettingzoo.utils import wrappers
+from pettingzoo.utils.env import ActionType, AECEnv
+
+from clue.cards import DECK
+from clue.env import clue_environment_v2
+from clue.posterior import ENVELOPE_SHAPE
+from clue.state import (
+    DISPROVE_ACTION_OFFSET,
+    NO_ACCUSATION_ACTION,
+    SUGGESTION_ACTION_OFFSET,
+    StepKind,
+)
+
+"""
+A whole turn in one step: v2 takes up to three - the move, the suggestion and
+the accusation - each with its own observation. Here the player to move
+chooses the move and the suggestion at once, as one (person, weapon, room)
+index like v2's suggestions:
+
+    0:324    - head for the room, and suggest the person and weapon in the
+               room they end up in, if they get into one
+    324:648  - make the accusation instead of moving
+    648:669  - the card to show when disproving a suggestion
+
+The accusation is made at the start of the turn rather than after the
+suggestion, so a turn is still one step: it's no loss to accuse with what was
+learnt a turn later. Once a suggestion has been answered the env passes on
+the accusation for the suggestor.
+
+A suggestion is disproved in a step of the disprover's own, or with
+auto_disprove=True by the env: it shows a card the suggestor has already seen
+if it can, so they learn nothing new.
+
+The action space is a Discrete(669) and "action_mask" has the legal actions,
+as in v2, so masked policies and pettingzoo's api_test work unchanged. The
+observations are the same as v2's.
+"""
+
+NUM_TURNS = int(np.prod(ENVELOPE_SHAPE))
+ACCUSATION_OFFSET = NUM_TURNS
+CARD_OFFSET = ACCUSATION_OFFSET + NUM_TURNS
+NUM_ACTIONS = CARD_OFFSET + len(DECK)
+
+
+def env(render_mode: Optional[str] = None) -> AECEnv:
+    internal_render_mode = render_mode if render_mode != "ansi" else "human"
+    env = ClueEnvironment(render_mode=internal_render_mode, max_episode_steps=200)
+    if render_mode == "ansi":
+        env = wrappers.CaptureStdoutWrapper(env)
+
+    return env
+
+
+def turn_action(person: int, weapon: int, room: int) -> int:
+    """The action that heads for the room, suggesting the person and weapon"""
+    return int(np.ravel_multi_index((person, weapon, room), ENVELOPE_SHAPE))
+
+
+class ClueEnvironment(clue_environment_v2.ClueEnvironment):
+    def __init__(self, *args: Any, auto_disprove: bool = False, **kwargs: Any) -> None:
+        """Takes v2's arguments, and
+        auto_disprove : the env picks the card to show rather than the disprover.
+        """
+        self.auto_disprove = auto_disprove
+        super().__init__(*args, **kwargs)
+
+        self.action_spaces = {
+            i: spaces.Discrete(NUM_ACTIONS) for i in self.possible_agents
+        }
+        mask_space = spaces.MultiBinary(NUM_ACTIONS)
+        for i in self.possible_agents:
+            self.observation_spaces[i]["action_mask"] = mask_space
+            self.flat_obs_space[i]["action_mask"] = mask_space
+
+    def action_mask(self) -> np.ndarray:
+        mask = np.zeros(NUM_ACTIONS, dtype=np.int8)
+        if self.clue.current_step_kind == StepKind.DISPROVE_SUGGESTION:
+            mask[CARD_OFFSET:] = self.clue._legal_disprove()
+            return mask
+
+        # Every suggestion can be made in any room they get into
+        rooms = self.clue.board.legal_move_towards(self.clue.current_player)
+        mask[:NUM_TURNS] = np.broadcast_to(rooms, ENVELOPE_SHAPE).reshape(-1)
+        mask[ACCUSATION_OFFSET:CARD_OFFSET] = self.clue._legal_accusation().reshape(-1)
+        return mask
+
+    def play(self, action: ActionType) -> Tuple[Optional[bool], str]:
+        action = int(action)
+        accuser = self.agent_selection
+
+        if self.clue.current_step_kind == StepKind.DISPROVE_SUGGESTION:
+            self.clue.apply_action(DISPROVE_ACTION_OFFSET + action - CARD_OFFSET)
+            self.pass_accusation()
+            return None, accuser
+
+        if action >= ACCUSATION_OFFSET:
+            return self.clue.make_accusation(action - ACCUSATION_OFFSET), accuser
+
+        person, weapon, room = np.unravel_index(action, ENVELOPE_SHAPE)
+        self.clue.apply_action(int(room))
+        if self.clue.current_step_kind == StepKind.SUGGESTION:
+            self.num_suggestions = self.num_suggestions + 1
+            in_room = self.clue.board.which_room(self.clue.current_player)
+            self.clue.apply_action(
+                SUGGESTION_ACTION_OFFSET + turn_action(person, weapon, in_room)
+            )
+            if (
+                self.clue.current_step_kind == StepKind.DISPROVE_SUGGESTION
+                and self.auto_disprove
+            ):
+                self.clue.apply_action(self.disprove())
+        # Unless they didn't reach a room, or are waiting for the disprover
+        self.pass_accusation()
+        return None, accuser
+
+    def pass_accusation(self) -> None:
+        """End the suggestor's turn, if their suggestion has been answered"""
+        if self.clue.current_step_kind == StepKind.ACCUSATION:
+            self.clue.apply_action(NO_ACCUSATION_ACTION)
+
+    def disprove(self) -> int:
+        """The card for the disprover to show: one the suggestor has already
+        seen if they can, else any of theirs in the suggestion"""
+        shown = self.clue.player_card_knowledge[
+            self.clue.get_last_suggestor(), self.clue.current_player
+        ]
+        legal = self.clue._legal_disprove()
+        keys = legal * (2 + shown) + self.clue.rng.random(len(legal))
+        return DISPROVE_ACTION_OFFSET + int(np.argmax(keys))
@@ -0,0 +1,373 @@
+"""
+Evaluate a checkpoint, or any policy, over many seeded games.
+
+    python -m clue.evaluate log/rps/dqn/policy_clue_v2_128.pth --games 6000
+
+The candidate plays every game against the --opponents, one policy spec for
+all five other seats or one each (see clue.policies). It sits in Miss
+Scarlet's seat, player 0, like the agent train_agents_v2.py trains, as the
+environment only lets the other players accuse once they have seen all but
+three cards. --rotate-seats has it take each seat in turn instead. Every game
+has its own seed, from --seed, so the deals are the same whatever the number
+of workers. The policies' random choices depend on how the games are split
+and batched too.
+
+The games are split between a pool of worker processes, each playing a few at
+a time in lockstep so that a checkpoint chooses the actions of every game
+waiting on it with one batch through its network.
+
+It reports the candidate's win rate with a Wilson confidence interval, the
+mean game length in steps and the suggestions made per game. Games that hit
+--max-steps are truncated and won by no-one. Evaluating "random" as the
+candidate gives the baseline to beat.
+"""
+import argparse
+import json
+import math
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    cast,
+)
+
+import numpy as np
+
+from clue.env.clue_environment_v2 import ClueEnvironment
+from clue.policies import SeatPolicy, make_policy
+from clue.state import CardState, StepKind
+
+NUM_SEATS = CardState.MAX_PLAYERS
+
+# z for a two sided 95% interval
+Z_95 = 1.959964
+
+
+@dataclass
+class GameResult:
+    game: int
+    seat: int  # the candidate's
+    winner: int  # -1 if no-one won
+    steps: int
+    suggestions: int
+    seat_suggestions: int
+    truncated: bool
+
+
+@dataclass
+class EvaluationJob:
+    games: Sequence[int]
+    seeds: Sequence[np.random.SeedSequence]
+    policy_seed: np.random.SeedSequence
+    candidate: str
+    opponents: Sequence[str]
+    hidden_sizes: Optional[Sequence[int]]  # the candidate's, if not in its name
+    rotate_seats: bool = False
+    lockstep: int = 16
+    max_steps: int = 500
+
+
+def checkpoint_spec(spec: str) -> str:
+    """A bare path to a .pth file is a checkpoint"""
+    return f"checkpoint:{spec}" if spec.endswith(".pth") and ":" not in spec else spec
+
+
+def net_size(spec: str, default: int = 128) -> int:
+    """The hidden layer size train_agents_v2.py puts in a checkpoint's name,
+    e.g. policy_clue_v2_128.pth"""
+    match = re.search(r"_(\d+)\.pth$", spec)
+    return int(match.group(1)) if match else default
+
+
+def wilson_interval(wins: int, games: int, z: float = Z_95) -> Tuple[float, float]:
+    """The Wilson score interval of a win rate, which unlike the normal
+    approximation stays within [0, 1] and is good for rates near either end"""
+    if games == 0:
+        return 0.0, 1.0
+    rate = wins / games
+    scale = 1 + z**2 / games
+    centre = (rate + z**2 / (2 * games)) / scale
+    half_width = (
+        z * math.sqrt(rate * (1 - rate) / games + z**2 / (4 * games**2)) / scale
+    )
+    return max(0.0, centre - half_width), min(1.0, centre + half_width)
+
+
+def load_policy(
+    spec: str,
+    rng: np.random.Generator,
+    hidden_sizes: Optional[Sequence[int]] = None,
+) -> SeatPolicy:
+    """make_policy(), with a checkpoint's layers from its name unless given"""
+    if hidden_sizes is None:
+        hidden_sizes = [net_size(spec)] * 4
+    return make_policy(spec, rng, hidden_sizes=hidden_sizes)
+
+
+# A game to play: its result to fill in, its seed and the policy in each seat
+Game = Tuple[GameResult, np.random.SeedSequence, Sequence[SeatPolicy]]
+# Called after every step with the env, the game's result, the player who
+# moved, the observation and action mask they chose from, their action and
+# whether the game is over
+StepHook = Callable[
+    [ClueEnvironment, GameResult, int, np.ndarray, np.ndarray, int, bool], None
+]
+
+
+def play_seated(
+    games: Iterable[Game],
+    lockstep: int = 16,
+    max_steps: int = 500,
+    on_step: Optional[StepHook] = None,
+) -> Iterator[GameResult]:
+    """Play the games a few at a time in lockstep, batching each policy's
+    actions across the games waiting on it, and yield each result as its game
+    ends. A game is only taken from games when there is room for it, so there
+    can be any number of them."""
+    pending = iter(games)
+
+    def start(
+        env: ClueEnvironment,
+    ) -> Optional[Tuple[ClueEnvironment, GameResult, Sequence[SeatPolicy]]]:
+        game = next(pending, None)
+        if game is None:
+            return None
+        result, seed, seats = game
+        env.clue.seed(seed)
+        env.reset()
+        return env, result, seats
+
+    playing = []
+    for _ in range(lockstep):
+        started = start(ClueEnvironment(max_episode_steps=max_steps))
+        if started is None:
+            break
+        playing.append(started)
+
+    while playing:
+        states = [env.clue for env, _, _ in playing]
+        observations = [
+            cast(dict, env.observe(env.agent_selection)) for env, _, _ in playing
+        ]
+        obs = np.array([o["observation"] for o in observations])
+        masks = np.array([o["action_mask"] for o in observations])
+
+        movers = [
+            seats[state.current_player] for state, (_, _, seats) in zip(states, playing)
+        ]
+        actions = np.zeros(len(playing), dtype=np.int64)
+        for policy in dict.fromkeys(movers):
+            batch = [i for i, mover in enumerate(movers) if mover is policy]
+            actions[batch] = policy.act(
+                [states[i] for i in batch], obs[batch], masks[batch]
+            )
+
+        still_playing = []
+        for i, (env, result, seats) in enumerate(playing):
+            player = env.clue.current_player
+            if env.clue.current_step_kind == StepKind.SUGGESTION:
+                result.suggestions += 1
+                result.seat_suggestions += player == result.seat
+            env.step(int(actions[i]))
+            result.steps += 1
+
+            truncated = any(env.truncations.values())
+            done = env.clue.game_over or truncated
+            if done:
+                result.truncated = truncated and not env.clue.game_over
+                if env.clue.winner is not None:
+                    result.winner = env.clue.winner
+            if on_step is not None:
+                on_step(env, result, player, obs[i], masks[i], int(actions[i]), done)
+            if not done:
+                still_playing.append((env, result, seats))
+                continue
+            yield result
+            started = start(env)
+            if started is not None:
+                still_playing.append(started)
+        playing = still_playing
+
+
+def play_games(job: EvaluationJob) -> List[GameResult]:
+    """Play a worker's games of the candidate against the opponents"""
+    rng = np.random.default_rng(job.policy_seed)
+    policies: Dict[str, SeatPolicy] = {
+        spec: load_policy(
+            spec, rng, job.hidden_sizes if spec == job.candidate else None
+        )
+        for spec in dict.fromkeys([job.candidate, *job.opponents])
+    }
+    candidate = policies[job.candidate]
+    opponents = [policies[spec] for spec in job.opponents]
+
+    games = []
+    for game, seed in zip(job.games, job.seeds):
+        seat = game % NUM_SEATS if job.rotate_seats else 0
+        seats = opponents[:seat] + [candidate] + opponents[seat:]
+        games.append((GameResult(game, seat, -1, 0, 0, 0, False), seed, seats))
+    return list(play_seated(games, job.lockstep, job.max_steps))
+
+
+def evaluate(
+    candidate: str,
+    opponents: Sequence[str],
+    num_games: int,
+    workers: int = 1,
+    seed: int = 0,
+    lockstep: int = 16,
+    max_steps: int = 500,
+    hidden_sizes: Optional[Sequence[int]] = None,
+    rotate_seats: bool = False,
+) -> List[GameResult]:
+    """Play num_games games of the candidate policy against the opponents,
+    returning a result for each game in order"""
+    candidate = checkpoint_spec(candidate)
+    opponents = [checkpoint_spec(spec) for spec in opponents]
+    if len(opponents) == 1:
+        opponents = opponents * (NUM_SEATS - 1)
+    if len(opponents) != NUM_SEATS - 1:
+        raise ValueError(f"Expected 1 or {NUM_SEATS - 1} opponents")
+
+    game_seeds = np.random.SeedSequence(seed).spawn(num_games + workers)
+    splits = np.array_split(np.arange(num_games), workers)
+    jobs = [
+        EvaluationJob(
+            games=[int(game) for game in games],
+            seeds=[game_seeds[game] for game in games],
+            policy_seed=game_seeds[num_games + worker],
+            candidate=candidate,
+            opponents=opponents,
+            hidden_sizes=hidden_sizes,
+            rotate_seats=rotate_seats,
+            lockstep=lockstep,
+            max_steps=max_steps,
+        )
+        for worker, games in enumerate(splits)
+        if len(games)
+    ]
+    if workers == 1:
+        shares = [play_games(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shares = list(pool.map(play_games, jobs))
+    return sorted(
+        (result for share in shares for result in share), key=lambda r: r.game
+    )
+
+
+def summarize(results: Sequence[GameResult]) -> Dict:
+    if not results:
+        raise ValueError("No games to summarize")
+    games = len(results)
+    wins = sum(result.winner == result.seat for result in results)
+    low, high = wilson_interval(wins, games)
+    steps = np.array([result.steps for result in results], dtype=float)
+    by_seat: Dict[int, List[bool]] = {}
+    for result in results:
+        by_seat.setdefault(result.seat, []).append(result.winner == result.seat)
+    return {
+        "games": games,
+        "wins": wins,
+        "win_rate": wins / games,
+        "win_rate_95": [low, high],
+        "win_rate_by_seat": {
+            seat: float(np.mean(won)) for seat, won in sorted(by_seat.items())
+        },
+        "opponent_wins": sum(
+            result.winner not in (-1, result.seat) for result in results
+        ),
+        "truncated": sum(result.truncated for result in results),
+        "mean_steps": float(steps.mean()),
+        "steps_stderr": float(steps.std(ddof=1) / math.sqrt(games))
+        if games > 1
+        else 0.0,
+        "suggestions_per_game": float(
+            np.mean([result.suggestions for result in results])
+        ),
+        "candidate_suggestions_per_game": float(
+            np.mean([result.seat_suggestions for result in results])
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Evaluate a policy over many games")
+    parser.add_argument(
+        "candidate", help="a checkpoint's .pth file or a policy spec, e.g. heuristic"
+    )
+    parser.add_argument(
+        "--opponents",
+        default="random",
+        help="comma separated policy for each other seat, or one for them all",
+    )
+    parser.add_argument(
+        "--rotate-seats",
+        action="store_true",
+        help="have the candidate take each seat in turn rather than player 0's",
+    )
+    parser.add_argument("--games", type=int, default=1200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--lockstep", type=int, default=16)
+    parser.add_argument("--max-steps", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--net-size",
+        type=int,
+        help="hidden layer size of a checkpoint, if not in its file name",
+    )
+    parser.add_argument("--out", help="write the summary and each game as JSON")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = evaluate(
+        args.candidate,
+        args.opponents.split(","),
+        args.games,
+        workers=args.workers,
+        seed=args.seed,
+        lockstep=args.lockstep,
+        max_steps=args.max_steps,
+        hidden_sizes=[args.net_size] * 4 if args.net_size else None,
+        rotate_seats=args.rotate_seats,
+    )
+    elapsed = time.perf_counter() - start
+    summary = summarize(results)
+
+    low, high = summary["win_rate_95"]
+    print(
+        f"{args.candidate} against {args.opponents}: {summary['games']} games "
+        f"in {elapsed:.1f}s"
+    )
+    print(f"win rate {summary['win_rate']:.1%} (95% CI {low:.1%} - {high:.1%})")
+    print(
+        f"opponents won {summary['opponent_wins']}, "
+        f"{summary['truncated']} truncated at {args.max_steps} steps"
+    )
+    print(
+        f"mean length {summary['mean_steps']:.1f} steps "
+        f"(+/- {summary['steps_stderr']:.1f}), "
+        f"{summary['suggestions_per_game']:.1f} suggestions per game, "
+        f"{summary['candidate_suggestions_per_game']:.1f} by the candidate"
+    )
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(
+                {"summary": summary, "games": [asdict(result) for result in results]},
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+A structured log of what happens in a game.
+
+Each event is a row of small integers - the kind of event and up to seven
+arguments - written into a preallocated int16 array. Nothing is formatted
+until the log is rendered, so logging costs about the same as not logging.
+"""
+from enum import IntEnum
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from clue.cards import DECK, PEOPLE_CARDS, ROOM_CARDS, WEAPON_CARDS
+from clue.map import ROOM_NAMES, Board
+
+MAX_EVENT_ARGS = 7
+
+
+class EventKind(IntEnum):
+    # Arguments are given in order after the name
+    MESSAGE = 0  # index into EventLog.messages
+    NEW_GAME = 1  # the players
+    MURDER = 2  # person, weapon, room card idx
+    DEALT = 3  # player, their cards
+    ROLLED = 4  # player, die roll
+    MOVED = 5  # player, position idx
+    ENTERED_ROOM = 6  # player, room idx
+    BOARD = 7  # the position idx of each player
+    SUGGESTED = 8  # player, person idx, weapon idx, room idx
+    CANT_DISPROVE = 9  # player
+    CAN_DISPROVE = 10  # player
+    SHOWED_CARD = 11  # disprover, suggestor, card idx
+    NO_ACCUSATION = 12  # player
+    ACCUSED = 13  # player, person idx, weapon idx, room idx
+    WON = 14  # player
+    ELIMINATED = 15  # player
+    GAME_OVER = 16
+
+
+class EventLog:
+    def __init__(self, capacity: int = 1024) -> None:
+        # column 0 is the kind, unused arguments are -1
+        self.events = np.full((capacity, 1 + MAX_EVENT_ARGS), -1, dtype=np.int16)
+        self.count = 0
+        # the text of MESSAGE events
+        self.messages: List[str] = []
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[Tuple[int, ...]]:
+        for row in self.events[: self.count]:
+            yield tuple(int(value) for value in row)
+
+    def append(self, kind: EventKind, *args: int) -> None:
+        if self.count == len(self.events):
+            grown = np.full_like(self.events, -1)
+            self.events = np.concatenate((self.events, grown))
+        row = self.events[self.count]
+        row[0] = kind
+        row[1 : 1 + len(args)] = args
+        self.count += 1
+
+    def message(self, text: str) -> None:
+        self.append(EventKind.MESSAGE, len(self.messages))
+        self.messages.append(text)
+
+    def clear(self) -> None:
+        self.events[: self.count] = -1
+        self.count = 0
+        self.messages.clear()
+
+    def render(self, board: Board) -> str:
+        """The events as text, one or more lines each. board is needed to
+        describe positions."""
+        return "\n".join(self.describe(event, board) for event in self)
+
+    def describe(self, event: Tuple[int, ...], board: Board) -> str:
+        kind, *args = event
+        if kind == EventKind.MESSAGE:
+            return self.messages[args[0]]
+
+        if kind == EventKind.NEW_GAME:
+            players = [PEOPLE_CARDS[i].name for i in args if i >= 0]
+            return (
+                f"New game started with {len(players)} players: "
+                f"{', '.join(players)}."
+            )
+        if kind == EventKind.MURDER:
+            person, weapon, room = (DECK[i].name for i in args[:3])
+            return (
+                f"OMG there has been a murder: {person} did it in the {room} with "
+                f"the {weapon}!"
+            )
+        if kind == EventKind.BOARD:
+            return board.generate_board_string(args[: len(PEOPLE_CARDS)])
+        if kind == EventKind.GAME_OVER:
+            return "There are no players left - GAME OVER"
+
+        # The rest are all about one player
+        name = PEOPLE_CARDS[args[0]].name
+        if kind == EventKind.DEALT:
+            cards = [DECK[i].name for i in args[1:] if i >= 0]
+            return f"{name} got:\n  - " + "\n  - ".join(cards)
+        if kind == EventKind.ROLLED:
+            return f"{name} rolled {args[1]}"
+        if kind == EventKind.MOVED:
+            cell = board.locations[args[1]]
+            return f"{name} moved to cell {cell.i}, {cell.j}"
+        if kind == EventKind.ENTERED_ROOM:
+            return f"{name} entered the {ROOM_NAMES[args[1]]} "
+        if kind == EventKind.SUGGESTED:
+            return (
+                f"{name} suggested:{PEOPLE_CARDS[args[1]].name} in the "
+                f"{ROOM_CARDS[args[3]].name} with the {WEAPON_CARDS[args[2]].name}"
+            )
+        if kind == EventKind.CANT_DISPROVE:
+            return f" - {name} can't disprove it"
+        if kind == EventKind.CAN_DISPROVE:
+            return f" - {name} CAN disprove it"
+        if kind == EventKind.SHOWED_CARD:
+            return (
+                f"{name} disproves {PEOPLE_CARDS[args[1]].name}'s suggestion by "
+                f"showing them {DECK[args[2]].name}."
+            )
+        if kind == EventKind.NO_ACCUSATION:
+            return f"{name} decided not to make an accusation"
+        if kind == EventKind.ACCUSED:
+            return (
+                f"{name} made an accusation: {PEOPLE_CARDS[args[1]].name} in the "
+                f"{ROOM_CARDS[args[3]].name} with the {WEAPON_CARDS[args[2]].name}"
+            )
+        if kind == EventKind.WON:
+            return f"{name} is correct and has won!"
+        if kind == EventKind.ELIMINATED:
+            return f"{name} is wrong - they are out!"
+        raise ValueError(f"Unknown event kind {kind}")
@@ -0,0 +1,366 @@
+"""
+One process holding a checkpoint, serving the Q values or greedy actions of
+its network to any number of rollout workers over a Unix socket.
+
+    python -m clue.inference_server serve log/rps/dqn/policy_clue_v2_128.pth
+    python -m clue.datagen --seats server:/tmp/clue_inference.sock ...
+    python -m clue.inference_server reload log/league/latest.pth
+
+Rather than every worker loading the checkpoint and running the network on a
+few rows at a time, the workers send their observations and action masks to
+the server (see InferenceClient, or the "server:SOCKET" policy). The server
+gathers the requests that arrive within --max-wait-ms of the first, up to
+--max-batch rows, and answers them all from one forward pass, so the workers'
+requests are micro-batched at a bounded cost in latency.
+
+A reload request swaps in the weights of another checkpoint of the same
+shape between two batches, so the workers pick up new weights without
+restarting. A request the server can't decode gets an error reply, and a
+worker that doesn't read its replies within --send-timeout is disconnected
+rather than holding up the others.
+
+The protocol is a header of the request kind and the payload length, as
+struct "<BI", followed by the payload. Observations go as float16 - they are
+0/1 flags and distances in [0, 1] - and masks as a byte per action.
+"""
+import argparse
+import json
+import os
+import selectors
+import socket
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from clue.datagen import NUM_ACTIONS, OBS_SIZE
+from clue.policies import CheckpointPolicy, SeatPolicy
+from clue.state import CardState
+
+SOCKET_PATH = os.path.join("/tmp", "clue_inference.sock")
+
+HEADER = struct.Struct("<BI")
+ROWS = struct.Struct("<I")
+
+# Request kinds
+ACT = 1
+Q_VALUES = 2
+RELOAD = 3
+STATS = 4
+# Reply kinds
+OK = 0
+ERROR = 255
+
+
+def encode_rows(observations: np.ndarray, masks: np.ndarray) -> bytes:
+    return (
+        ROWS.pack(len(observations))
+        + np.ascontiguousarray(observations, dtype=np.float16).tobytes()
+        + np.ascontiguousarray(masks, dtype=bool).tobytes()
+    )
+
+
+def decode_rows(payload: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    if len(payload) < ROWS.size:
+        raise ValueError("The rows are missing their count")
+    (rows,) = ROWS.unpack_from(payload)
+    obs_bytes = rows * OBS_SIZE * 2
+    if len(payload) != ROWS.size + obs_bytes + rows * NUM_ACTIONS:
+        raise ValueError(f"{len(payload)} bytes aren't {rows} rows")
+    observations = np.frombuffer(
+        payload, dtype=np.float16, count=rows * OBS_SIZE, offset=ROWS.size
+    ).reshape(rows, OBS_SIZE)
+    masks = np.frombuffer(
+        payload, dtype=bool, count=rows * NUM_ACTIONS, offset=ROWS.size + obs_bytes
+    ).reshape(rows, NUM_ACTIONS)
+    return observations, masks
+
+
+def recv_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("The inference server closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+@dataclass
+class Request:
+    conn: socket.socket
+    kind: int
+    observations: np.ndarray
+    masks: np.ndarray
+    arrived: float
+
+
+@dataclass
+class Connection:
+    sock: socket.socket
+    buffer: bytearray = field(default_factory=bytearray)
+
+
+class InferenceServer:
+    def __init__(
+        self,
+        checkpoint: str,
+        socket_path: str = SOCKET_PATH,
+        hidden_sizes: Sequence[int] = (128, 128, 128, 128),
+        max_batch: int = 512,
+        max_wait_ms: float = 2.0,
+        send_timeout: float = 1.0,
+    ) -> None:
+        self.policy = CheckpointPolicy(checkpoint, OBS_SIZE, hidden_sizes)
+        self.checkpoint = checkpoint
+        self.socket_path = socket_path
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.send_timeout = send_timeout
+        self.pending: List[Request] = []
+        self.stats = {"requests": 0, "rows": 0, "batches": 0, "reloads": 0}
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(socket_path)
+        self.listener.listen()
+        self.listener.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self.running = False
+
+    def serve_forever(self) -> None:
+        self.running = True
+        try:
+            while self.running:
+                self.serve_once()
+        finally:
+            self.close()
+
+    def serve_once(self, poll: float = 0.1) -> None:
+        """Wait for requests, at most poll seconds or until the oldest pending
+        one has waited max_wait, and answer them if it's time"""
+        timeout = poll
+        if self.pending:
+            waited = time.perf_counter() - self.pending[0].arrived
+            timeout = max(0.0, self.max_wait - waited)
+        for key, _ in self.selector.select(timeout):
+            if key.fileobj is self.listener:
+                conn, _ = self.listener.accept()
+                conn.setblocking(False)
+                self.selector.register(conn, selectors.EVENT_READ, Connection(conn))
+            else:
+                self._read(key.data)
+
+        rows = sum(len(request.observations) for request in self.pending)
+        if self.pending and (
+            rows >= self.max_batch
+            or time.perf_counter() - self.pending[0].arrived >= self.max_wait
+        ):
+            self._answer()
+
+    def stop(self) -> None:
+        self.running = False
+
+    def close(self) -> None:
+        for key in list(self.selector.get_map().values()):
+            self.selector.unregister(key.fileobj)
+            key.fileobj.close()  # type: ignore[union-attr]
+        self.selector.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def _read(self, connection: Connection) -> None:
+        try:
+            data = connection.sock.recv(1 << 20)
+        except ConnectionError:
+            data = b""
+        if not data:
+            self._drop(connection.sock)
+            return
+        connection.buffer += data
+
+        while len(connection.buffer) >= HEADER.size:
+            kind, length = HEADER.unpack_from(connection.buffer)
+            if len(connection.buffer) < HEADER.size + length:
+                break
+            payload = bytes(connection.buffer[HEADER.size : HEADER.size + length])
+            del connection.buffer[: HEADER.size + length]
+            self._handle(connection.sock, kind, payload)
+
+    def _handle(self, conn: socket.socket, kind: int, payload: bytes) -> None:
+        if kind in (ACT, Q_VALUES):
+            try:
+                observations, masks = decode_rows(payload)
+            except ValueError as e:
+                self._reply(conn, ERROR, str(e).encode())
+                return
+            self.pending.append(
+                Request(conn, kind, observations, masks, time.perf_counter())
+            )
+        elif kind == RELOAD:
+            path = payload.decode()
+            try:
+                self.policy.load(path)
+            except Exception as e:
+                self._reply(conn, ERROR, f"{type(e).__name__}: {e}".encode())
+                return
+            self.checkpoint = path
+            self.stats["reloads"] += 1
+            self._reply(conn, OK, b"")
+        elif kind == STATS:
+            stats = {**self.stats, "checkpoint": self.checkpoint}
+            self._reply(conn, OK, json.dumps(stats).encode())
+        else:
+            self._reply(conn, ERROR, f"Unknown request kind {kind}".encode())
+
+    def _answer(self) -> None:
+        pending, self.pending = self.pending, []
+        q_values = self.policy.q_values(
+            np.concatenate([request.observations for request in pending]),
+            np.concatenate([request.masks for request in pending]),
+        )
+        self.stats["requests"] += len(pending)
+        self.stats["rows"] += len(q_values)
+        self.stats["batches"] += 1
+
+        start = 0
+        for request in pending:
+            rows = q_values[start : start + len(request.observations)]
+            start += len(rows)
+            if request.kind == ACT:
+                reply = np.argmax(rows, axis=1).astype(np.int16).tobytes()
+            else:
+                reply = rows.astype(np.float32).tobytes()
+            self._reply(request.conn, OK, reply)
+
+    def _reply(self, conn: socket.socket, kind: int, payload: bytes) -> None:
+        if conn.fileno() < 0:
+            return  # dropped since it asked
+        conn.settimeout(self.send_timeout)
+        try:
+            conn.sendall(HEADER.pack(kind, len(payload)) + payload)
+        except OSError:
+            # Gone, or stalled: part of a reply may have been sent, so the
+            #  connection can't be used again
+            self._drop(conn)
+            return
+        conn.setblocking(False)
+
+    def _drop(self, conn: socket.socket) -> None:
+        self.selector.unregister(conn)
+        conn.close()
+        self.pending = [r for r in self.pending if r.conn is not conn]
+
+
+class InferenceClient:
+    def __init__(self, socket_path: str = SOCKET_PATH) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socket_path)
+
+    def _request(self, kind: int, payload: bytes) -> bytes:
+        self.sock.sendall(HEADER.pack(kind, len(payload)) + payload)
+        reply, length = HEADER.unpack(recv_exactly(self.sock, HEADER.size))
+        data = recv_exactly(self.sock, length)
+        if reply == ERROR:
+            raise ValueError(data.decode())
+        return data
+
+    def act(self, observations: np.ndarray, masks: np.ndarray) -> np.ndarray:
+        """The legal action with the highest Q value for each row"""
+        data = self._request(ACT, encode_rows(observations, masks))
+        return np.frombuffer(data, dtype=np.int16).astype(np.int64)
+
+    def q_values(self, observations: np.ndarray, masks: np.ndarray) -> np.ndarray:
+        """The Q values, -inf for the actions that aren't legal"""
+        data = self._request(Q_VALUES, encode_rows(observations, masks))
+        return np.frombuffer(data, dtype=np.float32).reshape(-1, NUM_ACTIONS)
+
+    def reload(self, checkpoint: str) -> None:
+        self._request(RELOAD, os.path.abspath(checkpoint).encode())
+
+    def stats(self) -> Dict:
+        stats: Dict = json.loads(self._request(STATS, b""))
+        return stats
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+class RemotePolicy(SeatPolicy):
+    """The greedy policy of the checkpoint an InferenceServer serves"""
+
+    def __init__(self, socket_path: str) -> None:
+        self.socket_path = socket_path
+        self.client: Optional[InferenceClient] = None
+
+    def act(
+        self,
+        states: Sequence[CardState],
+        observations: np.ndarray,
+        masks: np.ndarray,
+    ) -> np.ndarray:
+        # Connect on first use, so the policy can be made before a worker forks
+        if self.client is None:
+            self.client = InferenceClient(self.socket_path)
+        return self.client.act(observations, masks)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a checkpoint's actions")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="serve a checkpoint")
+    serve.add_argument("checkpoint")
+    serve.add_argument("--net-size", type=int, default=128)
+    serve.add_argument("--max-batch", type=int, default=512)
+    serve.add_argument("--max-wait-ms", type=float, default=2.0)
+    serve.add_argument(
+        "--send-timeout",
+        type=float,
+        default=1.0,
+        help="seconds before a worker that isn't reading its replies is dropped",
+    )
+    serve.add_argument("--threads", type=int, help="torch threads")
+
+    reload = commands.add_parser("reload", help="swap in a checkpoint's weights")
+    reload.add_argument("checkpoint")
+
+    commands.add_parser("stats", help="show what has been served")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        if args.threads:
+            import torch
+
+            torch.set_num_threads(args.threads)
+        server = InferenceServer(
+            args.checkpoint,
+            args.socket,
+            hidden_sizes=[args.net_size] * 4,
+            max_batch=args.max_batch,
+            max_wait_ms=args.max_wait_ms,
+            send_timeout=args.send_timeout,
+        )
+        print(f"Serving {args.checkpoint} on {args.socket}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    client = InferenceClient(args.socket)
+    if args.command == "reload":
+        client.reload(args.checkpoint)
+        print(f"Reloaded {args.checkpoint}")
+    else:
+        print(json.dumps(client.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Expected information gain of every suggestion.
+
+A suggestion is worth the mutual information between its outcome - who
+disproves it, and the card they show if the suggestor gets to see it - and
+the envelope: how many bits, on average, it takes off the entropy of the
+envelope.
+
+The belief is a set of deals of the cards consistent with what the player
+knows (clue.sampling), with their importance weights. For every deal the
+outcome of all 6x6x9 suggestions at once follows from where the players sit
+after the suggestor in PLAYER_ORDERBY_PLAYER: the first one holding any of the
+three cards disproves it. The disprover is assumed to pick uniformly among the
+suggested cards they hold. The outcomes and envelopes are then counted into an
+envelope x suggestion x outcome table with one bincount, so there is no loop
+over the suggestions.
+
+    gain = suggestion_gains_from_state(state, state.current_player, rng=rng)
+    gain[:, :, room]  # the suggestions that can be made in the room
+    gain.max(axis=(0, 1))  # the best suggestion in each room, to plan moves
+"""
+from typing import Optional
+
+import numpy as np
+
+from clue.deduction import ENVELOPE, Deduction
+from clue.posterior import CATEGORY_OFFSETS, ENVELOPE_SHAPE
+from clue.sampling import sample_weighted_deals
+from clue.state import PLAYER_ORDERBY_PLAYER, CardState
+
+NUM_SUGGESTIONS = int(np.prod(ENVELOPE_SHAPE))
+
+# No one disproves, or the 5 other players in order, each maybe with the slot
+#  (person, weapon or room) of the card they show
+NUM_OUTCOMES = 1 + 5 * 3
+
+# The most a suggestion can be worth, in bits, to scale gains to [0, 1]
+MAX_GAIN = float(np.log2(NUM_OUTCOMES))
+
+NUM_SAMPLES = 512
+
+
+def suggestion_gains(
+    deals: np.ndarray,
+    weights: Optional[np.ndarray],
+    suggestor: int,
+    sees_card: bool = True,
+) -> np.ndarray:
+    """The 6x6x9 expected information gain, in bits, of each suggestion the
+    suggestor could make, given deals (N x 21 holders) and their weights.
+
+    sees_card : whether the outcome includes the card shown, i.e. the scores
+      are for the suggestor's own knowledge rather than a bystander's.
+    """
+    num_deals = len(deals)
+    weights = (
+        np.full(num_deals, 1 / num_deals)
+        if weights is None
+        else weights / weights.sum()
+    )
+
+    # Number the envelopes that turn up and sort the deals by them, so the
+    #  counts for each envelope land close together in the table
+    envelopes = np.argwhere(deals == ENVELOPE)[:, 1].reshape(num_deals, 3)
+    envelope_ids, envelope = np.unique(
+        np.ravel_multi_index(tuple((envelopes - CATEGORY_OFFSETS).T), ENVELOPE_SHAPE),
+        return_inverse=True,
+    )
+    order = np.argsort(envelope, kind="stable")
+    deals, weights, envelope = deals[order], weights[order], envelope[order]
+
+    # Each holder's place in the order of disproving, with 6 for those that can't:
+    #  the suggestor and the envelope
+    rank = np.full(ENVELOPE + 1, 6, dtype=np.int8)
+    for place, player in enumerate(PLAYER_ORDERBY_PLAYER[suggestor][1:], start=1):
+        rank[player] = place
+    card_rank = rank[deals]
+
+    # N x 6 x 6 x 9 places of the holders of each suggested card
+    people, weapons, rooms = (
+        card_rank[:, offset : offset + size]
+        for offset, size in zip(CATEGORY_OFFSETS, ENVELOPE_SHAPE)
+    )
+    slots = np.broadcast_arrays(
+        people[:, :, None, None], weapons[:, None, :, None], rooms[:, None, None, :]
+    )
+    disprover = np.minimum(np.minimum(slots[0], slots[1]), slots[2])
+    disproved = disprover < 6
+
+    # Which card the disprover might show, each with the deal's weight split
+    #  between them. An undisproved suggestion counts once, as slot 0.
+    shows = np.stack([slot == disprover for slot in slots]) & disproved
+    mass = weights.reshape(-1, 1, 1, 1) / np.maximum(shows.sum(axis=0), 1)
+    shows[0] |= ~disproved
+
+    # Index into the envelope x suggestion x outcome table
+    slot = np.arange(3, dtype=np.int8).reshape(3, 1, 1, 1, 1) if sees_card else 0
+    outcome = np.where(disproved, 3 * disprover - 2 + slot, 0)
+    suggestion = np.arange(NUM_SUGGESTIONS, dtype=np.int32).reshape(ENVELOPE_SHAPE)
+    index = (
+        envelope.reshape(-1, 1, 1, 1) * NUM_SUGGESTIONS + suggestion
+    ) * NUM_OUTCOMES + outcome
+
+    counted = np.flatnonzero(shows)
+    table = np.bincount(
+        np.broadcast_to(index, shows.shape).reshape(-1)[counted],
+        weights=np.broadcast_to(mass, shows.shape).reshape(-1)[counted],
+        minlength=len(envelope_ids) * NUM_SUGGESTIONS * NUM_OUTCOMES,
+    )
+
+    # I(envelope; outcome) = sum p(e, o) log p(e, o) / (p(e) p(o)), over the few
+    #  entries of the table that aren't 0
+    entries = np.flatnonzero(table)
+    joint = table[entries]
+    entry_envelope, suggestion_outcome = np.divmod(
+        entries, NUM_SUGGESTIONS * NUM_OUTCOMES
+    )
+    outcome_p = np.bincount(
+        suggestion_outcome, weights=joint, minlength=NUM_SUGGESTIONS * NUM_OUTCOMES
+    )
+    envelope_p = np.bincount(envelope, weights=weights)
+    terms = joint * np.log2(
+        joint / (outcome_p[suggestion_outcome] * envelope_p[entry_envelope])
+    )
+    gains = np.bincount(
+        suggestion_outcome // NUM_OUTCOMES, weights=terms, minlength=NUM_SUGGESTIONS
+    )
+    return np.maximum(gains, 0).reshape(ENVELOPE_SHAPE)
+
+
+def suggestion_gains_from_state(
+    state: CardState,
+    observer: int,
+    num_samples: int = NUM_SAMPLES,
+    rng: Optional[np.random.Generator] = None,
+) -> np.ndarray:
+    """The information gain of each suggestion the observer could make, from
+    a sample of the deals consistent with what they know"""
+    deduction = Deduction.from_card_state(state, observer)
+    deals, weights = sample_weighted_deals(deduction, num_samples, rng)
+    return suggestion_gains(deals, weights, observer)
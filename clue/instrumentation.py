@@ -0,0 +1,107 @@
+"""
+Opt-in timing and event counts for the hot paths of a game.
+
+A CardState or ClueEnvironment only records anything when it has a Stats
+object (env = ClueEnvironment(collect_stats=True)), and otherwise pays for a
+check that its stats attribute is None. Each phase is timed with the monotonic
+perf_counter_ns clock, separately for each StepKind, into a count, a total, a
+maximum and a histogram with power of two buckets.
+
+The phases are:
+
+- step: the whole of ClueEnvironment.step()
+- observe: building the observation (get_player_knowledge_v1 and flatten)
+- legal_actions: building the action mask
+- move_towards_room: resolving a move on the board
+- make_suggestion: finding who can disprove a suggestion
+"""
+import time
+from enum import Enum
+from typing import Dict, List, Tuple
+
+# Bucket b counts the durations of between 2**b and 2**(b + 1) nanoseconds,
+# with the last one taking everything longer (over a second)
+NUM_BUCKETS = 31
+
+
+class PhaseTimer:
+    __slots__ = ("count", "total_ns", "max_ns", "histogram")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.histogram = [0] * NUM_BUCKETS
+
+    def add(self, elapsed_ns: int) -> None:
+        self.count += 1
+        self.total_ns += elapsed_ns
+        self.max_ns = max(self.max_ns, elapsed_ns)
+        self.histogram[min(max(elapsed_ns.bit_length(), 1), NUM_BUCKETS) - 1] += 1
+
+    def as_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "total_ms": self.total_ns / 1e6,
+            "mean_us": self.total_ns / self.count / 1e3 if self.count else 0.0,
+            "max_us": self.max_ns / 1e3,
+            # [lower bound in ns, count] of the buckets that were used
+            "histogram_ns": [
+                [1 << bucket if bucket else 0, count]
+                for bucket, count in enumerate(self.histogram)
+                if count
+            ],
+        }
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.timers: Dict[Tuple[str, Enum], PhaseTimer] = {}
+        self.events: Dict[str, int] = {}
+
+    @staticmethod
+    def now() -> int:
+        return time.perf_counter_ns()
+
+    def record(self, phase: str, step_kind: Enum, start_ns: int) -> None:
+        """Time a phase that started at start_ns (from now())"""
+        elapsed = time.perf_counter_ns() - start_ns
+        timer = self.timers.get((phase, step_kind))
+        if timer is None:
+            timer = self.timers[(phase, step_kind)] = PhaseTimer()
+        timer.add(elapsed)
+
+    def count(self, event: str, n: int = 1) -> None:
+        self.events[event] = self.events.get(event, 0) + n
+
+    def reset(self) -> None:
+        self.timers.clear()
+        self.events.clear()
+
+    def phases(self) -> List[str]:
+        return sorted({phase for phase, _ in self.timers})
+
+    def as_dict(self) -> Dict:
+        """{"phases": {phase: {step kind name: timings}}, "events": counts},
+        which is plain JSON"""
+        phases: Dict[str, Dict[str, Dict]] = {phase: {} for phase in self.phases()}
+        for (phase, step_kind), timer in sorted(
+            self.timers.items(), key=lambda item: (item[0][0], item[0][1].value)
+        ):
+            phases[phase][step_kind.name] = timer.as_dict()
+        return {"phases": phases, "events": dict(sorted(self.events.items()))}
+
+    def summary(self) -> str:
+        """A line per phase and step kind, slowest in total first"""
+        lines = [f"{'phase':<18} {'step kind':<20} {'count':>8} {'mean us':>9}"]
+        for (phase, step_kind), timer in sorted(
+            self.timers.items(), key=lambda item: -item[1].total_ns
+        ):
+            lines.append(
+                f"{phase:<18} {step_kind.name:<20} {timer.count:>8} "
+                f"{timer.total_ns / timer.count / 1e3:>9.1f}"
+            )
+        lines.extend(
+            f"{event}: {count}" for event, count in sorted(self.events.items())
+        )
+        return "\n".join(lines)
@@ -1,3 +1,4 @@
+import argparse
 import datetime
 import logging
 
@@ -6,6 +7,7 @@ import numpy as np
 from clue.env import clue_environment_v2
 from clue.env.clue_environment_v2 import ClueEnvironment
 from clue.state import CardState
+from clue.trace import TraceRecorder, save_traces, show_trace
 
 
 def choose_action(legal: np.ndarray) -> int:
@@ -67,10 +69,22 @@ def choose_action(legal: np.ndarray) -> int:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play against random agents")
+    parser.add_argument(
+        "--trace", help="show the game saved in this trace file instead of playing"
+    )
+    parser.add_argument("--game", type=int, default=0)
+    args = parser.parse_args()
+    if args.trace:
+        show_trace(args.trace, args.game)
+        raise SystemExit()
+
     print("Starting interactive play.")
     logging.basicConfig(level=logging.DEBUG)
 
     env = clue_environment_v2.ClueEnvironment(log_actions=True)
+    env.reset()
+    recorder = TraceRecorder(env.clue, hash_masks=True)
 
     timestamp = datetime.datetime.now().strftime("%m-%d_%H%M")
     with open(f"clue/interactive.{timestamp}.log", "w", buffering=1) as f:
@@ -107,4 +121,9 @@ if __name__ == "__main__":
             f.write(o2h)
             f.write(f"\n{agent} chose {action}\n")
 
+            recorder.record(env.clue, action)
             env.step(action)
+
+    trace_path = f"clue/interactive.{timestamp}.trace.npz"
+    save_traces(trace_path, [recorder.finish(env.clue)])
+    print(f"Saved the game to {trace_path}")
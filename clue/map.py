@@ -2,10 +2,12 @@ import csv
 import heapq
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple, cast
+from typing import Dict, List, Optional, Sequence, Tuple, cast
 
 import numpy as np
 
+from clue import zobrist
+
 STARTING_POINT_TO_PLAYER_CARD = {
     "ss": "Miss Scarlet",
     "sm": "Colonel Mustard",
@@ -190,16 +192,47 @@ class Board:
         self.player_position_matrix = np.zeros(
             (self.num_players, self.num_positions), dtype=np.int8
         )
+        # The XOR of the Zobrist keys of where the players are, kept up to date
+        #  as they move
+        self.position_keys = zobrist.position_keys(self.num_players, self.num_positions)
+        self.position_hash = 0
         self.reset_positions()
 
         # Pre create so that we don't need to reallocate each time.
         self._legal_positions_vector = np.zeros((self.num_positions,), dtype=np.int8)
         self.visited = np.zeros((self.num_positions,), dtype=np.int8)
 
+    def clone(self) -> "Board":
+        """A copy that shares the static map data (grid, squares, distances)
+        and only copies where the players are."""
+        other = Board.__new__(Board)
+        other.__dict__.update(self.__dict__)
+        other.player_positions = self.player_positions.copy()
+        other.player_position_matrix = self.player_position_matrix.copy()
+        # scratch space for legal_positions
+        other._legal_positions_vector = np.zeros_like(self._legal_positions_vector)
+        other.visited = np.zeros_like(self.visited)
+        return other
+
+    def restore_positions(self, positions: Sequence[int]) -> None:
+        self.player_positions = list(positions)
+        self.player_position_matrix.fill(0)
+        self.player_position_matrix[
+            np.arange(len(self.player_positions)), self.player_positions
+        ] = 1
+        self.rehash_positions()
+
     def reset_positions(self) -> None:
         self.player_positions = self.player_positions_initial.copy()
+        self.player_position_matrix.fill(0)
         for player_idx, position in enumerate(self.player_positions):
             self.player_position_matrix[player_idx][position] = 1
+        self.rehash_positions()
+
+    def rehash_positions(self) -> None:
+        self.position_hash = 0
+        for player_idx, position in enumerate(self.player_positions):
+            self.position_hash ^= self.position_keys[player_idx][position]
 
     @staticmethod
     def _is_a_square(code: str) -> bool:
@@ -245,6 +278,8 @@ class Board:
         # pos_idx = int(np.argmax(pos_vector))
         if pos_idx < 0 or pos_idx >= len(self.player_position_matrix[player_idx]):
             raise ValueError(f"Location position out of range: got {pos_idx}")
+        keys = self.position_keys[player_idx]
+        self.position_hash ^= keys[self.player_positions[player_idx]] ^ keys[pos_idx]
         self.player_positions[player_idx] = pos_idx
         self.player_position_matrix[player_idx].fill(0)
         self.player_position_matrix[player_idx][pos_idx] = 1
@@ -502,16 +537,18 @@ class Board:
         # Unmark current location as visited
         self.visited[current_position] = 0
 
-    def generate_board_string(self) -> str:
+    def generate_board_string(self, positions: Optional[Sequence[int]] = None) -> str:
+        """Draw the board with the players where they are, or at positions"""
+        if positions is None:
+            positions = self.player_positions
         overlay: Dict[Tuple[int, int], str] = {}
-        for player_idx in range(6):
+        for player_idx, loc_idx in enumerate(positions):
             pos: tuple[int, int]
-            if self.is_in_room(player_idx):
-                room = self.which_room(player_idx)
+            if loc_idx < self.num_doors:
+                room = ROOM_NAME_TO_ROOM_INDEX[self.door_data[loc_idx].room]
                 pos = PLAYER_ROOM_POSITIONS[ROOM_NAMES[room]]
                 pos = (pos[0], pos[1] + player_idx)
             else:
-                loc_idx = self.player_positions[player_idx]
                 location = self.locations[loc_idx]
                 pos = (location.i, location.j)
             overlay[pos] = ONE_CHAR_PLAYER[player_idx]
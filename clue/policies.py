@@ -0,0 +1,174 @@
+"""
+Policies for the seats in games played outside of tianshou, e.g. by
+clue.datagen.
+
+Every policy chooses actions for a batch of games at once, which lets a
+checkpoint evaluate its network once for all the games waiting on it. The
+observations are the flat v2 observations of the player to move.
+
+Policies are made from a short spec:
+
+- "random": a uniformly random legal action
+- "sweep", "knowledge", "deduction" or "information": the scripted agents of
+  clue.agents.heuristic
+- "heuristic": the same as "deduction"
+- "checkpoint:PATH": the greedy policy of a DQN saved by train_agents_v2.py
+- "server:SOCKET": the greedy policy of the checkpoint a clue.inference_server
+  serves
+"""
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from clue.state import DISPROVE_ACTION_OFFSET, CardState
+
+
+class SeatPolicy(ABC):
+    @abstractmethod
+    def act(
+        self,
+        states: Sequence[CardState],
+        observations: np.ndarray,
+        masks: np.ndarray,
+    ) -> np.ndarray:
+        """An action for the player to move in each state"""
+
+
+class RandomPolicy(SeatPolicy):
+    def __init__(self, rng: Optional[np.random.Generator] = None) -> None:
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+    def act(
+        self,
+        states: Sequence[CardState],
+        observations: np.ndarray,
+        masks: np.ndarray,
+    ) -> np.ndarray:
+        # Pick the legal action with the largest random key
+        keys = self.rng.random(masks.shape) + masks
+        actions: np.ndarray = np.argmax(keys, axis=1)
+        return actions
+
+
+class CheckpointPolicy(SeatPolicy):
+    """The greedy, legal, action of a saved DQN"""
+
+    def __init__(
+        self, path: str, observation_size: int, hidden_sizes: Sequence[int]
+    ) -> None:
+        # Only needed for checkpoints, and slow to import
+        import torch
+        from tianshou.utils.net.common import Net
+
+        self.torch = torch
+        self.net = Net(
+            state_shape=observation_size,
+            action_shape=DISPROVE_ACTION_OFFSET + 21,
+            hidden_sizes=list(hidden_sizes),
+        )
+        self.load(path)
+        self.net.eval()
+
+    def load(self, path: str) -> None:
+        # The checkpoint is the state of a DQNPolicy, whose network is "model"
+        state = self.torch.load(path, map_location="cpu")
+        self.net.load_state_dict(
+            {
+                name[len("model.") :]: value
+                for name, value in state.items()
+                if name.startswith("model.")
+            }
+        )
+
+    def q_values(self, observations: np.ndarray, masks: np.ndarray) -> np.ndarray:
+        """The Q value of each action, -inf for those that aren't legal"""
+        with self.torch.no_grad():
+            q_values, _ = self.net(
+                self.torch.as_tensor(observations, dtype=self.torch.float32)
+            )
+        masked: np.ndarray = q_values.numpy()
+        masked[masks == 0] = -np.inf
+        return masked
+
+    def act(
+        self,
+        states: Sequence[CardState],
+        observations: np.ndarray,
+        masks: np.ndarray,
+    ) -> np.ndarray:
+        actions: np.ndarray = np.argmax(self.q_values(observations, masks), axis=1)
+        return actions
+
+
+class EpsilonGreedyPolicy(SeatPolicy):
+    """Another policy's action, or with probability epsilon a random legal one"""
+
+    def __init__(
+        self,
+        policy: SeatPolicy,
+        epsilon: float,
+        rng: Optional[np.random.Generator] = None,
+    ) -> None:
+        self.policy = policy
+        self.epsilon = epsilon
+        self.random = RandomPolicy(rng)
+
+    def act(
+        self,
+        states: Sequence[CardState],
+        observations: np.ndarray,
+        masks: np.ndarray,
+    ) -> np.ndarray:
+        actions = self.policy.act(states, observations, masks)
+        explore = self.random.rng.random(len(actions)) < self.epsilon
+        if explore.any():
+            actions[explore] = self.random.act(
+                [state for state, chosen in zip(states, explore) if chosen],
+                observations[explore],
+                masks[explore],
+            )
+        return actions
+
+
+def make_policy(
+    spec: str,
+    rng: Optional[np.random.Generator] = None,
+    observation_size: int = 2194,
+    hidden_sizes: Sequence[int] = (128, 128, 128, 128),
+) -> SeatPolicy:
+    """A policy from its spec, see the module docstring"""
+    kind, _, path = spec.partition(":")
+    if kind == "random":
+        return RandomPolicy(rng)
+    if kind in ("heuristic", "sweep", "knowledge", "deduction", "information"):
+        # Imports tianshou, for the adapter
+        from clue.agents.heuristic import AGENTS
+
+        return AGENTS["deduction" if kind == "heuristic" else kind](rng)
+    if kind == "checkpoint" and path:
+        return CheckpointPolicy(path, observation_size, hidden_sizes)
+    if kind == "server" and path:
+        # Imports the policies
+        from clue.inference_server import RemotePolicy
+
+        return RemotePolicy(path)
+    raise ValueError(
+        f"Unknown policy {spec!r}: expected random, heuristic, sweep, "
+        "knowledge, deduction, information, checkpoint:PATH or server:SOCKET"
+    )
+
+
+def make_seats(
+    specs: Sequence[str], rng: Optional[np.random.Generator] = None
+) -> List[SeatPolicy]:
+    """A policy for each of the six seats. One spec is used for every seat.
+    Seats with the same spec share a policy, so they are batched together."""
+    if len(specs) == 1:
+        specs = list(specs) * CardState.MAX_PLAYERS
+    if len(specs) != CardState.MAX_PLAYERS:
+        raise ValueError(
+            f"Expected 1 or {CardState.MAX_PLAYERS} policies, got {len(specs)}"
+        )
+    policies = {spec: make_policy(spec, rng) for spec in dict.fromkeys(specs)}
+    return [policies[spec] for spec in specs]
@@ -0,0 +1,424 @@
+"""
+Exact probability of each of the 324 envelopes given one observer's knowledge.
+
+Every deal of the cards that agrees with what the observer knows is equally
+likely, so the probability of an envelope is the number of consistent deals with
+that envelope divided by the total. There are far too many deals to enumerate,
+so they are counted with one of two dynamic programs:
+
+- With only "has" and "lacks" facts the cards can be handed out one at a time,
+  tracking just how many cards each player still needs. That state is tiny (at
+  most 4^5 entries in a six player game) so this is cheap even at the start of
+  the game. "has at least one of" clauses are folded in by inclusion-exclusion.
+- Once most cards are accounted for, or the inclusion-exclusion sum has too many
+  terms, we instead deal whole hands one player at a time, with the state being
+  the bitmask of cards that have been handed out so far. Clauses are just a
+  filter on the hands a player can be dealt.
+
+Both are memoised on the constraints so that repeated calls for an unchanged
+information set, or for the same subproblem, are free.
+
+Most information sets take well under a millisecond, and none more than
+~100ms. Early in the game, with many clauses and few cards known, neither
+program is quick - dealing whole hands can take seconds - so
+envelope_posterior gives up on those and estimates the posterior from deals
+sampled with clue.sampling instead. That's about 1 in 2000 information sets.
+"""
+from functools import lru_cache
+from itertools import combinations
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from clue.cards import PEOPLE_CARDS, ROOM_CARDS, WEAPON_CARDS
+from clue.deduction import (
+    ALL_CARDS,
+    CATEGORY_MASKS,
+    ENVELOPE,
+    NUM_PLAYERS,
+    Contradiction,
+    Deduction,
+    mask_to_cards,
+    popcount,
+)
+from clue.state import CardState
+
+ENVELOPE_SHAPE = (len(PEOPLE_CARDS), len(WEAPON_CARDS), len(ROOM_CARDS))
+CATEGORY_OFFSETS = (PEOPLE_CARDS[0].idx, WEAPON_CARDS[0].idx, ROOM_CARDS[0].idx)
+
+# When to switch from counting by quotas to dealing whole hands
+MAX_CLAUSE_TERMS = 32
+MAX_UNKNOWN_CARDS_FOR_HANDS = 12
+# Dealing whole hands pairs the cards dealt so far with the next player's
+#  hands, a few million pairs a second. Past this many envelope_posterior
+#  estimates instead.
+MAX_HAND_PAIRS = 2_000_000
+NUM_ESTIMATE_SAMPLES = 2048
+
+Clause = Tuple[int, int]  # (player, mask of cards)
+
+
+def envelope_posterior(
+    deduction: Deduction, rng: Optional[np.random.Generator] = None
+) -> np.ndarray:
+    """The 6x6x9 probability of each (person, weapon, room) envelope, laid out
+    like CardState.suggestion_one_hot so that it ravels onto the action space.
+
+    Exact, unless counting would take more than MAX_HAND_PAIRS steps of
+    dealing whole hands: then it is estimated from NUM_ESTIMATE_SAMPLES
+    sampled deals, using rng.
+    """
+    counts = _count(*_key(deduction), MAX_HAND_PAIRS)
+    if counts is None:
+        # clue.sampling imports this module
+        from clue.sampling import estimate_envelope_posterior, sample_weighted_deals
+
+        deals, weights = sample_weighted_deals(deduction, NUM_ESTIMATE_SAMPLES, rng)
+        return estimate_envelope_posterior(deals, weights)
+
+    total = int(counts.sum())
+    if total == 0:
+        raise Contradiction("No deal of the cards is consistent with the facts")
+    posterior: np.ndarray = counts / total
+    return posterior
+
+
+def envelope_posterior_from_state(
+    state: CardState, observer: int, rng: Optional[np.random.Generator] = None
+) -> np.ndarray:
+    return envelope_posterior(Deduction.from_card_state(state, observer), rng)
+
+
+def count_consistent_deals(deduction: Deduction) -> np.ndarray:
+    """The number of deals consistent with the deduction for each envelope.
+    Early in the game this can take seconds, see envelope_posterior()."""
+    counts = _count(*_key(deduction), None)
+    assert counts is not None
+    return counts.copy()
+
+
+def _key(
+    deduction: Deduction,
+) -> Tuple[Tuple[int, ...], Tuple[int, ...], Tuple[int, ...], Tuple[Clause, ...]]:
+    clauses = tuple(
+        sorted(
+            (player, clause)
+            for player in range(NUM_PLAYERS)
+            for clause in deduction.clauses[player]
+        )
+    )
+    return deduction.sizes, tuple(deduction.has), tuple(deduction.lacks), clauses
+
+
+@lru_cache(maxsize=4096)
+def _count(
+    sizes: Tuple[int, ...],
+    has: Tuple[int, ...],
+    lacks: Tuple[int, ...],
+    clauses: Tuple[Clause, ...],
+    max_pairs: Optional[int],
+) -> Optional[np.ndarray]:
+    """The counts, or None if dealing whole hands would take more than
+    max_pairs steps"""
+    if clauses and popcount(_unknown_cards(has)) <= MAX_UNKNOWN_CARDS_FOR_HANDS:
+        return _count_by_hands(sizes, has, lacks, clauses, max_pairs)
+
+    terms = _inclusion_exclusion_terms(lacks, clauses)
+    if len(terms) <= MAX_CLAUSE_TERMS:
+        return _count_by_quota(sizes, has, lacks[ENVELOPE], tuple(terms.items()))
+
+    return _count_by_hands(sizes, has, lacks, clauses, max_pairs)
+
+
+def _inclusion_exclusion_terms(
+    lacks: Tuple[int, ...], clauses: Sequence[Clause]
+) -> Dict[Tuple[int, ...], int]:
+    """Deals satisfying every clause = sum over subsets S of the clauses of
+    (-1)^|S| * deals where each player lacks all the cards of their clauses in S.
+
+    Subsets that lead to the same lacks are merged, and stop early once there
+    are too many terms to be worth it.
+    """
+    terms: Dict[Tuple[int, ...], int] = {lacks: 1}
+    for player, clause in clauses:
+        updated = terms.copy()
+        for term_lacks, coefficient in terms.items():
+            extended = list(term_lacks)
+            extended[player] |= clause
+            key = tuple(extended)
+            updated[key] = updated.get(key, 0) - coefficient
+            if updated[key] == 0:
+                del updated[key]
+        terms = updated
+        if len(terms) > MAX_CLAUSE_TERMS:
+            break
+    return terms
+
+
+def _envelope_choices(has: Sequence[int], lacks: Sequence[int]) -> List[List[int]]:
+    """For each category the cards that might be in the envelope"""
+    choices = []
+    for category in CATEGORY_MASKS:
+        known = has[ENVELOPE] & category
+        if known:
+            choices.append(mask_to_cards(known))
+        else:
+            choices.append(mask_to_cards(category & ~lacks[ENVELOPE]))
+    return choices
+
+
+def _unknown_cards(has: Sequence[int]) -> int:
+    known = 0
+    for mask in has:
+        known |= mask
+    return ALL_CARDS & ~known
+
+
+def _count_by_quota(
+    sizes: Tuple[int, ...],
+    has: Tuple[int, ...],
+    envelope_lacks: int,
+    terms: Tuple[Tuple[Tuple[int, ...], int], ...],
+) -> np.ndarray:
+    """Count deals consistent with has and lacks facts, summed over the
+    inclusion-exclusion terms - each is the players' lacks with a coefficient.
+
+    The unknown cards of each category are handed out one at a time, building
+    a table indexed by which card of the category went into the envelope and
+    then by how many cards each player has been given. The three tables are
+    joined by summing over every way of splitting each player's quota between
+    the categories.
+    """
+    counts = np.zeros(ENVELOPE_SHAPE, dtype=np.int64)
+
+    quotas = tuple(sizes[p] - popcount(has[p]) for p in range(NUM_PLAYERS))
+    if min(quotas) < 0:
+        return counts
+    players = [p for p in range(NUM_PLAYERS) if quotas[p] > 0]
+    quota_vector = [quotas[p] for p in players]
+    if not players:
+        # Only the envelope is left to fill, use a player who can't take anything
+        quota_vector = [0]
+    usage_shape = tuple(quota + 1 for quota in quota_vector)
+
+    unknown = _unknown_cards(has)
+    choices = _envelope_choices(has, (0,) * ENVELOPE + (envelope_lacks,))
+    if not all(choices):
+        return counts
+
+    # Every entry of a table uses the same number of cards, so only a few of the
+    # usage combinations are reachable.
+    dealt = [
+        popcount(unknown & category) - (0 if has[ENVELOPE] & category else 1)
+        for category in CATEGORY_MASKS
+    ]
+    first, shifted, remaining = _pair_usages(usage_shape, dealt[0], dealt[1])
+    if len(first) == 0 or len(remaining) == 0:
+        return counts
+
+    # Stack the tables for every term, with the coefficient on the first one.
+    tables: List[List[np.ndarray]] = [[], [], []]
+    for term_lacks, coefficient in terms:
+        player_lacks = [term_lacks[p] for p in players] if players else [ALL_CARDS]
+        for category, mask in enumerate(CATEGORY_MASKS):
+            table = _deal_category(
+                usage_shape,
+                tuple(choices[category]),
+                unknown & mask,
+                tuple(lacks & mask for lacks in player_lacks),
+            ).reshape(len(choices[category]), -1)
+            tables[category].append(table * coefficient if category == 0 else table)
+
+    # The counts are far below 2**53 so float64 matrix products are exact.
+    people = np.array(tables[0], dtype=np.float64)[:, :, first]
+    weapons = np.array(tables[1], dtype=np.float64)
+    # pad with a column of zeros for the usages that would go over the quota
+    weapons = np.concatenate((weapons, np.zeros(weapons.shape[:2] + (1,))), axis=2)
+    rooms = np.array(tables[2], dtype=np.float64)[:, :, remaining]
+
+    # For every combined usage of people and weapons, sum over the ways it can
+    # be split between them, then match it with the rest of the quotas for rooms
+    weapons = (
+        weapons[:, :, shifted].transpose(0, 2, 1, 3).reshape(len(terms), len(first), -1)
+    )
+    combined = (people @ weapons).reshape(len(terms), -1, len(remaining))
+    joined = (combined @ rooms.transpose(0, 2, 1)).sum(axis=0)
+
+    index = np.ix_(
+        *(
+            [card - CATEGORY_OFFSETS[i] for card in choices[i]]
+            for i in range(len(CATEGORY_MASKS))
+        )
+    )
+    counts[index] = (
+        np.rint(joined)
+        .astype(np.int64)
+        .reshape(len(choices[0]), len(choices[1]), len(choices[2]))
+    )
+    return counts
+
+
+@lru_cache(maxsize=1024)
+def _pair_usages(
+    usage_shape: Tuple[int, ...], first: int, second: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Index tables for joining the usages of the first two categories.
+
+    first - flat indices of the usages that deal `first` cards.
+    shifted - for each of those and each combined usage that deals
+      `first + second` cards, the flat index of the usage of the second category
+      that makes up the difference, or one past the end if there isn't one.
+    remaining - for each combined usage, the flat index of the usage left over
+      for the last category.
+    """
+    size = int(np.prod(usage_shape))
+    quotas = np.array(usage_shape, dtype=np.int64) - 1
+    usages = np.array(np.unravel_index(np.arange(size), usage_shape)).T
+    totals = usages.sum(axis=1)
+    first_index = np.flatnonzero(totals == first)
+    combined_index = np.flatnonzero(totals == first + second)
+
+    difference = (
+        usages[combined_index][np.newaxis, :, :] - usages[first_index][:, np.newaxis, :]
+    )
+    valid = (difference >= 0).all(axis=2)
+    shifted = np.full(valid.shape, size, dtype=np.int64)
+    shifted[valid] = np.ravel_multi_index(tuple(difference[valid].T), usage_shape)
+
+    remaining = np.ravel_multi_index(
+        tuple((quotas - usages[combined_index]).T), usage_shape
+    )
+    return first_index, shifted, remaining
+
+
+@lru_cache(maxsize=65536)
+def _deal_category(
+    usage_shape: Tuple[int, ...],
+    choices: Tuple[int, ...],
+    unknown: int,
+    lacks: Tuple[int, ...],
+) -> np.ndarray:
+    """Hand out the unknown cards of one category.
+
+    Returns a table whose first axis is the card that went into the envelope and
+    the rest count the cards given to each player with a quota. lacks is the
+    mask of cards each of those players can't have.
+    """
+    table = np.zeros((len(choices),) + usage_shape, dtype=np.int64)
+    table[(slice(None),) + (0,) * len(usage_shape)] = 1
+
+    shifts: List[Tuple[Tuple[slice, ...], Tuple[slice, ...]]] = []
+    for axis in range(len(usage_shape)):
+        before = (slice(None),) * (1 + axis)
+        after = (slice(None),) * (len(usage_shape) - axis - 1)
+        shifts.append(
+            (before + (slice(0, -1),) + after, before + (slice(1, None),) + after)
+        )
+
+    for card in mask_to_cards(unknown):
+        dealt = np.zeros_like(table)
+        for axis, (source, target) in enumerate(shifts):
+            if not lacks[axis] & (1 << card):
+                dealt[target] += table[source]
+
+        if card in choices:
+            # for this choice the card goes in the envelope instead
+            slot = choices.index(card)
+            dealt[slot] = table[slot]
+        table = dealt
+
+    return table
+
+
+def _candidate_hands(allowed: int, quota: int, clauses: Tuple[int, ...]) -> np.ndarray:
+    hands = []
+    for cards in combinations(mask_to_cards(allowed), quota):
+        hand = 0
+        for card in cards:
+            hand |= 1 << card
+        if all(hand & clause for clause in clauses):
+            hands.append(hand)
+    return np.array(hands, dtype=np.int64)
+
+
+def _count_by_hands(
+    sizes: Tuple[int, ...],
+    has: Tuple[int, ...],
+    lacks: Tuple[int, ...],
+    clauses: Tuple[Clause, ...],
+    max_pairs: Optional[int] = None,
+) -> Optional[np.ndarray]:
+    """Count deals by dealing whole hands, one player at a time.
+
+    The state is the mask of unknown cards dealt so far with the number of ways
+    of reaching it. The last player and the envelope are matched against the
+    cards that are left over rather than expanded.
+
+    Gives up, returning None, if that would pair more than max_pairs states
+    with the next player's hands.
+    """
+    counts = np.zeros(ENVELOPE_SHAPE, dtype=np.int64)
+    unknown = _unknown_cards(has)
+
+    player_hands = []
+    for player in range(NUM_PLAYERS):
+        quota = sizes[player] - popcount(has[player])
+        if quota < 0:
+            return counts
+        if quota == 0:
+            continue
+        player_clauses = tuple(clause for p, clause in clauses if p == player)
+        hands = _candidate_hands(unknown & ~lacks[player], quota, player_clauses)
+        if len(hands) == 0:
+            return counts
+        player_hands.append(hands)
+    player_hands.sort(key=len)
+
+    envelopes = np.array(
+        np.meshgrid(*_envelope_choices(has, lacks), indexing="ij")
+    ).reshape(len(CATEGORY_MASKS), -1)
+    envelope_index = np.ravel_multi_index(
+        tuple(envelopes - np.array(CATEGORY_OFFSETS)[:, np.newaxis]), ENVELOPE_SHAPE
+    )
+    envelope_masks = np.zeros(envelopes.shape[1], dtype=np.int64)
+    for cards in envelopes:
+        envelope_masks |= (1 << cards) & unknown
+
+    states = np.zeros(1, dtype=np.int64)
+    ways = np.ones(1, dtype=np.int64)
+    pairs = 0
+    for hands in player_hands[:-1]:
+        pairs += len(states) * len(hands)
+        if max_pairs is not None and pairs > max_pairs:
+            return None
+        merged = states[:, np.newaxis] | hands[np.newaxis, :]
+        valid = (states[:, np.newaxis] & hands[np.newaxis, :]) == 0
+        merged = merged[valid]
+        merged_ways = np.broadcast_to(ways[:, np.newaxis], valid.shape)[valid]
+
+        order = np.argsort(merged, kind="stable")
+        merged = merged[order]
+        merged_ways = merged_ways[order]
+        starts = np.flatnonzero(np.diff(merged, prepend=-1))
+        states = merged[starts]
+        ways = np.add.reduceat(merged_ways, starts)
+
+    # The last player and the envelope take whatever is left
+    last_hands = player_hands[-1] if player_hands else np.zeros(1, dtype=np.int64)
+    valid = (last_hands[:, np.newaxis] & envelope_masks[np.newaxis, :]) == 0
+    leftovers = (last_hands[:, np.newaxis] | envelope_masks[np.newaxis, :])[valid]
+    leftover_envelope = np.broadcast_to(envelope_index[np.newaxis, :], valid.shape)[
+        valid
+    ]
+
+    needs = unknown & ~states
+    order = np.argsort(needs)
+    needs = needs[order]
+    ways = ways[order]
+    position = np.searchsorted(needs, leftovers)
+    position = np.minimum(position, len(needs) - 1)
+    matched = needs[position] == leftovers
+
+    flat_counts = counts.reshape(-1)
+    np.add.at(flat_counts, leftover_envelope[matched], ways[position[matched]])
+    return counts
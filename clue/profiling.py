@@ -0,0 +1,269 @@
+"""
+Profiling a window of a training or watching run.
+
+    python -m clue.train_agents_v2 --profile-steps 5000 --profile-out train.prof
+    python -m clue.watch_agents_v2 --profile-steps 500 --profiler sampling
+
+The profiler starts at the first collect() once the collector has collected
+--profile-start env steps, and stops at the first one after a further
+--profile-steps. It keeps running between the collects, so the policy updates
+the trainer makes in between are included.
+
+The profile is written to --profile-out: a cProfile pstats file for
+--profiler cprofile (the default, for snakeviz or python -m pstats), or for
+--profiler sampling a file of collapsed stacks ("outer;inner count" lines, for
+flamegraph.pl or speedscope), from sampling the stack every few milliseconds
+of CPU time. A breakdown of the time by package is printed: clue against
+tianshou and torch is whether a faster env would make training faster.
+
+With SubprocVectorEnv the envs step in other processes, where the profiler
+can't see them, so the training script profiles with DummyVectorEnv.
+"""
+import argparse
+import cProfile
+import os
+import pstats
+import signal
+from collections import Counter
+from types import FrameType
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import clue
+
+CLUE_DIR = os.path.dirname(os.path.abspath(clue.__file__)) + os.sep
+
+# The packages the time is broken down into, any others are "other"
+PACKAGES = {
+    "tianshou": "tianshou",
+    "torch": "torch",
+    "numpy": "numpy",
+    "gymnasium": "gym/pettingzoo",
+    "gym": "gym/pettingzoo",
+    "pettingzoo": "gym/pettingzoo",
+}
+CATEGORIES = ["clue", "tianshou", "torch", "numpy", "gym/pettingzoo", "other"]
+
+PROFILERS = ["cprofile", "sampling"]
+
+
+def categorize(filename: str) -> str:
+    """The package a source file belongs to"""
+    if filename.startswith(CLUE_DIR):
+        return "clue"
+    parts = filename.split(os.sep)
+    for part in reversed(parts[:-1]):
+        if part in PACKAGES:
+            return PACKAGES[part]
+    return "other"
+
+
+class CProfiler:
+    def __init__(self) -> None:
+        self.profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self.profile.enable()
+
+    def stop(self) -> None:
+        self.profile.disable()
+
+    def write(self, path: str) -> None:
+        self.profile.dump_stats(path)
+
+    def breakdown(self) -> Dict[str, float]:
+        """Seconds of own time by package. Built in functions, like numpy's C
+        functions, count for the packages of the functions that called
+        them."""
+        seconds = dict.fromkeys(CATEGORIES, 0.0)
+        # {(file, line, function): (calls, calls, own, cumulative, callers)}
+        stats: Dict[Tuple[str, int, str], Tuple] = getattr(
+            pstats.Stats(self.profile), "stats"
+        )
+        for (filename, _, name), (_, _, own, _, callers) in stats.items():
+            if filename != "~":
+                seconds[categorize(filename)] += own
+            elif "torch." in name:
+                seconds["torch"] += own
+            else:
+                # Share it out by the time spent in it from each caller
+                from_callers = {
+                    caller: edge[2] for caller, edge in callers.items() if edge[2]
+                }
+                total = sum(from_callers.values())
+                if not total:
+                    seconds["other"] += own
+                for (caller_file, _, _), spent in from_callers.items():
+                    category = (
+                        "other" if caller_file == "~" else categorize(caller_file)
+                    )
+                    seconds[category] += own * spent / total
+        return seconds
+
+    def top(self, limit: int = 15) -> str:
+        lines: List[str] = []
+
+        class Lines:
+            def write(self, text: str) -> None:
+                lines.append(text)
+
+        stats = pstats.Stats(self.profile, stream=Lines())  # type: ignore[arg-type]
+        stats.sort_stats("cumulative").print_stats(limit)
+        return "".join(lines)
+
+
+class SamplingProfiler:
+    """Samples the main thread's stack every interval seconds of the process's
+    CPU time, with SIGPROF, so it's Unix only"""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._previous: Any = None
+
+    def _sample(self, signum: int, frame: Optional[FrameType]) -> None:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_name))
+            frame = frame.f_back
+        self.samples[tuple(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._previous = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._previous)
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                frames = ";".join(
+                    f"{name} ({os.path.basename(filename)})" for filename, name in stack
+                )
+                f.write(f"{frames} {count}\n")
+
+    def breakdown(self) -> Dict[str, float]:
+        """Seconds by the package of the innermost Python function, which is
+        also the one that called any C function"""
+        seconds = dict.fromkeys(CATEGORIES, 0.0)
+        for stack, count in self.samples.items():
+            seconds[categorize(stack[-1][0])] += count * self.interval
+        return seconds
+
+    def top(self, limit: int = 15) -> str:
+        """The functions on the most samples' stacks"""
+        inclusive: Counter = Counter()
+        for stack, count in self.samples.items():
+            for filename, name in set(stack):
+                inclusive[f"{name} ({filename})"] += count
+        total = sum(self.samples.values()) or 1
+        return "\n".join(
+            f"{count / total:>6.1%}  {function}"
+            for function, count in inclusive.most_common(limit)
+        )
+
+
+def make_profiler(kind: str) -> Any:
+    if kind == "cprofile":
+        return CProfiler()
+    if kind == "sampling":
+        return SamplingProfiler()
+    raise ValueError(f"Unknown profiler {kind}, use one of {PROFILERS}")
+
+
+def format_breakdown(seconds: Dict[str, float]) -> str:
+    total = sum(seconds.values()) or 1.0
+    return "\n".join(
+        f"{category:<16} {spent:>9.2f}s {spent / total:>7.1%}"
+        for category, spent in seconds.items()
+    )
+
+
+class CollectorProfile:
+    """Profiles the window of a tianshou Collector's collect() calls from its
+    start_step'th env step for the next steps env steps"""
+
+    def __init__(
+        self,
+        collector: Any,
+        steps: int,
+        out: str,
+        start_step: int = 0,
+        profiler: str = "cprofile",
+        report: Callable[[str], None] = print,
+    ) -> None:
+        self.collector = collector
+        self.steps = steps
+        self.out = out
+        self.start_step = start_step
+        self.profiler = make_profiler(profiler)
+        self.report = report
+        self.started_at: Optional[int] = None
+        self.done = False
+
+        self._collect = collector.collect
+        collector.collect = self.collect
+
+    def collect(self, *args: Any, **kwargs: Any) -> Dict:
+        if self.started_at is None and self.collector.collect_step >= self.start_step:
+            self.started_at = self.collector.collect_step
+            self.profiler.start()
+        result: Dict = self._collect(*args, **kwargs)
+        if (
+            self.started_at is not None
+            and self.collector.collect_step - self.started_at >= self.steps
+        ):
+            self.finish()
+        return result
+
+    def finish(self) -> None:
+        """Stop, write the profile and print the breakdown, if it hasn't been
+        already - call it at the end of a run that might be shorter than the
+        window"""
+        if self.started_at is None or self.done:
+            return
+        self.done = True
+        self.profiler.stop()
+        self.collector.collect = self._collect
+        self.profiler.write(self.out)
+
+        steps = self.collector.collect_step - self.started_at
+        self.report(
+            f"Profiled {steps} collector steps into {self.out}\n"
+            f"{format_breakdown(self.profiler.breakdown())}\n"
+            f"{self.profiler.top()}"
+        )
+
+
+def add_arguments(parser: argparse.ArgumentParser, default_out: str) -> None:
+    parser.add_argument(
+        "--profile-steps",
+        type=int,
+        default=0,
+        help="profile this many collector steps (off if 0)",
+    )
+    parser.add_argument(
+        "--profile-start",
+        type=int,
+        default=0,
+        help="start profiling after this many collector steps",
+    )
+    parser.add_argument("--profile-out", default=default_out)
+    parser.add_argument("--profiler", choices=PROFILERS, default="cprofile")
+
+
+def profile_collector(
+    collector: Any, args: argparse.Namespace
+) -> Optional[CollectorProfile]:
+    """Profile the collector as the add_arguments() arguments say, if at all"""
+    if not args.profile_steps:
+        return None
+    return CollectorProfile(
+        collector,
+        args.profile_steps,
+        args.profile_out,
+        start_step=args.profile_start,
+        profiler=args.profiler,
+    )
@@ -0,0 +1,163 @@
+"""
+Replay buffers whose storage is memory-mapped .npy files on disk.
+
+They are drop in replacements for tianshou's ReplayBuffer and
+VectorReplayBuffer, e.g. in train_agents_v2.py:
+
+    MemmapVectorReplayBuffer(40_000_000, len(train_envs), "log/buffer")
+
+The arrays are made when the first batch is added, one file per key, e.g.
+log/buffer/obs.obs.npy, with the dtype given for the key in dtypes or else the
+dtype of the data. By default the observations are stored as float16 - they
+are all 0/1 flags or distances in [0, 1] - which makes a v2 transition, with
+obs_next, about 9.5 kB rather than 36 kB.
+
+Sampling reads just the sampled rows, so only their pages are touched.
+
+The shards written by clue.datagen can be loaded as buffers without copying
+anything, see load_shards().
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+from tianshou.data import Batch, ReplayBuffer, ReplayBufferManager, VectorReplayBuffer
+
+from clue import datagen
+
+DEFAULT_DTYPES: Dict[str, Union[str, np.dtype]] = {
+    "obs.obs": "float16",
+    "obs_next.obs": "float16",
+}
+
+
+class _MemmapStorage:
+    """Allocates the buffer's arrays as memory-mapped files, for a subclass of
+    ReplayBuffer. Keys that first appear after the first batch are kept in
+    memory by tianshou as usual."""
+
+    # Set by ReplayBuffer
+    maxsize: int
+    _meta: Batch
+    _save_obs_next: bool
+    _save_only_last_obs: bool
+
+    def _init_storage(
+        self, directory: str, dtypes: Optional[Dict[str, Union[str, np.dtype]]]
+    ) -> None:
+        if self._save_only_last_obs:
+            raise ValueError("save_only_last_obs isn't supported")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.dtypes = dict(DEFAULT_DTYPES if dtypes is None else dtypes)
+
+    def add(self, batch: Batch, buffer_ids: Optional[Any] = None) -> Any:
+        if self._meta.is_empty():
+            # The same keys tianshou's add() keeps
+            stored = Batch()
+            for key in set(ReplayBuffer._input_keys).intersection(batch.keys()):
+                stored.__dict__[key] = batch[key]
+            stored.__dict__["done"] = np.logical_or(batch.terminated, batch.truncated)
+            if not self._save_obs_next:
+                stored.pop("obs_next", None)
+
+            # A manager is always given a row per buffer, a single buffer only
+            # when buffer_ids is given
+            stacked = buffer_ids is not None or isinstance(self, ReplayBufferManager)
+            self._meta = self._allocate(stored, stacked)
+            if isinstance(self, ReplayBufferManager):
+                self._set_batch_for_children()
+        return super().add(batch, buffer_ids)  # type: ignore[misc]
+
+    def _allocate(self, batch: Batch, stacked: bool, prefix: str = "") -> Batch:
+        storage = Batch()
+        for key, value in batch.items():
+            name = prefix + key
+            if isinstance(value, Batch):
+                storage.__dict__[key] = self._allocate(value, stacked, name + ".")
+                continue
+
+            value = np.asarray(value)
+            shape = (self.maxsize,) + (value.shape[1:] if stacked else value.shape)
+            dtype = np.dtype(self.dtypes.get(name, value.dtype))
+            if dtype == object:
+                if not all(isinstance(item, str) for item in value.flat):
+                    storage.__dict__[key] = np.empty(shape, dtype=object)
+                    continue
+                # e.g. the agent ids, as fixed width strings
+                dtype = value.astype(str).dtype
+            storage.__dict__[key] = np.lib.format.open_memmap(
+                os.path.join(self.directory, f"{name}.npy"),
+                mode="w+",
+                dtype=dtype,
+                shape=shape,
+            )
+        return storage
+
+
+class MemmapReplayBuffer(_MemmapStorage, ReplayBuffer):
+    def __init__(
+        self,
+        size: int,
+        directory: str,
+        dtypes: Optional[Dict[str, Union[str, np.dtype]]] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(size, **kwargs)
+        self._init_storage(directory, dtypes)
+
+    @classmethod
+    def from_shard(cls, out_dir: str, shard: Dict) -> "MemmapReplayBuffer":
+        """A read only buffer of one clue.datagen shard - an entry of the shards
+        in its index.json - without copying it.
+
+        The transitions are each player's, one after the other, so obs_next is
+        the next player's observation as it is when tianshou collects a
+        PettingZoo game. The reward is the mover's and the player and game are
+        in info.
+        """
+        length = shard["length"]
+        arrays = {
+            field: array[:length]
+            for field, array in datagen.load_shard(out_dir, shard["name"]).items()
+        }
+        buffer = cls(length, out_dir, ignore_obs_next=True)
+        buffer.set_batch(
+            Batch(
+                obs=Batch(obs=arrays["obs"], mask=arrays["mask"]),
+                act=arrays["action"],
+                rew=arrays["reward"],
+                terminated=arrays["done"],
+                truncated=np.broadcast_to(False, (length,)),
+                done=arrays["done"],
+                info=Batch(player=arrays["player"], game=arrays["game"]),
+            )
+        )
+        buffer._size = length
+        buffer.last_index[0] = length - 1
+        return buffer
+
+
+class MemmapVectorReplayBuffer(_MemmapStorage, VectorReplayBuffer):
+    def __init__(
+        self,
+        total_size: int,
+        buffer_num: int,
+        directory: str,
+        dtypes: Optional[Dict[str, Union[str, np.dtype]]] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(total_size, buffer_num, **kwargs)
+        self._init_storage(directory, dtypes)
+
+
+def load_shards(out_dir: str) -> List[MemmapReplayBuffer]:
+    """A buffer for each shard of a clue.datagen dataset"""
+    with open(os.path.join(out_dir, "index.json")) as f:
+        index = json.load(f)
+    return [
+        MemmapReplayBuffer.from_shard(out_dir, shard)
+        for shard in index["shards"]
+        if shard["length"]
+    ]
@@ -0,0 +1,189 @@
+"""
+Draw complete deals of the cards that are consistent with one observer's
+knowledge.
+
+A deal is a length 21 array giving the holder of each card: 0-5 for the players
+and 6 (ENVELOPE) for the envelope. Thousands of deals are drawn at once, with
+every step vectorised over the samples:
+
+1. The envelope is picked uniformly from the candidates left in each category.
+2. The unknown cards are handed out one at a time, most constrained first. Each
+   card goes to a player who might hold it with probability proportional to how
+   many cards that player still needs. Without any "lacks" facts this is
+   exactly the uniform distribution over deals.
+3. When a card is the last chance to satisfy a "has at least one of" clause
+   it goes to that player. Deals that still get stuck, or break a clause, are
+   rejected.
+
+The facts make the proposal non-uniform, so each accepted deal carries an
+importance weight of 1 / (the probability of proposing it). The weights make
+estimates unbiased for the uniform distribution over consistent deals, which is
+what clue.posterior computes exactly.
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from clue.deduction import (
+    CATEGORY_MASKS,
+    ENVELOPE,
+    NUM_CARDS,
+    NUM_PLAYERS,
+    Contradiction,
+    Deduction,
+    mask_to_cards,
+    popcount,
+)
+from clue.posterior import CATEGORY_OFFSETS, ENVELOPE_SHAPE
+from clue.state import CardState
+
+# How many batches to draw before giving up on finding enough consistent deals
+MAX_BATCHES = 20
+
+
+def sample_deals(
+    deduction: Deduction,
+    num_samples: int,
+    rng: Optional[np.random.Generator] = None,
+) -> np.ndarray:
+    """num_samples x 21 holder arrays drawn (approximately) uniformly from the
+    deals consistent with the deduction. The weighted deals are resampled so
+    every row counts the same."""
+    rng = rng if rng is not None else np.random.default_rng()
+    deals, weights = sample_weighted_deals(deduction, num_samples, rng)
+    picks = rng.choice(len(deals), size=num_samples, p=weights)
+    resampled: np.ndarray = deals[picks]
+    return resampled
+
+
+def sample_deals_from_state(
+    state: CardState,
+    observer: int,
+    num_samples: int,
+    rng: Optional[np.random.Generator] = None,
+) -> np.ndarray:
+    return sample_deals(Deduction.from_card_state(state, observer), num_samples, rng)
+
+
+def sample_weighted_deals(
+    deduction: Deduction,
+    num_samples: int,
+    rng: Optional[np.random.Generator] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """At least num_samples consistent deals and their normalised importance
+    weights.
+
+    Raises Contradiction if no consistent deal turns up in MAX_BATCHES batches.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    deals: List[np.ndarray] = []
+    log_weights: List[np.ndarray] = []
+    accepted = 0
+    for _ in range(MAX_BATCHES):
+        batch, log_weight = _propose(deduction, num_samples, rng)
+        keep = np.isfinite(log_weight)
+        deals.append(batch[keep])
+        log_weights.append(log_weight[keep])
+        accepted += int(keep.sum())
+        if accepted >= num_samples:
+            break
+
+    if accepted == 0:
+        raise Contradiction("Could not find a deal consistent with the facts")
+
+    log_weight = np.concatenate(log_weights)
+    weights = np.exp(log_weight - log_weight.max())
+    return np.concatenate(deals), weights / weights.sum()
+
+
+def estimate_envelope_posterior(
+    deals: np.ndarray, weights: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """The 6x6x9 probability of each envelope, estimated from sampled deals"""
+    envelopes = np.argwhere(deals == ENVELOPE)[:, 1].reshape(len(deals), 3)
+    index = np.ravel_multi_index(
+        tuple((envelopes - CATEGORY_OFFSETS).T), ENVELOPE_SHAPE
+    )
+    counts = np.bincount(index, weights=weights, minlength=int(np.prod(ENVELOPE_SHAPE)))
+    posterior: np.ndarray = counts.reshape(ENVELOPE_SHAPE) / counts.sum()
+    return posterior
+
+
+def _propose(
+    deduction: Deduction, num_samples: int, rng: np.random.Generator
+) -> Tuple[np.ndarray, np.ndarray]:
+    """One batch of proposed deals and the log of their importance weights,
+    which is -inf for rejected deals"""
+    deals = np.full((num_samples, NUM_CARDS), -1, dtype=np.int8)
+    log_weight = np.zeros(num_samples)
+
+    for holder, held in enumerate(deduction.has):
+        deals[:, mask_to_cards(held)] = holder
+    unknown = ~deduction.known_cards()
+
+    # The envelope takes exactly one card from each category
+    for category, candidates in zip(CATEGORY_MASKS, deduction.envelope_candidates()):
+        if deduction.has[ENVELOPE] & category:
+            continue
+        choices = np.array(mask_to_cards(candidates & unknown))
+        if len(choices) == 0:
+            raise Contradiction("No card left that could be in the envelope")
+        picked = rng.integers(len(choices), size=num_samples)
+        deals[np.arange(num_samples), choices[picked]] = ENVELOPE
+        log_weight += np.log(len(choices))
+
+    needed = np.tile(
+        [
+            deduction.sizes[player] - popcount(deduction.has[player])
+            for player in range(NUM_PLAYERS)
+        ],
+        (num_samples, 1),
+    )
+    could_hold = np.array(
+        [
+            [not deduction.lacks[player] & (1 << card) for player in range(NUM_PLAYERS)]
+            for card in range(NUM_CARDS)
+        ]
+    )
+
+    clauses = [
+        (player, mask_to_cards(clause))
+        for player in range(NUM_PLAYERS)
+        for clause in deduction.clauses[player]
+    ]
+
+    # Hand out the cards with the fewest possible holders first, when the
+    # choice is most likely to matter
+    for card in sorted(mask_to_cards(unknown), key=lambda c: could_hold[c].sum()):
+        odds = needed * could_hold[card]
+
+        # If this is the last chance to satisfy a clause the card has to go to
+        # that player. Forcing it doesn't bias anything as the deals it rules
+        # out would have been rejected anyway.
+        forced = np.zeros_like(odds, dtype=bool)
+        for player, cards in clauses:
+            if card in cards:
+                clause_deals = deals[:, cards]
+                last_chance = ~(clause_deals == player).any(axis=1) & (
+                    (clause_deals != -1).sum(axis=1) == len(cards) - 1
+                )
+                forced[last_chance, player] = True
+        odds = np.where(forced.any(axis=1, keepdims=True), odds * forced, odds)
+
+        dealing = deals[:, card] == -1
+        total = odds.sum(axis=1)
+        log_weight[dealing & (total == 0)] = -np.inf
+        dealing &= total > 0
+
+        spin = rng.random(num_samples) * total
+        chosen = (odds.cumsum(axis=1) <= spin[:, None]).sum(axis=1)
+        rows = np.flatnonzero(dealing)
+        deals[rows, card] = chosen[rows]
+        needed[rows, chosen[rows]] -= 1
+        log_weight[rows] += np.log(total[rows] / odds[rows, chosen[rows]])
+
+    log_weight[(deals == -1).any(axis=1)] = -np.inf
+    for player, cards in clauses:
+        log_weight[~(deals[:, cards] == player).any(axis=1)] = -np.inf
+
+    return deals, log_weight
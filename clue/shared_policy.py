@@ -0,0 +1,84 @@
+"""
+A MultiAgentPolicyManager that runs each policy once per batch, however many
+seats it plays.
+
+tianshou's MultiAgentPolicyManager calls every seat's policy on that seat's
+rows of the batch, so in
+
+    MultiAgentPolicyManager([agent_learn] * 3 + [RandomPolicy()] * 3, env)
+
+agent_learn's network does three forward passes a step of the collector, each
+of a few rows. SharedPolicyManager is a drop in replacement that gathers the
+rows of all the seats a policy plays - the same object, as above - and passes
+them through it once, masked with each row's own legal actions, and scatters
+the actions back.
+
+Only acting is batched like this. learn() and process_fn() still go seat by
+seat, as each seat has its own column of rewards to compute returns from. The
+"out" of every seat that shares a policy is the output for all of its rows,
+in the order they are in the batch.
+"""
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from tianshou.data import Batch
+from tianshou.policy import BasePolicy, MultiAgentPolicyManager
+
+
+class SharedPolicyManager(MultiAgentPolicyManager):
+    def groups(self) -> List[Tuple[BasePolicy, List[str]]]:
+        """Each policy, with the agents it plays for"""
+        groups: Dict[int, Tuple[BasePolicy, List[str]]] = {}
+        for agent_id, policy in self.policies.items():
+            groups.setdefault(id(policy), (policy, []))[1].append(agent_id)
+        return list(groups.values())
+
+    def _group_batch(self, batch: Batch, rows: np.ndarray) -> Batch:
+        group_batch = batch[rows]
+        if isinstance(group_batch.rew, np.ndarray):
+            # Each row's reward is its own agent's
+            columns = [self.agent_idx[agent] for agent in batch.obs.agent_id[rows]]
+            group_batch.rew = group_batch.rew[np.arange(len(rows)), columns]
+        if not hasattr(group_batch.obs, "mask"):
+            if hasattr(group_batch.obs, "obs"):
+                group_batch.obs = group_batch.obs.obs
+            if hasattr(group_batch.obs_next, "obs"):
+                group_batch.obs_next = group_batch.obs_next.obs
+        return group_batch
+
+    def exploration_noise(
+        self, act: Union[np.ndarray, Batch], batch: Batch
+    ) -> Union[np.ndarray, Batch]:
+        for policy, agents in self.groups():
+            rows = np.flatnonzero(np.isin(batch.obs.agent_id, agents))
+            if len(rows):
+                act[rows] = policy.exploration_noise(act[rows], batch[rows])
+        return act
+
+    def forward(
+        self,
+        batch: Batch,
+        state: Optional[Union[dict, Batch]] = None,
+        **kwargs: Any,
+    ) -> Batch:
+        if state is not None:
+            # A recurrent policy's state is per agent
+            return super().forward(batch, state, **kwargs)
+
+        acts = []
+        out_dict: Dict[str, Batch] = {}
+        for policy, agents in self.groups():
+            rows = np.flatnonzero(np.isin(batch.obs.agent_id, agents))
+            if not len(rows):
+                out_dict.update((agent, Batch()) for agent in agents)
+                continue
+            out = policy(batch=self._group_batch(batch, rows), state=None, **kwargs)
+            acts.append((rows, out.act))
+            out_dict.update((agent, out) for agent in agents)
+
+        holder = Batch.cat([{"act": act} for _, act in acts])
+        for rows, act in acts:
+            holder.act[rows] = act
+        holder["out"] = out_dict
+        holder["state"] = {agent: Batch() for agent in self.policies}
+        return holder
@@ -1,11 +1,16 @@
-import random
+import copy
+from dataclasses import dataclass
 from enum import Enum
-from typing import Dict, List, Optional, Tuple, cast
+from typing import Any, Dict, List, Optional, Tuple, Union, cast
 
 import numpy as np
 
+from clue import zobrist
 from clue.cards import DECK, PEOPLE_CARDS, ROOM_CARDS, WEAPON_CARDS, Envelope
-from clue.map import ROOM_NAMES, Board
+from clue.deals import DEAL_POOL_SIZE, DealPool, round_robin
+from clue.events import EventKind, EventLog
+from clue.instrumentation import Stats
+from clue.map import Board
 
 # Alway repreresent the state of the world from the
 #  current player's point of view
@@ -37,6 +42,15 @@ SUGGESTION_REMAP = tuple(
     for i in range(6)
 )
 
+# Layout of the flat action space used by the environments
+NUM_MOVE_ACTIONS = len(ROOM_CARDS)  # move towards a room
+SUGGESTION_ACTION_OFFSET = NUM_MOVE_ACTIONS  # 6x6x9 suggestions or accusations
+NO_ACCUSATION_ACTION = SUGGESTION_ACTION_OFFSET + (
+    len(PEOPLE_CARDS) * len(WEAPON_CARDS) * len(ROOM_CARDS)
+)
+DISPROVE_ACTION_OFFSET = NO_ACCUSATION_ACTION + 1  # which card to show
+NUM_ACTIONS = DISPROVE_ACTION_OFFSET + len(DECK)
+
 
 class StepKind(Enum):
     MOVE = 0  # choosing where to place your token
@@ -45,19 +59,59 @@ class StepKind(Enum):
     ACCUSATION = 3  # deciding to make an accusation or no accusation
 
 
+@dataclass(frozen=True)
+class CardStateSnapshot:
+    """Everything about a game that changes as it is played, including the
+    random state: the dice and deals to come. The arrays are private copies,
+    so one snapshot can be restored any number of times."""
+
+    players: Tuple[int, ...]
+    player_positions: Tuple[int, ...]
+    active_players: np.ndarray
+    false_accusers: np.ndarray
+    envelope: Envelope
+    player_card_knowledge: np.ndarray
+    suggestions: np.ndarray
+    suggestion_count: int
+    current_player: int
+    current_step_kind: StepKind
+    current_die_roll: int
+    game_over: bool
+    winner: Optional[int]
+    rng_state: Any
+    next_roll: Optional[int]
+    deal_pool_state: Tuple[np.ndarray, int]
+    suggestion_hash: int
+    players_hash: int
+    knowledge_hashes: Tuple[int, ...]
+
+
 class CardState:
     MAX_PLAYERS = 6
     SEQUENCE_MEMORY = 50
     NUM_ROOMS = len(ROOM_CARDS)
 
     def __init__(
-        self, map_csv: str, max_players: int, log_actions: bool = True
+        self,
+        map_csv: str,
+        max_players: int,
+        log_actions: bool = True,
+        seed: Union[None, int, np.random.SeedSequence] = None,
+        deal_pool_size: int = DEAL_POOL_SIZE,
     ) -> None:
         """
         max_players : Constrain the complexity of the game by reducing the number
          of players.
+        seed : Seeds this game's own random number generator, see seed().
+        deal_pool_size : How many deals to make at a time.
         """
 
+        # All the dice, deals and choice of players come from here
+        self.rng = np.random.default_rng(seed)
+        # When set the next die roll is this instead of a random one, so that
+        #  recorded games replay exactly (see clue.trace)
+        self.next_roll: Optional[int] = None
+        self.deal_pool = DealPool(deal_pool_size)
         self.board = Board(map_csv)
         self.max_players = max_players
         # Who has the weapons
@@ -97,18 +151,31 @@ class CardState:
         )
         self.suggestion_count = 0
 
+        # Zobrist hashes of the game (see clue.zobrist), kept up to date as the
+        #  arrays change: of the suggestion history, the active players and false
+        #  accusers, and of the cards each player has seen. The board keeps the
+        #  hash of where the players are.
+        self.suggestion_hash = 0
+        self.players_hash = 0
+        self.knowledge_hashes = [0] * self.max_players
+
         #
         self.current_player = 0
         self.current_step_kind = StepKind.MOVE
-        self.current_die_roll = random.randrange(1, 6)
+        self.current_die_roll = self.roll_die()
         self.who_am_i = np.identity(self.MAX_PLAYERS, dtype=np.int8)
         self.current_step_kind_matrix = np.identity(len(StepKind), dtype=np.int8)
 
         self.game_over = False
         self.winner: Optional[int] = None
 
-        self.what_just_happened: List[str] = []
+        # What just happened, rendered to text by render(). Only written to
+        #  when should_log_actions is set.
+        self.events = EventLog()
         self.should_log_actions = log_actions
+        # Timings and event counts, only collected when set (see
+        #  clue.instrumentation)
+        self.stats: Optional[Stats] = None
         self.new_game(self.players)
 
     @staticmethod
@@ -180,9 +247,24 @@ class CardState:
 
         return suggestion
 
+    def seed(self, seed: Union[None, int, np.random.SeedSequence] = None) -> None:
+        """Restart the random number generator. Pass a SeedSequence to give
+        games in a batch independent streams, e.g.
+        SeedSequence(seed).spawn(num_games)[game_idx].
+        """
+        self.rng = np.random.default_rng(seed)
+        # Deals made from the old stream would make the seed pointless
+        self.deal_pool.clear()
+
+    def roll_die(self) -> int:
+        if self.next_roll is not None:
+            roll, self.next_roll = self.next_roll, None
+            return roll
+        return int(self.rng.integers(1, 7))
+
     def log_action(self, message: str) -> None:
         if self.should_log_actions:
-            self.what_just_happened.append(message)
+            self.events.message(message)
 
     def make_suggestion(
         self, room_idx: int, person_idx: int, weapon_idx: int
@@ -191,11 +273,15 @@ class CardState:
         returns - the flags of those who could not disprove and the idx of the
         player who can or -1
         """
-        self.log_action(
-            f"{PEOPLE_CARDS[self.current_player].name} suggested:"
-            f"{PEOPLE_CARDS[person_idx].name} in the {ROOM_CARDS[room_idx].name} "
-            f"with the {WEAPON_CARDS[weapon_idx].name}"
-        )
+        start = self.stats.now() if self.stats is not None else 0
+        if self.should_log_actions:
+            self.events.append(
+                EventKind.SUGGESTED,
+                self.current_player,
+                person_idx,
+                weapon_idx,
+                room_idx,
+            )
 
         # move the person to the right room:
         self.board.move_to_room(person_idx, room_idx)
@@ -211,11 +297,13 @@ class CardState:
             other_cards = self.player_card_knowledge[other_idx][other_idx]
             if (suggested_cards * other_cards).any():
                 can_disprove = other_idx
-                self.log_action(f" - {PEOPLE_CARDS[other_idx].name} CAN disprove it")
+                if self.should_log_actions:
+                    self.events.append(EventKind.CAN_DISPROVE, other_idx)
                 break
             else:
                 cant_disprove[other_idx] = 1
-                self.log_action(f" - {PEOPLE_CARDS[other_idx].name} can't disprove it")
+                if self.should_log_actions:
+                    self.events.append(EventKind.CANT_DISPROVE, other_idx)
 
         if can_disprove == -1:
             # No one was able to disprove us so go straight to making an accusation
@@ -227,8 +315,72 @@ class CardState:
             self.current_player = can_disprove
             self.current_step_kind = StepKind.DISPROVE_SUGGESTION
 
+        if self.stats is not None:
+            self.stats.record("make_suggestion", StepKind.SUGGESTION, start)
+            self.stats.count("suggestions")
         return cant_disprove, can_disprove
 
+    def record_suggestion(
+        self,
+        room_idx: int,
+        person_idx: int,
+        weapon_idx: int,
+        suggestor_idx: int,
+        cant_disprove: np.ndarray,
+        can_disprove_idx: int,
+    ) -> None:
+        """Push a suggestion and how it was answered onto the public history"""
+        oldest = self.suggestions[-1].copy()
+        self.suggestions[1:] = self.suggestions[0:-1]
+        self.suggestions[0] = CardState.encode_suggestion_history(
+            room_idx,
+            person_idx,
+            weapon_idx,
+            suggestor_idx=suggestor_idx,
+            cant_disprove=cant_disprove,
+            can_disprove_idx=can_disprove_idx,
+        )
+        self.suggestion_hash = zobrist.push_suggestion(
+            self.suggestion_hash, self.suggestions[0], oldest
+        )
+        self.suggestion_count += 1
+
+    def apply_action(self, action: int) -> Optional[bool]:
+        """Play one action from the flat action space for the current player.
+        Returns whether an accusation was correct, or None if there was no
+        accusation.
+        """
+        if self.current_step_kind == StepKind.MOVE:
+            self.move_player(action, towards_room=True)
+
+        elif self.current_step_kind == StepKind.SUGGESTION:
+            person, weapon, room = CardState.suggestion_one_hot_decode(
+                action - SUGGESTION_ACTION_OFFSET
+            )
+            suggestor_idx = self.current_player
+            cant_disprove, can_disprove_idx = self.make_suggestion(
+                room_idx=room, person_idx=person, weapon_idx=weapon
+            )
+            self.record_suggestion(
+                room,
+                person,
+                weapon,
+                suggestor_idx=suggestor_idx,
+                cant_disprove=cant_disprove,
+                can_disprove_idx=can_disprove_idx,
+            )
+
+        elif self.current_step_kind == StepKind.DISPROVE_SUGGESTION:
+            self.show_player_card(
+                disprover_idx=self.current_player,
+                deck_idx=action - DISPROVE_ACTION_OFFSET,
+            )
+
+        elif self.current_step_kind == StepKind.ACCUSATION:
+            return self.make_accusation(action - SUGGESTION_ACTION_OFFSET)
+
+        return None
+
     def show_player_card(self, disprover_idx: int, deck_idx: int) -> None:
         """A player shows one of their cards
         to the player which disproves their suggestion,
@@ -238,13 +390,19 @@ class CardState:
         suggestor_idx = self.get_last_suggestor()
 
         # Update the suggestors knowledege:
+        if not self.player_card_knowledge[suggestor_idx][disprover_idx][deck_idx]:
+            self.knowledge_hashes[suggestor_idx] ^= int(
+                zobrist.KNOWLEDGE_KEYS[suggestor_idx, disprover_idx, deck_idx]
+            )
         self.player_card_knowledge[suggestor_idx][disprover_idx][deck_idx] = 1
 
-        self.log_action(
-            f"{PEOPLE_CARDS[disprover_idx].name} disproves "
-            f"{PEOPLE_CARDS[suggestor_idx].name}'s "
-            f"suggestion by showing them {DECK[deck_idx].name}."
-        )
+        if self.should_log_actions:
+            self.events.append(
+                EventKind.SHOWED_CARD, disprover_idx, suggestor_idx, deck_idx
+            )
+
+        if self.stats is not None:
+            self.stats.count("disproves")
 
         # Next it is the suggestors turn or make an accusation (or not)
         self.current_player = suggestor_idx
@@ -258,14 +416,19 @@ class CardState:
         # num_players = random.randint(3, self.max_players)
         num_players = 6
         # Miss Scarlett always goes first, so only get to pick from the other five:
-        players = [0] + random.sample(range(1, 6), k=num_players - 1)
+        players = [0] + [
+            int(i) for i in self.rng.choice(range(1, 6), num_players - 1, replace=False)
+        ]
         # Sort inplace
         players.sort()
         return players
 
-    def new_game(self, players: List[int]) -> None:
+    def new_game(
+        self, players: List[int], holders: Optional[np.ndarray] = None
+    ) -> None:
         """Start a new game
         players - the player ids for the folks playing.
+        holders - the deal to use, as for load_deal(), instead of a random one.
         """
         if players[0] != 0:
             raise ValueError(
@@ -273,11 +436,10 @@ class CardState:
                 "must be the first player! Unable to player_idx without her."
             )
 
-        self.log_action(
-            f"New game started with {len(players)} players: "
-            + ", ".join(PEOPLE_CARDS[i].name for i in players)
-            + "."
-        )
+        if self.should_log_actions:
+            self.events.append(EventKind.NEW_GAME, *players)
+        if self.stats is not None:
+            self.stats.count("games")
 
         self.players = players
         self.num_players = len(players)
@@ -286,54 +448,38 @@ class CardState:
             self.active_players[player_idx] = 1
 
         self.false_accusers = np.zeros(self.max_players, dtype=np.int8)
+        self.board.reset_positions()
 
-        # grab cards for the envelope:
-        self.envelope = Envelope(
-            person=random.choice(PEOPLE_CARDS),
-            weapon=random.choice(WEAPON_CARDS),
-            room=random.choice(ROOM_CARDS),
-        )
-
-        self.log_action(
-            f"OMG there has been a murder: {self.envelope.person.name} did it in the "
-            f"{self.envelope.room.name} with the {self.envelope.weapon.name}!"
-        )
-
-        # Shuffle the other cards
-        remaining_cards = [
-            idx
-            for idx in list(range(len(DECK)))
-            if (
-                idx != self.envelope.person.idx
-                and idx != self.envelope.weapon.idx
-                and idx != self.envelope.room.idx
-            )
-        ]
-        random.shuffle(remaining_cards)
-
-        # Assign the cards to the players:
-
+        # The envelope is the last three cards of the deal, the rest are
+        #  dealt round robin. Initially each player only knows their own cards.
         self.player_card_knowledge.fill(0)
-        for i, card_idx in enumerate(remaining_cards):
-            player_idx = self.players[i % self.num_players]
-            # Initially each player only knows their own cards
-            self.player_card_knowledge[player_idx][player_idx][card_idx] = 1
-
-        self.log_action("The cards were dealt:")
-
-        for player_idx in self.players:
-            card_names = [
-                DECK[i].name
-                for i, has_card in enumerate(
-                    self.player_card_knowledge[player_idx][player_idx]
+        if holders is None:
+            deal = self.deal_pool.pop(self.rng)
+            person, weapon, room = deal[-3:]
+            self.envelope = Envelope(DECK[person], DECK[weapon], DECK[room])
+            dealt_to = round_robin(tuple(self.players))
+            self.player_card_knowledge[dealt_to, dealt_to, deal[:-3]] = 1
+        else:
+            self.load_deal(holders)
+            person, weapon, room = (
+                card.idx
+                for card in (
+                    self.envelope.person,
+                    self.envelope.weapon,
+                    self.envelope.room,
                 )
-                if has_card
-            ]
-            self.log_action(
-                f"{PEOPLE_CARDS[player_idx].name} got:\n  - "
-                + "\n  - ".join(card_names)
             )
 
+        if self.should_log_actions:
+            self.events.append(EventKind.MURDER, person, weapon, room)
+            self.log_action("The cards were dealt:")
+            for player_idx in self.players:
+                self.events.append(
+                    EventKind.DEALT,
+                    player_idx,
+                    *np.flatnonzero(self.player_card_knowledge[player_idx][player_idx]),
+                )
+
         # Reset the suggestions and disproving info
         #  - this knowledge is public:
         self.suggestions.fill(0)
@@ -341,29 +487,138 @@ class CardState:
 
         self.current_player = 0
         self.current_step_kind = StepKind.MOVE
-        self.current_die_roll = random.randint(1, 6)
+        self.current_die_roll = self.roll_die()
 
-        self.log_action(
-            f"{PEOPLE_CARDS[self.current_player].name} rolled {self.current_die_roll}"
-        )
+        if self.should_log_actions:
+            self.events.append(
+                EventKind.ROLLED, self.current_player, self.current_die_roll
+            )
 
         self.game_over = False
         self.winner = None
+        self.rehash()
+
+    def snapshot(self) -> CardStateSnapshot:
+        return CardStateSnapshot(
+            players=tuple(self.players),
+            player_positions=tuple(self.board.player_positions),
+            active_players=self.active_players.copy(),
+            false_accusers=self.false_accusers.copy(),
+            envelope=self.envelope,
+            player_card_knowledge=self.player_card_knowledge.copy(),
+            suggestions=self.suggestions.copy(),
+            suggestion_count=self.suggestion_count,
+            current_player=self.current_player,
+            current_step_kind=self.current_step_kind,
+            current_die_roll=self.current_die_roll,
+            game_over=self.game_over,
+            winner=self.winner,
+            rng_state=self.rng.bit_generator.state,
+            next_roll=self.next_roll,
+            deal_pool_state=self.deal_pool.get_state(),
+            suggestion_hash=self.suggestion_hash,
+            players_hash=self.players_hash,
+            knowledge_hashes=tuple(self.knowledge_hashes),
+        )
+
+    def restore(self, snapshot: CardStateSnapshot, restore_rng: bool = True) -> None:
+        """Put the game back how it was when the snapshot was taken.
+        restore_rng - set to False to keep drawing fresh dice and deals, e.g.
+         when the same position is played out many times.
+        """
+        self.players = list(snapshot.players)
+        self.num_players = len(self.players)
+        self.board.restore_positions(snapshot.player_positions)
+        np.copyto(self.active_players, snapshot.active_players)
+        np.copyto(self.false_accusers, snapshot.false_accusers)
+        self.envelope = snapshot.envelope
+        np.copyto(self.player_card_knowledge, snapshot.player_card_knowledge)
+        np.copyto(self.suggestions, snapshot.suggestions)
+        self.suggestion_count = snapshot.suggestion_count
+        self.current_player = snapshot.current_player
+        self.current_step_kind = snapshot.current_step_kind
+        self.current_die_roll = snapshot.current_die_roll
+        self.game_over = snapshot.game_over
+        self.winner = snapshot.winner
+        self.suggestion_hash = snapshot.suggestion_hash
+        self.players_hash = snapshot.players_hash
+        self.knowledge_hashes = list(snapshot.knowledge_hashes)
+        if restore_rng:
+            self.rng.bit_generator.state = snapshot.rng_state
+            self.next_roll = snapshot.next_roll
+            self.deal_pool.set_state(snapshot.deal_pool_state)
+
+    def clone(self) -> "CardState":
+        """An independent copy of the game to play ahead in. The static board
+        data is shared with this one and the action log starts empty.
+
+        The clone gets a copy of the random number generator and the deal
+        pool, so it rolls the same dice and deals the same games as this game
+        would unless it is re-seeded.
+        """
+        other = copy.copy(self)
+        other.rng = copy.deepcopy(self.rng)
+        other.deal_pool = DealPool(self.deal_pool.size)
+        other.deal_pool.set_state(self.deal_pool.get_state())
+        other.board = self.board.clone()
+        other.players = self.players.copy()
+        other.active_players = self.active_players.copy()
+        other.false_accusers = self.false_accusers.copy()
+        other.player_card_knowledge = self.player_card_knowledge.copy()
+        other.suggestions = self.suggestions.copy()
+        other.knowledge_hashes = self.knowledge_hashes.copy()
+        other.events = EventLog()
+        # Playing ahead isn't part of this game's statistics
+        other.stats = None
+        return other
+
+    def load_deal(self, holders: np.ndarray) -> None:
+        """Replace the deal with another one, e.g. one drawn by clue.sampling.
+        holders - the holder of each card: a player idx or 6 for the envelope.
+
+        Anything a player has seen that doesn't fit the new deal is forgotten.
+        """
+        envelope_cards = np.flatnonzero(holders == self.MAX_PLAYERS)
+        if len(envelope_cards) != 3:
+            raise ValueError(
+                f"Expected 3 cards in the envelope, got {len(envelope_cards)}"
+            )
+        person, weapon, room = (DECK[i] for i in envelope_cards)
+        self.envelope = Envelope(person, weapon, room)
+
+        hands = (holders == np.arange(self.MAX_PLAYERS)[:, None]).astype(np.int8)
+        self.player_card_knowledge &= hands
+        diagonal = np.arange(self.MAX_PLAYERS)
+        self.player_card_knowledge[diagonal, diagonal] = hands
+        self.knowledge_hashes = zobrist.knowledge_hashes(self.player_card_knowledge)
+
+    def deal_holders(self) -> np.ndarray:
+        """The holder of each card: a player idx or 6 for the envelope - the
+        inverse of load_deal()"""
+        holders = np.full(len(DECK), self.MAX_PLAYERS, dtype=np.int8)
+        diagonal = np.arange(self.MAX_PLAYERS)
+        player, card = np.nonzero(self.player_card_knowledge[diagonal, diagonal])
+        holders[card] = player
+        return holders
 
     def next_move(self) -> None:
         self.current_player = self.next_player()
         self.current_step_kind = StepKind.MOVE
-        self.current_die_roll = random.randint(1, 6)
+        self.current_die_roll = self.roll_die()
 
-        self.log_action(
-            f"{PEOPLE_CARDS[self.current_player].name} rolled {self.current_die_roll}"
-        )
+        if self.should_log_actions:
+            self.events.append(
+                EventKind.ROLLED, self.current_player, self.current_die_roll
+            )
 
     def move_player(self, new_position: int, towards_room: bool = False) -> None:
         if towards_room:
+            start = self.stats.now() if self.stats is not None else 0
             self.board.move_towards_room(
                 self.current_player, self.current_die_roll, new_position
             )
+            if self.stats is not None:
+                self.stats.record("move_towards_room", StepKind.MOVE, start)
         else:
             self.board.set_location(self.current_player, new_position)
 
@@ -373,21 +628,21 @@ class CardState:
             #  to accusation.
             self.current_step_kind = StepKind.SUGGESTION
             if self.should_log_actions:
-                self.log_action(
-                    f"{PEOPLE_CARDS[self.current_player].name} entered the "
-                    f"{ROOM_NAMES[self.board.which_room(self.current_player)]} "
+                self.events.append(
+                    EventKind.ENTERED_ROOM,
+                    self.current_player,
+                    self.board.which_room(self.current_player),
                 )
-                self.log_action(self.board.generate_board_string())
+                self.events.append(EventKind.BOARD, *self.board.player_positions)
 
         else:
             if self.should_log_actions:
-                pos_idx = self.board.player_positions[self.current_player]
-                cell = self.board.locations[pos_idx]
-                self.log_action(
-                    f"{PEOPLE_CARDS[self.current_player].name} moved to cell "
-                    f"{cell.i}, {cell.j}"
+                self.events.append(
+                    EventKind.MOVED,
+                    self.current_player,
+                    self.board.player_positions[self.current_player],
                 )
-                self.log_action(self.board.generate_board_string())
+                self.events.append(EventKind.BOARD, *self.board.player_positions)
             self.next_move()
 
     def make_accusation(self, accusation_one_hot_idx: int) -> Optional[bool]:
@@ -397,10 +652,8 @@ class CardState:
         if accusation_one_hot_idx == 324:
             # The action is the don't make accusation action
             #  Just move on to the next player
-            self.log_action(
-                f"{PEOPLE_CARDS[self.current_player].name} decided not to make an"
-                " accusation"
-            )
+            if self.should_log_actions:
+                self.events.append(EventKind.NO_ACCUSATION, self.current_player)
             self.next_move()
             return None
 
@@ -411,34 +664,80 @@ class CardState:
             and WEAPON_CARDS[w] == self.envelope.weapon
         )
 
-        self.log_action(
-            f"{PEOPLE_CARDS[self.current_player].name} made an accusation: "
-            f"{PEOPLE_CARDS[p].name} in the {ROOM_CARDS[r].name} with the "
-            f"{WEAPON_CARDS[w].name}"
-        )
+        if self.should_log_actions:
+            self.events.append(EventKind.ACCUSED, self.current_player, p, w, r)
+        if self.stats is not None:
+            self.stats.count("accusations")
+            self.stats.count("wins" if correct else "eliminations")
 
         if correct:
             # This player just won!
             self.game_over = True
             self.winner = self.current_player
-            self.log_action(
-                f"{PEOPLE_CARDS[self.current_player].name} is correct and has won!"
-            )
+            if self.should_log_actions:
+                self.events.append(EventKind.WON, self.current_player)
 
         else:
+            if not self.false_accusers[accuser_idx]:
+                self.players_hash ^= zobrist.FALSE_ACCUSER_KEYS[accuser_idx]
             self.false_accusers[accuser_idx] = 1
-            self.log_action(
-                f"{PEOPLE_CARDS[self.current_player].name} is wrong - they are out!"
-            )
+            if self.should_log_actions:
+                self.events.append(EventKind.ELIMINATED, self.current_player)
             if np.dot(self.active_players, self.false_accusers) == self.num_players:
                 # All players make false accusations!
-                self.log_action("There are no players left - GAME OVER")
+                if self.should_log_actions:
+                    self.events.append(EventKind.GAME_OVER)
                 self.game_over = True
             else:
                 self.next_move()
 
         return correct
 
+    def rehash(self) -> None:
+        """Recompute the hashes from scratch. They are kept up to date as the
+        game is played, so this is only needed after writing to the arrays
+        directly."""
+        self.board.rehash_positions()
+        self.suggestion_hash = zobrist.history_hash(self.suggestions)
+        self.players_hash = 0
+        for player_idx in np.flatnonzero(self.active_players):
+            self.players_hash ^= zobrist.ACTIVE_PLAYER_KEYS[player_idx]
+        for player_idx in np.flatnonzero(self.false_accusers):
+            self.players_hash ^= zobrist.FALSE_ACCUSER_KEYS[player_idx]
+        self.knowledge_hashes = zobrist.knowledge_hashes(self.player_card_knowledge)
+
+    def _public_hash(self) -> int:
+        """The hash of what every player can see. Whose turn it is, the step
+        kind and the die are only a few keys, so they are XORed in here rather
+        than as they change."""
+        public = (
+            self.board.position_hash
+            ^ self.suggestion_hash
+            ^ self.players_hash
+            ^ zobrist.CURRENT_PLAYER_KEYS[self.current_player]
+            ^ zobrist.STEP_KIND_KEYS[self.current_step_kind.value]
+            ^ zobrist.DIE_ROLL_KEYS[self.current_die_roll]
+        )
+        return public ^ zobrist.GAME_OVER_KEY if self.game_over else public
+
+    def state_hash(self) -> int:
+        """A 64 bit Zobrist hash of the whole game, e.g. for a transposition
+        table. Equal games have equal hashes, wherever they were played."""
+        full = self._public_hash()
+        for knowledge in self.knowledge_hashes:
+            full ^= knowledge
+        return full
+
+    def information_hash(self, player_idx: int) -> int:
+        """A 64 bit Zobrist hash of what the player knows of the game: the
+        public state and the cards they have seen. Games the player can't tell
+        apart have equal hashes."""
+        return (
+            self._public_hash()
+            ^ self.knowledge_hashes[player_idx]
+            ^ zobrist.OBSERVER_KEYS[player_idx]
+        )
+
     def is_false_accuser(self, player_idx: int) -> bool:
         return cast(bool, self.false_accusers[player_idx] == 1)
 
@@ -546,6 +845,7 @@ class CardState:
         return cast(int, seen_cards.sum())
 
     def legal_actions(self) -> np.ndarray:
+        start = self.stats.now() if self.stats is not None else 0
         # Action space:
         #  - move positions: 1x9
         if self.current_step_kind == StepKind.MOVE:
@@ -585,7 +885,7 @@ class CardState:
         else:
             legal_disprove = np.zeros(21)
 
-        return np.concatenate(
+        legal: np.ndarray = np.concatenate(
             (
                 legal_positions,
                 suggestions_or_accusations,
@@ -593,6 +893,9 @@ class CardState:
                 legal_disprove,
             )
         )
+        if self.stats is not None:
+            self.stats.record("legal_actions", self.current_step_kind, start)
+        return legal
 
     def _legal_suggestions(self) -> np.ndarray:
         suggestion = np.zeros(
@@ -680,9 +983,10 @@ class CardState:
         return self.current_player
 
     def render(self) -> str:
+        """Describe what happened since the last call"""
         if self.should_log_actions:
-            events = "\n".join(self.what_just_happened)
-            self.what_just_happened = []
+            events = self.events.render(self.board)
+            self.events.clear()
             return events
         else:
             return ""
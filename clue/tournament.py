@@ -0,0 +1,252 @@
+"""
+A round robin tournament among policies, with an Elo ladder.
+
+    python -m clue.tournament heuristic random log/rps/dqn/policy_clue_v2_*.pth
+
+Every pair of entrants - policy specs, see clue.policies, or checkpoint files -
+plays --games-per-pair games. In each game the pair take alternate seats, and
+from one game to the next they swap, so each is Miss Scarlet (player 0, who
+alone may accuse before seeing all but three cards) in half of them.
+
+Each game is appended to the --results file as a line of JSON once played,
+and the Elo ratings are updated from it: the winner's entrant beats the
+other, and a game that no-one wins is a draw. Running again with more
+entrants, or games per pair, only plays the games not in the file yet, and
+the ratings are those from replaying every game in the file in order.
+--show prints the ladder of a results file without playing.
+
+Games are seeded from --seed and the pair and game number, so a game doesn't
+depend on which other entrants there are. They are played by a pool of
+workers, --lockstep games at a time each, in the v2 environment, so every
+entrant must take its flat observations.
+"""
+import argparse
+import json
+import os
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from itertools import combinations
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from clue.evaluate import GameResult, checkpoint_spec, load_policy, play_seated
+
+NUM_SEATS = 6
+INITIAL_RATING = 1500.0
+K_FACTOR = 16.0
+
+
+@dataclass
+class MatchGame:
+    a: str
+    b: str
+    round: int  # which of the pair's games
+    winner: Optional[str] = None
+    steps: int = 0
+    truncated: bool = False
+
+    @property
+    def key(self) -> Tuple[str, str, int]:
+        return self.a, self.b, self.round
+
+    def seats(self) -> List[str]:
+        """The entrant in each seat, a taking the even seats in even rounds"""
+        first, second = (self.a, self.b) if self.round % 2 == 0 else (self.b, self.a)
+        return [first, second] * (NUM_SEATS // 2)
+
+
+def game_seed(
+    seed: int, a: str, b: str, round: int, stream: int = 0
+) -> np.random.SeedSequence:
+    """The seed of a game's deal (stream 0) or of the policies' choices in a
+    chunk starting with the game (stream 1)"""
+    return np.random.SeedSequence(
+        [seed, zlib.crc32(f"{a}|{b}".encode()), round, stream]
+    )
+
+
+def play_match(
+    games: Sequence[MatchGame], seed: int, lockstep: int, max_steps: int
+) -> List[MatchGame]:
+    """Play some of a pair's games, in a worker"""
+    a, b = games[0].a, games[0].b
+    rng = np.random.default_rng(game_seed(seed, a, b, games[0].round, stream=1))
+    policies = {a: load_policy(a, rng), b: load_policy(b, rng)}
+    results = play_seated(
+        [
+            (
+                GameResult(i, 0, -1, 0, 0, 0, False),
+                game_seed(seed, a, b, game.round),
+                [policies[entrant] for entrant in game.seats()],
+            )
+            for i, game in enumerate(games)
+        ],
+        lockstep,
+        max_steps,
+    )
+    for result in results:
+        game = games[result.game]
+        if result.winner >= 0:
+            game.winner = game.seats()[result.winner]
+        game.steps = result.steps
+        game.truncated = result.truncated
+    return list(games)
+
+
+class Ladder:
+    def __init__(self, k_factor: float = K_FACTOR) -> None:
+        self.k_factor = k_factor
+        self.ratings: Dict[str, float] = {}
+        self.record: Dict[str, List[int]] = {}  # [wins, draws, losses]
+
+    def add(self, game: MatchGame) -> None:
+        for entrant in (game.a, game.b):
+            self.ratings.setdefault(entrant, INITIAL_RATING)
+            self.record.setdefault(entrant, [0, 0, 0])
+        if game.winner is None:
+            score = 0.5
+            self.record[game.a][1] += 1
+            self.record[game.b][1] += 1
+        else:
+            score = 1.0 if game.winner == game.a else 0.0
+            winner, loser = (game.a, game.b) if score else (game.b, game.a)
+            self.record[winner][0] += 1
+            self.record[loser][2] += 1
+
+        expected = 1 / (1 + 10 ** ((self.ratings[game.b] - self.ratings[game.a]) / 400))
+        change = self.k_factor * (score - expected)
+        self.ratings[game.a] += change
+        self.ratings[game.b] -= change
+
+    def table(self) -> str:
+        lines = [f"{'rating':>7} {'won':>6} {'drawn':>6} {'lost':>6}  entrant"]
+        for entrant, rating in sorted(self.ratings.items(), key=lambda item: -item[1]):
+            won, drawn, lost = self.record[entrant]
+            lines.append(f"{rating:>7.0f} {won:>6} {drawn:>6} {lost:>6}  {entrant}")
+        return "\n".join(lines)
+
+
+def load_results(path: str) -> List[MatchGame]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [MatchGame(**json.loads(line)) for line in f if line.strip()]
+
+
+def schedule(
+    entrants: Sequence[str], games_per_pair: int, played: Set[Tuple[str, str, int]]
+) -> List[MatchGame]:
+    """The games still to play between every pair of entrants"""
+    return [
+        MatchGame(a, b, round)
+        for a, b in combinations(sorted(set(entrants)), 2)
+        for round in range(games_per_pair)
+        if (a, b, round) not in played
+    ]
+
+
+def chunks(games: Iterable[MatchGame], size: int) -> Iterator[List[MatchGame]]:
+    """Games of the same pair, up to size at a time"""
+    chunk: List[MatchGame] = []
+    for game in games:
+        if chunk and (
+            len(chunk) == size or (game.a, game.b) != (chunk[0].a, chunk[0].b)
+        ):
+            yield chunk
+            chunk = []
+        chunk.append(game)
+    if chunk:
+        yield chunk
+
+
+def run(
+    entrants: Sequence[str],
+    results_path: str,
+    games_per_pair: int = 24,
+    workers: int = 1,
+    seed: int = 0,
+    lockstep: int = 12,
+    max_steps: int = 500,
+    k_factor: float = K_FACTOR,
+) -> Ladder:
+    """Play the games missing from the results file, appending each as it
+    finishes, and return the ladder of all of them"""
+    entrants = [checkpoint_spec(entrant) for entrant in entrants]
+    played = load_results(results_path)
+    ladder = Ladder(k_factor)
+    for game in played:
+        ladder.add(game)
+
+    pending = schedule(entrants, games_per_pair, {game.key for game in played})
+    if not pending:
+        return ladder
+
+    with open(results_path, "a") as results:
+
+        def record(games: List[MatchGame]) -> None:
+            for game in games:
+                results.write(json.dumps(asdict(game)) + "\n")
+                ladder.add(game)
+            results.flush()
+
+        jobs = list(chunks(pending, lockstep))
+        if workers == 1:
+            for job in jobs:
+                record(play_match(job, seed, lockstep, max_steps))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures: List["Future[List[MatchGame]]"] = [
+                    pool.submit(play_match, job, seed, lockstep, max_steps)
+                    for job in jobs
+                ]
+                # In the order they were scheduled, so a file is the same
+                # whatever the number of workers
+                for future in futures:
+                    record(future.result())
+    return ladder
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a tournament among policies")
+    parser.add_argument(
+        "entrants",
+        nargs="*",
+        help="checkpoint .pth files or policy specs, e.g. heuristic",
+    )
+    parser.add_argument("--results", default=os.path.join("log", "tournament.jsonl"))
+    parser.add_argument("--games-per-pair", type=int, default=24)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--lockstep", type=int, default=12)
+    parser.add_argument("--max-steps", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--k-factor", type=float, default=K_FACTOR)
+    parser.add_argument(
+        "--show", action="store_true", help="print the ladder without playing"
+    )
+    args = parser.parse_args()
+
+    if args.show:
+        ladder = Ladder(args.k_factor)
+        for game in load_results(args.results):
+            ladder.add(game)
+    else:
+        if len(args.entrants) < 2:
+            parser.error("need at least two entrants")
+        os.makedirs(os.path.dirname(args.results) or ".", exist_ok=True)
+        ladder = run(
+            args.entrants,
+            args.results,
+            games_per_pair=args.games_per_pair,
+            workers=args.workers,
+            seed=args.seed,
+            lockstep=args.lockstep,
+            max_steps=args.max_steps,
+            k_factor=args.k_factor,
+        )
+    print(ladder.table())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Compact records of whole games that can be replayed exactly.
+
+A game is fully determined by the players, the deal, the die rolls and the
+actions taken, so that is all a trace keeps:
+
+- players: the player idxs, in seat order
+- deal: the holder of each card (see CardState.load_deal)
+- first_roll: the die roll for the first move
+- actions: the action taken at each step, from the flat action space
+- rolls: the die roll after each step. Only steps that end a turn roll the
+  die, the others repeat the previous roll.
+- mask_hashes: optionally, the crc32 of the legal actions before each step,
+  used to check that a replay hasn't diverged from the recorded game.
+
+Many traces are saved to one .npz file as columns: the fixed size fields are
+one row per game and the per step fields are concatenated, with offsets giving
+where each game starts. A game of a few hundred steps compresses to under a
+kilobyte.
+
+    recorder = TraceRecorder(state)
+    while not state.game_over:
+        action = ...
+        recorder.record(state, action)
+        state.apply_action(action)
+    save_traces("games.npz", [recorder.finish(state)])
+
+    state = replay(load_traces("games.npz")[0], step=100)
+
+Run `python -m clue.trace games.npz --game 0` to print a saved game.
+"""
+import argparse
+import os
+import zlib
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from clue.state import CardState
+
+MAP_LOCATION = os.path.join(os.path.dirname(os.path.abspath(__file__)), "map49.csv")
+
+NO_PLAYER = -1
+
+
+@dataclass
+class GameTrace:
+    players: np.ndarray
+    deal: np.ndarray
+    first_roll: int
+    actions: np.ndarray
+    rolls: np.ndarray
+    mask_hashes: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+
+def mask_hash(legal: np.ndarray) -> int:
+    return zlib.crc32(np.asarray(legal, dtype=np.int8).tobytes())
+
+
+class TraceRecorder:
+    def __init__(self, state: CardState, hash_masks: bool = False) -> None:
+        """Start recording the game state has just started"""
+        self.players = np.array(state.players, dtype=np.int8)
+        self.deal = state.deal_holders()
+        self.first_roll = state.current_die_roll
+        self.hash_masks = hash_masks
+        self.actions: List[int] = []
+        self.rolls: List[int] = []
+        self.mask_hashes: List[int] = []
+
+    def record(self, state: CardState, action: int) -> None:
+        """Call just before action is applied to state"""
+        # The roll before this step is the roll after the previous one
+        if self.actions:
+            self.rolls.append(state.current_die_roll)
+        self.actions.append(int(action))
+        if self.hash_masks:
+            self.mask_hashes.append(mask_hash(state.legal_actions()))
+
+    def finish(self, state: CardState) -> GameTrace:
+        """The trace of the game so far, once the last action was applied"""
+        rolls = self.rolls + [state.current_die_roll] if self.actions else []
+        return GameTrace(
+            players=self.players,
+            deal=self.deal,
+            first_roll=self.first_roll,
+            actions=np.array(self.actions, dtype=np.uint16),
+            rolls=np.array(rolls, dtype=np.uint8),
+            mask_hashes=(
+                np.array(self.mask_hashes, dtype=np.uint32) if self.hash_masks else None
+            ),
+        )
+
+
+def start_replay(
+    trace: GameTrace, map_csv: str = MAP_LOCATION, log_actions: bool = False
+) -> CardState:
+    """A new game with the trace's players and deal"""
+    state = CardState(map_csv, max_players=CardState.MAX_PLAYERS, log_actions=False)
+    state.should_log_actions = log_actions
+    state.next_roll = trace.first_roll
+    state.new_game([int(player) for player in trace.players], holders=trace.deal)
+    return state
+
+
+def replay_steps(
+    trace: GameTrace,
+    map_csv: str = MAP_LOCATION,
+    log_actions: bool = False,
+    check_masks: bool = True,
+) -> Iterator[CardState]:
+    """The game at each step of the trace, from the start to after the last
+    action. The same CardState is yielded each time, updated in place.
+
+    Raises ValueError if a recorded mask hash doesn't match the replay.
+    """
+    state = start_replay(trace, map_csv, log_actions)
+    yield state
+    check_masks = check_masks and trace.mask_hashes is not None
+    for step, (action, roll) in enumerate(zip(trace.actions, trace.rolls)):
+        if check_masks:
+            assert trace.mask_hashes is not None
+            if mask_hash(state.legal_actions()) != trace.mask_hashes[step]:
+                raise ValueError(f"The replay diverged from the trace at step {step}")
+        state.next_roll = int(roll)
+        state.apply_action(int(action))
+        # Only steps that end a turn roll the die
+        state.next_roll = None
+        yield state
+
+
+def replay(
+    trace: GameTrace,
+    step: Optional[int] = None,
+    map_csv: str = MAP_LOCATION,
+    check_masks: bool = True,
+) -> CardState:
+    """The game after the first step actions of the trace, or all of them"""
+    step = len(trace) if step is None else step
+    if not 0 <= step <= len(trace):
+        raise ValueError(f"step must be between 0 and {len(trace)}, got {step}")
+    for played, state in enumerate(
+        replay_steps(trace, map_csv, check_masks=check_masks)
+    ):
+        if played == step:
+            break
+    return state
+
+
+def save_traces(path: str, traces: Sequence[GameTrace]) -> None:
+    lengths = np.array([len(trace) for trace in traces], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    players = np.full((len(traces), CardState.MAX_PLAYERS), NO_PLAYER, dtype=np.int8)
+    for row, trace in zip(players, traces):
+        row[: len(trace.players)] = trace.players
+
+    columns = {
+        "offsets": offsets,
+        "players": players,
+        "deals": np.array([trace.deal for trace in traces], dtype=np.int8).reshape(
+            len(traces), -1
+        ),
+        "first_rolls": np.array([t.first_roll for t in traces], dtype=np.uint8),
+        "actions": np.concatenate(
+            [np.empty(0, dtype=np.uint16)] + [t.actions for t in traces]
+        ),
+        "rolls": np.concatenate(
+            [np.empty(0, dtype=np.uint8)] + [t.rolls for t in traces]
+        ),
+    }
+    if traces and all(trace.mask_hashes is not None for trace in traces):
+        columns["mask_hashes"] = np.concatenate(
+            [np.asarray(trace.mask_hashes, dtype=np.uint32) for trace in traces]
+        )
+    np.savez_compressed(path, **columns)
+
+
+class TraceFile:
+    """The traces saved in one file, unpacked on demand"""
+
+    def __init__(self, path: str) -> None:
+        with np.load(path) as data:
+            self.columns = {name: data[name] for name in data.files}
+        self.offsets = self.columns["offsets"]
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, game: int) -> GameTrace:
+        if not -len(self) <= game < len(self):
+            raise IndexError(f"There are only {len(self)} games")
+        game %= len(self)
+        steps = slice(self.offsets[game], self.offsets[game + 1])
+        players = self.columns["players"][game]
+        hashes = self.columns.get("mask_hashes")
+        return GameTrace(
+            players=players[players != NO_PLAYER],
+            deal=self.columns["deals"][game],
+            first_roll=int(self.columns["first_rolls"][game]),
+            actions=self.columns["actions"][steps],
+            rolls=self.columns["rolls"][steps],
+            mask_hashes=hashes[steps] if hashes is not None else None,
+        )
+
+    def __iter__(self) -> Iterator[GameTrace]:
+        for game in range(len(self)):
+            yield self[game]
+
+
+def load_traces(path: str) -> TraceFile:
+    return TraceFile(path)
+
+
+def show_trace(path: str, game: int = 0, map_csv: str = MAP_LOCATION) -> None:
+    """Print what happened at each step of a saved game"""
+    trace = load_traces(path)[game]
+    print(f"Game {game}: {len(trace)} steps")
+    for step, state in enumerate(replay_steps(trace, map_csv, log_actions=True)):
+        print(f"---- step {step}")
+        print(state.render())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Print a saved game")
+    parser.add_argument("path")
+    parser.add_argument("--game", type=int, default=0)
+    args = parser.parse_args()
+    show_trace(args.path, args.game)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,31 @@
 # type: ignore
+import argparse
 import os
+import shutil
+import tempfile
 import time
 from typing import Optional, Tuple
 
 import gym
 import numpy as np
 import torch
-from tianshou.data import Collector, VectorReplayBuffer
-from tianshou.env import SubprocVectorEnv
+from tianshou.data import Collector
+from tianshou.env import DummyVectorEnv, SubprocVectorEnv
 from tianshou.env.pettingzoo_env import PettingZooEnv
-from tianshou.policy import BasePolicy, DQNPolicy, MultiAgentPolicyManager, RandomPolicy
+from tianshou.policy import BasePolicy, DQNPolicy, RandomPolicy
 from tianshou.trainer import offpolicy_trainer
 from tianshou.utils.net.common import Net
 
+from clue import profiling
 from clue.env.clue_environment_v2 import env
+from clue.replay_buffer import MemmapVectorReplayBuffer
+from clue.shared_policy import SharedPolicyManager
 
 FILE_PREFIX = "clue_v2"
 NET_SIZE = 128
 MODEL_PATH = os.path.join("log", "rps", "dqn", f"policy_{FILE_PREFIX}_{NET_SIZE}.pth")
+# Each run keeps its replay buffer in its own directory here
+BUFFER_DIR = os.path.join("log", "rps", "dqn")
 
 
 def _get_agents(
@@ -61,7 +69,7 @@ def _get_agents(
     # agents = [agent_learn, RandomPolicy(), RandomPolicy(),
     # RandomPolicy(), RandomPolicy(),RandomPolicy()]
     agents = [agent_learn] * 1 + [RandomPolicy()] * 5
-    policy = MultiAgentPolicyManager(agents, env)
+    policy = SharedPolicyManager(agents, env)
     return policy, optim, env.agents
 
 
@@ -71,9 +79,14 @@ def _get_env():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train a DQN agent to play Clue")
+    profiling.add_arguments(parser, f"train_{FILE_PREFIX}.prof")
+    args = parser.parse_args()
 
     # ======== Step 1: Environment setup =========
-    train_envs = SubprocVectorEnv([_get_env for _ in range(10)])
+    # The profiler only sees the envs that step in this process
+    vector_env = DummyVectorEnv if args.profile_steps else SubprocVectorEnv
+    train_envs = vector_env([_get_env for _ in range(10)])
     test_envs = SubprocVectorEnv([_get_env for _ in range(10)])
 
     # seed
@@ -86,52 +99,61 @@ if __name__ == "__main__":
     # ======== Step 2: Agent setup =========
     policy, optim, agents = _get_agents()
 
-    # ======== Step 3: Collector setup =========
-    train_collector = Collector(
-        policy,
-        train_envs,
-        VectorReplayBuffer(40_000, len(train_envs)),
-        exploration_noise=True,
-    )
-    test_collector = Collector(policy, test_envs, exploration_noise=True)
-    # policy.set_eps(1)
-    train_collector.collect(n_step=64 * 10)  # batch size * training_num
-
-    # ======== Step 4: Callback functions setup =========
-    def save_best_fn(policy):
-        os.makedirs(os.path.join("log", "rps", "dqn"), exist_ok=True)
-        torch.save(policy.policies[agents[0]].state_dict(), MODEL_PATH)
-
-    def stop_fn(mean_rewards):
-        return mean_rewards >= 100
-
-    def train_fn(epoch, env_step):
-        policy.policies[agents[0]].set_eps(0.2)  # exploit vs explore
-
-    def test_fn(epoch, env_step):
-        policy.policies[agents[0]].set_eps(0.05)
-
-    def reward_metric(rews):
-        return rews[:, 0]
-
-    # ======== Step 5: Run the trainer =========
-    result = offpolicy_trainer(
-        policy=policy,
-        train_collector=train_collector,
-        test_collector=test_collector,
-        max_epoch=500,
-        step_per_epoch=5000,
-        step_per_collect=500,
-        episode_per_test=10,
-        batch_size=64,
-        train_fn=train_fn,
-        test_fn=test_fn,
-        stop_fn=stop_fn,
-        save_best_fn=save_best_fn,
-        update_per_step=1,
-        test_in_train=False,
-        reward_metric=reward_metric,
-    )
+    os.makedirs(BUFFER_DIR, exist_ok=True)
+    buffer_path = tempfile.mkdtemp(prefix=f"buffer_{FILE_PREFIX}_", dir=BUFFER_DIR)
+    try:
+        # ======== Step 3: Collector setup =========
+        train_collector = Collector(
+            policy,
+            train_envs,
+            MemmapVectorReplayBuffer(40_000, len(train_envs), buffer_path),
+            exploration_noise=True,
+        )
+        test_collector = Collector(policy, test_envs, exploration_noise=True)
+        profile = profiling.profile_collector(train_collector, args)
+        # policy.set_eps(1)
+        train_collector.collect(n_step=64 * 10)  # batch size * training_num
+
+        # ======== Step 4: Callback functions setup =========
+        def save_best_fn(policy):
+            os.makedirs(os.path.join("log", "rps", "dqn"), exist_ok=True)
+            torch.save(policy.policies[agents[0]].state_dict(), MODEL_PATH)
+
+        def stop_fn(mean_rewards):
+            return mean_rewards >= 100
+
+        def train_fn(epoch, env_step):
+            policy.policies[agents[0]].set_eps(0.2)  # exploit vs explore
+
+        def test_fn(epoch, env_step):
+            policy.policies[agents[0]].set_eps(0.05)
+
+        def reward_metric(rews):
+            return rews[:, 0]
+
+        # ======== Step 5: Run the trainer =========
+        result = offpolicy_trainer(
+            policy=policy,
+            train_collector=train_collector,
+            test_collector=test_collector,
+            max_epoch=500,
+            step_per_epoch=5000,
+            step_per_collect=500,
+            episode_per_test=10,
+            batch_size=64,
+            train_fn=train_fn,
+            test_fn=test_fn,
+            stop_fn=stop_fn,
+            save_best_fn=save_best_fn,
+            update_per_step=1,
+            test_in_train=False,
+            reward_metric=reward_metric,
+        )
+
+        if profile is not None:
+            profile.finish()
+    finally:
+        shutil.rmtree(buffer_path, ignore_errors=True)
 
     # return result, policy.policies[agents[1]]
     print(f"\n==========Result==========\n{result}")
@@ -0,0 +1,455 @@
+"""
+League training: a DQN learner against a pool of its own past selves.
+
+    python -m clue.train_league --actors 4 --updates 200000
+
+train_agents_v2.py trains against five RandomPolicy seats, which a learner
+soon stops learning anything from. Here the learner plays Miss Scarlet, player
+0, as it does there, and for every game each of the other seats draws an
+opponent from the pool: the --opponents bots to begin with, then also the
+snapshots the learner is frozen into every --snapshot-every updates. A seat
+takes the newest snapshot with probability --latest, or else any of the pool.
+
+Actor processes play the games, --lockstep of them each. Every seat with the
+same policy chooses its actions for all the games at once (see
+clue.policies), so the learner's network and each snapshot's are evaluated
+once a step whatever the number of games and seats they play in. The
+learner's transitions - from one of its turns to the next - go to the
+learner, this process, which adds them to its replay buffer and updates as
+fast as it can. The actors never wait on it: they pick up the learner's
+weights whenever they are published, every --publish-every updates, and
+transitions that don't fit in the queue while the learner is behind are
+dropped and counted.
+
+The weights are files in --out: latest.pth for the actors, a
+pool/snapshot_<updates>.pth for each snapshot and, at the end,
+policy_clue_v2_league_<net size>.pth. Each is the state dict of a DQNPolicy,
+as train_agents_v2.py saves, so any can be used as a checkpoint:PATH policy.
+"""
+import argparse
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterator, List, Sequence, cast
+
+import numpy as np
+
+from clue.datagen import NUM_ACTIONS, OBS_SIZE
+from clue.env.clue_environment_v2 import ClueEnvironment
+from clue.evaluate import Game, GameResult, play_seated
+from clue.policies import (
+    CheckpointPolicy,
+    EpsilonGreedyPolicy,
+    RandomPolicy,
+    SeatPolicy,
+    make_policy,
+)
+from clue.state import CardState
+
+LEARNER = 0
+LEARNER_AGENT = "player_0"
+
+
+@dataclass
+class ActorConfig:
+    actor: int
+    seed: np.random.SeedSequence
+    opponents: Sequence[str]
+    hidden_sizes: Sequence[int]
+    lockstep: int = 16
+    max_steps: int = 500
+    epsilon: float = 0.2
+    latest: float = 0.5
+    send_every: int = 256
+
+
+class Transitions:
+    """The learner's transitions an actor has yet to send, column by column"""
+
+    FIELDS = ("lane", "obs", "mask", "act", "rew", "terminated", "truncated")
+
+    def __init__(self) -> None:
+        self.columns: Dict[str, List] = {field: [] for field in self.FIELDS}
+        self.obs_next: List[np.ndarray] = []
+        self.mask_next: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self.columns["act"])
+
+    def add(
+        self,
+        lane: int,
+        turn: Dict[str, Any],
+        reward: float,
+        obs_next: np.ndarray,
+        mask_next: np.ndarray,
+        terminated: bool = False,
+        truncated: bool = False,
+    ) -> None:
+        for field, value in (
+            ("lane", lane),
+            ("obs", turn["obs"]),
+            ("mask", turn["mask"]),
+            ("act", turn["act"]),
+            ("rew", reward),
+            ("terminated", terminated),
+            ("truncated", truncated),
+        ):
+            self.columns[field].append(value)
+        self.obs_next.append(obs_next)
+        self.mask_next.append(mask_next)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "lane": np.array(self.columns["lane"], dtype=np.int32),
+            "obs": np.array(self.columns["obs"], dtype=np.float16),
+            "mask": np.array(self.columns["mask"], dtype=bool),
+            "act": np.array(self.columns["act"], dtype=np.int64),
+            "rew": np.array(self.columns["rew"], dtype=np.float32),
+            "terminated": np.array(self.columns["terminated"], dtype=bool),
+            "truncated": np.array(self.columns["truncated"], dtype=bool),
+            "obs_next": np.array(self.obs_next, dtype=np.float16),
+            "mask_next": np.array(self.mask_next, dtype=bool),
+        }
+
+
+def run_actor(config: ActorConfig, commands: Any, results: Any, stop: Any) -> None:
+    """Play games until stop is set, taking ("weights", path) and
+    ("pool", spec) commands and putting ("transitions", arrays) and
+    ("episode", won, steps, dropped) results"""
+    # Each actor has its own core, or a share of one
+    import torch
+
+    torch.set_num_threads(1)
+    # Exit without waiting for the learner to read everything that was put
+    results.cancel_join_thread()
+
+    rng = np.random.default_rng(config.seed)
+    learner: SeatPolicy = RandomPolicy(rng)
+    pool: List[SeatPolicy] = [make_policy(spec, rng) for spec in config.opponents]
+    snapshots: List[SeatPolicy] = []
+    transitions = Transitions()
+    dropped = 0
+
+    def load(path: str) -> SeatPolicy:
+        return CheckpointPolicy(path, OBS_SIZE, config.hidden_sizes)
+
+    def draw_seats() -> List[SeatPolicy]:
+        seats = [learner]
+        for _ in range(CardState.MAX_PLAYERS - 1):
+            if snapshots and rng.random() < config.latest:
+                seats.append(snapshots[-1])
+            else:
+                seats.append(pool[rng.integers(len(pool))])
+        return seats
+
+    def take_commands() -> None:
+        nonlocal learner
+        while True:
+            try:
+                command, argument = commands.get_nowait()
+            except queue.Empty:
+                return
+            if command == "weights":
+                learner = EpsilonGreedyPolicy(load(argument), config.epsilon, rng)
+            elif command == "pool":
+                snapshot = load(argument)
+                snapshots.append(snapshot)
+                pool.append(snapshot)
+
+    def games() -> Iterator[Game]:
+        for game in itertools.count():
+            # Games in progress carry on with the weights they started with
+            take_commands()
+            result = GameResult(game, LEARNER, -1, 0, 0, 0, False)
+            yield result, config.seed.spawn(1)[0], draw_seats()
+
+    # Each env's replay buffer lane
+    lanes: Dict[int, int] = {}
+    # The learner's last turn in each game, with what it has got since
+    turns: Dict[int, Dict[str, Any]] = {}
+
+    def send() -> None:
+        nonlocal transitions, dropped
+        try:
+            results.put_nowait(("transitions", transitions.arrays()))
+        except queue.Full:
+            dropped += len(transitions)
+        transitions = Transitions()
+
+    def on_step(
+        env: ClueEnvironment,
+        result: GameResult,
+        player: int,
+        obs: np.ndarray,
+        mask: np.ndarray,
+        action: int,
+        done: bool,
+    ) -> None:
+        lane = lanes.setdefault(id(env), config.actor * config.lockstep + len(lanes))
+        turn = turns.get(result.game)
+        if player == LEARNER:
+            if turn is not None:
+                transitions.add(lane, turn, turn["rew"], obs, mask)
+            turn = {"obs": obs, "mask": mask, "act": action, "rew": 0.0}
+            turns[result.game] = turn
+        if turn is not None:
+            turn["rew"] += env.rewards[LEARNER_AGENT]
+        if done and turn is not None:
+            del turns[result.game]
+            final = cast(dict, env.observe(LEARNER_AGENT))["observation"]
+            transitions.add(
+                lane,
+                turn,
+                turn["rew"],
+                final,
+                # Nothing is legal once it's over, the mask only matters to the
+                # value of a truncated game
+                np.ones(NUM_ACTIONS, dtype=bool),
+                terminated=env.clue.game_over,
+                truncated=result.truncated,
+            )
+        if len(transitions) >= config.send_every:
+            send()
+
+    for result in play_seated(games(), config.lockstep, config.max_steps, on_step):
+        try:
+            results.put_nowait(
+                ("episode", result.winner == LEARNER, result.steps, dropped)
+            )
+            dropped = 0
+        except queue.Full:
+            pass
+        if stop.is_set():
+            break
+
+
+def save_weights(policy: Any, path: str) -> None:
+    """Write the policy's state dict so a reader never sees half a file"""
+    import torch
+
+    torch.save(policy.state_dict(), path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+def train(
+    out_dir: str,
+    actors: int = 2,
+    updates: int = 100_000,
+    opponents: Sequence[str] = ("random", "heuristic"),
+    net_size: int = 128,
+    lockstep: int = 16,
+    buffer_size: int = 200_000,
+    batch_size: int = 64,
+    warmup: int = 2_000,
+    publish_every: int = 500,
+    snapshot_every: int = 10_000,
+    latest: float = 0.5,
+    epsilon: float = 0.2,
+    max_steps: int = 500,
+    lr: float = 1e-4,
+    seed: int = 0,
+    report_every: int = 1_000,
+    send_every: int = 256,
+) -> Dict:
+    """Run the league until the learner has made updates updates, returning
+    what happened"""
+    import torch
+    from tianshou.data import Batch, VectorReplayBuffer
+    from tianshou.policy import DQNPolicy
+    from tianshou.utils.net.common import Net
+
+    pool_dir = os.path.join(out_dir, "pool")
+    os.makedirs(pool_dir, exist_ok=True)
+    hidden_sizes = [net_size] * 4
+
+    torch.manual_seed(seed)
+    net = Net(state_shape=OBS_SIZE, action_shape=NUM_ACTIONS, hidden_sizes=hidden_sizes)
+    policy = DQNPolicy(
+        model=net,
+        optim=torch.optim.Adam(net.parameters(), lr=lr),
+        discount_factor=0.9,
+        estimation_step=3,
+        target_update_freq=320,
+    )
+    buffer = VectorReplayBuffer(buffer_size, actors * lockstep)
+
+    context = mp.get_context()
+    results = context.Queue(maxsize=64)
+    stop = context.Event()
+    commands = [context.Queue() for _ in range(actors)]
+    processes = [
+        context.Process(
+            target=run_actor,
+            args=(
+                ActorConfig(
+                    actor=actor,
+                    seed=actor_seed,
+                    opponents=opponents,
+                    hidden_sizes=hidden_sizes,
+                    lockstep=lockstep,
+                    max_steps=max_steps,
+                    epsilon=epsilon,
+                    latest=latest,
+                    send_every=send_every,
+                ),
+                commands[actor],
+                results,
+                stop,
+            ),
+            daemon=True,
+        )
+        for actor, actor_seed in enumerate(np.random.SeedSequence(seed).spawn(actors))
+    ]
+    for process in processes:
+        process.start()
+
+    def broadcast(command: str, path: str) -> None:
+        for actor_commands in commands:
+            actor_commands.put((command, path))
+
+    stats: Dict[str, Any] = {
+        "updates": 0,
+        "transitions": 0,
+        "dropped": 0,
+        "episodes": 0,
+        "wins": 0,
+        "pool": list(opponents),
+    }
+    recent: Deque[bool] = deque(maxlen=200)
+    latest_path = os.path.join(out_dir, "latest.pth")
+    start = time.perf_counter()
+    try:
+        while stats["updates"] < updates:
+            received = 0
+            # Take what's waiting, but never so much that updates stall
+            while received < 4 * actors:
+                try:
+                    message = results.get_nowait()
+                except queue.Empty:
+                    break
+                received += 1
+                if message[0] == "episode":
+                    _, won, _, dropped = message
+                    stats["episodes"] += 1
+                    stats["wins"] += won
+                    stats["dropped"] += dropped
+                    recent.append(won)
+                    continue
+                arrays = message[1]
+                stats["transitions"] += len(arrays["act"])
+                for row in range(len(arrays["act"])):
+                    buffer.add(
+                        Batch(
+                            obs=Batch(
+                                obs=arrays["obs"][row : row + 1],
+                                mask=arrays["mask"][row : row + 1],
+                            ),
+                            act=arrays["act"][row : row + 1],
+                            rew=arrays["rew"][row : row + 1],
+                            terminated=arrays["terminated"][row : row + 1],
+                            truncated=arrays["truncated"][row : row + 1],
+                            obs_next=Batch(
+                                obs=arrays["obs_next"][row : row + 1],
+                                mask=arrays["mask_next"][row : row + 1],
+                            ),
+                        ),
+                        buffer_ids=arrays["lane"][row : row + 1],
+                    )
+
+            if len(buffer) < warmup:
+                if not received:
+                    if not all(process.is_alive() for process in processes):
+                        raise RuntimeError("An actor died")
+                    time.sleep(0.01)
+                continue
+
+            policy.train()
+            policy.update(batch_size, buffer)
+            stats["updates"] += 1
+            done = stats["updates"]
+            if done % publish_every == 0:
+                save_weights(policy, latest_path)
+                broadcast("weights", latest_path)
+            if done % snapshot_every == 0:
+                path = os.path.join(pool_dir, f"snapshot_{done:08d}.pth")
+                save_weights(policy, path)
+                broadcast("pool", path)
+                stats["pool"].append(f"checkpoint:{path}")
+            if report_every and done % report_every == 0:
+                elapsed = time.perf_counter() - start
+                win_rate = np.mean(recent) if recent else 0.0
+                print(
+                    f"{done} updates ({done / elapsed:.0f}/s), "
+                    f"{stats['transitions']:,} transitions, "
+                    f"{stats['dropped']:,} dropped, {stats['episodes']} games, "
+                    f"win rate {win_rate:.1%} over the last {len(recent)}, "
+                    f"pool of {len(stats['pool'])}"
+                )
+    finally:
+        stop.set()
+        for process in processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+
+    model_path = os.path.join(out_dir, f"policy_clue_v2_league_{net_size}.pth")
+    save_weights(policy, model_path)
+    stats["model"] = model_path
+    stats["elapsed"] = time.perf_counter() - start
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train a DQN learner in a league")
+    parser.add_argument("--out", default=os.path.join("log", "league"))
+    parser.add_argument("--actors", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--updates", type=int, default=100_000)
+    parser.add_argument(
+        "--opponents",
+        default="random,heuristic",
+        help="comma separated policies the pool starts with",
+    )
+    parser.add_argument("--net-size", type=int, default=128)
+    parser.add_argument("--lockstep", type=int, default=16)
+    parser.add_argument("--buffer-size", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--warmup", type=int, default=2_000)
+    parser.add_argument("--publish-every", type=int, default=500)
+    parser.add_argument("--snapshot-every", type=int, default=10_000)
+    parser.add_argument("--latest", type=float, default=0.5)
+    parser.add_argument("--epsilon", type=float, default=0.2)
+    parser.add_argument("--max-steps", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stats = train(
+        args.out,
+        actors=args.actors,
+        updates=args.updates,
+        opponents=args.opponents.split(","),
+        net_size=args.net_size,
+        lockstep=args.lockstep,
+        buffer_size=args.buffer_size,
+        batch_size=args.batch_size,
+        warmup=args.warmup,
+        publish_every=args.publish_every,
+        snapshot_every=args.snapshot_every,
+        latest=args.latest,
+        epsilon=args.epsilon,
+        max_steps=args.max_steps,
+        seed=args.seed,
+    )
+    print(
+        f"{stats['updates']} updates in {stats['elapsed']:.0f}s from "
+        f"{stats['transitions']:,} transitions of {stats['episodes']} games, "
+        f"the learner won {stats['wins']}. Saved {stats['model']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
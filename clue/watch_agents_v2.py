@@ -1,4 +1,5 @@
 # type: ignore
+import argparse
 import os
 from functools import partial
 from typing import Tuple
@@ -8,10 +9,13 @@ import torch
 from tianshou.data import Collector
 from tianshou.env import DummyVectorEnv
 from tianshou.env.pettingzoo_env import PettingZooEnv
-from tianshou.policy import BasePolicy, DQNPolicy, MultiAgentPolicyManager, RandomPolicy
+from tianshou.policy import BasePolicy, DQNPolicy, RandomPolicy
 from tianshou.utils.net.common import Net
 
+from clue import profiling
 from clue.env import clue_environment_v2
+from clue.shared_policy import SharedPolicyManager
+from clue.trace import show_trace
 
 FILE_PREFIX = "clue_v2"
 NET_SIZE = 128
@@ -54,20 +58,37 @@ def _get_agents() -> Tuple[BasePolicy, torch.optim.Optimizer, list]:
     # RandomPolicy(), RandomPolicy(),RandomPolicy()]
     agents = [agent_learn] * 1 + [RandomPolicy()] * 5
     # agents =  [RandomPolicy()] * 6
-    policy = MultiAgentPolicyManager(agents, env)
+    policy = SharedPolicyManager(agents, env)
     return policy, optim, env.agents
 
 
-if __name__ == "__main__":
+def watch_policies(args=None) -> None:
     env = DummyVectorEnv([partial(_get_env, render_mode="human")])
     policy, optim, agents = _get_agents()
     policy.eval()
     print(policy.policies)
     policy.policies["player_0"].set_eps(0.05)
     collector = Collector(policy, env, exploration_noise=False)
+    profile = profiling.profile_collector(collector, args) if args else None
     result = collector.collect(n_episode=1, render=0.0001)
+    if profile is not None:
+        profile.finish()
     rews, lens = result["rews"], result["lens"]
     print(f"Final reward: {rews[:, 0].mean()}, length: {lens.mean()}")
 
     print(rews)
     print(lens)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch the trained agent play")
+    parser.add_argument(
+        "--trace", help="show the game saved in this trace file instead"
+    )
+    parser.add_argument("--game", type=int, default=0)
+    profiling.add_arguments(parser, f"watch_{FILE_PREFIX}.prof")
+    args = parser.parse_args()
+    if args.trace:
+        show_trace(args.trace, args.game)
+    else:
+        watch_policies(args)
@@ -0,0 +1,105 @@
+"""
+Zobrist keys for hashing games, and what each player knows of them, e.g. for
+transposition tables and to count the duplicate observations in a replay
+buffer.
+
+A game's hash is the XOR of a random 64 bit key for every fact about it: each
+player's square, each card each player has seen, each entry of the suggestion
+history and so on. Changing one fact is one XOR, so CardState keeps its hashes
+up to date as it is played (see CardState.state_hash() and
+CardState.information_hash()).
+
+The suggestion history is a window of the last 50 suggestions that shifts
+down with each new one, which would change the key of every entry. Instead an
+entry's key is rotated by its age: pushing a suggestion rotates the whole hash
+by one bit, XORs in the new entry and XORs out the one that falls off the end.
+
+The keys come from a fixed seed, so hashes are the same in every process.
+"""
+from typing import List
+
+import numpy as np
+
+from clue.cards import DECK
+
+MAX_PLAYERS = 6
+SUGGESTION_COLUMNS = len(DECK) + 3 * MAX_PLAYERS
+HISTORY_LENGTH = 50
+
+SEED = 20240214
+BITS = 64
+MASK = (1 << BITS) - 1
+
+
+def keys(shape: tuple, stream: int) -> np.ndarray:
+    """Random uint64 keys, a different stream for each kind of fact"""
+    rng = np.random.default_rng([SEED, stream])
+    return rng.integers(0, 1 << BITS, size=shape, dtype=np.uint64)
+
+
+# Which cards each player has seen in each player's hand
+KNOWLEDGE_KEYS = keys((MAX_PLAYERS, MAX_PLAYERS, len(DECK)), 1)
+# The columns of an entry in the suggestion history
+SUGGESTION_KEYS = keys((SUGGESTION_COLUMNS,), 2)
+ACTIVE_PLAYER_KEYS: List[int] = keys((MAX_PLAYERS,), 3).tolist()
+FALSE_ACCUSER_KEYS: List[int] = keys((MAX_PLAYERS,), 4).tolist()
+# Whose turn it is, and what they have to do
+CURRENT_PLAYER_KEYS: List[int] = keys((MAX_PLAYERS,), 5).tolist()
+STEP_KIND_KEYS: List[int] = keys((4,), 6).tolist()
+DIE_ROLL_KEYS: List[int] = keys((7,), 7).tolist()
+GAME_OVER_KEY = int(keys((1,), 8)[0])
+# Whose information set it is
+OBSERVER_KEYS: List[int] = keys((MAX_PLAYERS,), 9).tolist()
+
+
+def position_keys(num_players: int, num_positions: int) -> List[List[int]]:
+    """The key of each player on each square of a board"""
+    position: List[List[int]] = keys((num_players, num_positions), 10).tolist()
+    return position
+
+
+def xor(values: np.ndarray) -> int:
+    return int(np.bitwise_xor.reduce(values, axis=None))
+
+
+def rotate(key: int, shift: int) -> int:
+    """key rotated left by shift bits"""
+    shift %= BITS
+    return ((key << shift) | (key >> (BITS - shift))) & MASK
+
+
+def knowledge_hashes(player_card_knowledge: np.ndarray) -> List[int]:
+    """The hash of the cards each player has seen"""
+    seen = np.where(player_card_knowledge != 0, KNOWLEDGE_KEYS, np.uint64(0))
+    hashes: List[int] = np.bitwise_xor.reduce(seen, axis=(1, 2)).tolist()
+    return hashes
+
+
+def suggestion_key(entry: np.ndarray) -> int:
+    """The key of one entry of the suggestion history. An empty entry is 0."""
+    return xor(SUGGESTION_KEYS[entry != 0])
+
+
+def history_hash(suggestions: np.ndarray) -> int:
+    """The hash of a whole suggestion history, most recent first"""
+    entries = np.where(suggestions != 0, SUGGESTION_KEYS, np.uint64(0))
+    history = 0
+    for age, key in enumerate(np.bitwise_xor.reduce(entries, axis=1).tolist()):
+        history ^= rotate(key, age)
+    return history
+
+
+def push_suggestion(history: int, entry: np.ndarray, oldest: np.ndarray) -> int:
+    """The history hash after entry is pushed on and oldest, the last entry of
+    the window, falls off"""
+    history ^= rotate(suggestion_key(oldest), HISTORY_LENGTH - 1)
+    return rotate(history, 1) ^ suggestion_key(entry)
+
+
+def duplicate_counts(hashes: np.ndarray) -> np.ndarray:
+    """For each hash, how many times it appears in hashes, e.g. for the
+    information hashes in a replay buffer (counts > 1).mean() is the fraction
+    of transitions whose observation was seen more than once"""
+    _, inverse, counts = np.unique(hashes, return_inverse=True, return_counts=True)
+    duplicates: np.ndarray = counts[inverse.reshape(-1)]
+    return duplicates
@@ -0,0 +1,182 @@
+from typing import Any, Callable, List, Tuple, Type
+
+import numpy as np
+import pytest
+from tianshou.data import Collector, VectorReplayBuffer
+from tianshou.env import BaseVectorEnv, DummyVectorEnv, SubprocVectorEnv
+from tianshou.env.pettingzoo_env import PettingZooEnv
+from tianshou.policy import MultiAgentPolicyManager
+
+from clue.agents import heuristic
+from clue.agents.heuristic import (
+    AGENTS,
+    DeductionAccuser,
+    InformationSeeker,
+    KnowledgeGreedy,
+    RoomSweep,
+    ScriptedBasePolicy,
+)
+from clue.env.clue_environment_v2 import ClueEnvironment
+from clue.policies import RandomPolicy, make_policy
+from clue.sampling import sample_weighted_deals
+from clue.state import (
+    DISPROVE_ACTION_OFFSET,
+    SUGGESTION_ACTION_OFFSET,
+    CardState,
+    StepKind,
+)
+
+
+def new_game(map_csv_location: str, seed: int) -> CardState:
+    return CardState(map_csv_location, max_players=6, log_actions=False, seed=seed)
+
+
+def random_action(random: RandomPolicy, state: CardState) -> int:
+    return int(random.act([state], np.empty((1, 0)), state.legal_actions()[None])[0])
+
+
+@pytest.mark.parametrize("name", sorted(AGENTS))
+def test_plays_legal_games(map_csv_location: str, name: str) -> None:
+    rng = np.random.default_rng(0)
+    agent = AGENTS[name](rng)
+    random = RandomPolicy(rng)
+    for seed in range(3):
+        state = new_game(map_csv_location, seed)
+        for _ in range(2000):
+            if state.game_over:
+                break
+            if state.current_player == 0:
+                action = agent(state)
+            else:
+                action = random_action(random, state)
+            assert state.legal_actions()[action]
+            state.apply_action(action)
+        assert state.game_over
+
+
+def test_batches_each_step_kind(map_csv_location: str) -> None:
+    # Games at different points, so the batch has every kind of step
+    states: List[CardState] = []
+    random = RandomPolicy(np.random.default_rng(1))
+    for seed in range(40):
+        state = new_game(map_csv_location, seed)
+        for _ in range(seed * 3):
+            state.apply_action(random_action(random, state))
+        if not state.game_over:
+            states.append(state)
+    assert {state.current_step_kind for state in states} == set(StepKind)
+
+    masks = np.array([state.legal_actions() for state in states])
+    agents = [RoomSweep(), KnowledgeGreedy(), DeductionAccuser()]
+    for agent in agents + [InformationSeeker(num_samples=64)]:
+        actions = agent.act(states, np.empty((len(states), 0)), masks)
+        assert masks[np.arange(len(states)), actions].all()
+
+
+def test_information_seeker_reuses_the_moves_gains(
+    map_csv_location: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls: List[int] = []
+
+    def sample(*args: Any) -> Tuple[np.ndarray, np.ndarray]:
+        calls.append(1)
+        return sample_weighted_deals(*args)
+
+    monkeypatch.setattr(heuristic, "sample_weighted_deals", sample)
+    state = new_game(map_csv_location, seed=2)
+    agent = InformationSeeker(np.random.default_rng(2), num_samples=64)
+    while state.current_step_kind != StepKind.SUGGESTION:
+        state.apply_action(agent(state))
+    # Sampled once for the move that reached the room, not again to suggest
+    sampled = len(calls)
+    state.apply_action(agent(state))
+    assert len(calls) == sampled
+    # Something was learnt, so the next turn samples again
+    while state.current_step_kind != StepKind.MOVE:
+        state.apply_action(agent(state))
+    state.apply_action(agent(state))
+    assert len(calls) == sampled + 1
+
+
+def test_room_sweep_visits_new_rooms(map_csv_location: str) -> None:
+    state = new_game(map_csv_location, seed=0)
+    agent = RoomSweep(np.random.default_rng(0))
+    rooms: List[int] = []
+    while len(rooms) < 4:
+        if state.current_player == 0 and state.current_step_kind == StepKind.SUGGESTION:
+            rooms.append(state.board.which_room(0))
+            # Suggests cards player 0 hasn't seen
+            person, weapon, _ = CardState.suggestion_one_hot_decode(
+                agent(state) - SUGGESTION_ACTION_OFFSET
+            )
+            seen = state.player_card_knowledge[0].any(axis=0)
+            assert not seen[person] and not seen[6 + weapon]
+        state.apply_action(agent(state))
+    assert len(set(rooms)) == len(rooms)
+
+
+def test_disproves_with_a_card_already_shown(map_csv_location: str) -> None:
+    state = new_game(map_csv_location, seed=0)
+    hand = np.flatnonzero(state.player_card_knowledge[1, 1])
+    # Player 0 suggests two of player 1's cards and was shown the second before
+    person = next(card for card in hand if card < 6)
+    weapon = next(card for card in hand if 6 <= card < 12)
+    room = 0 if state.player_card_knowledge[1, 1, 12] == 0 else 1
+    state.player_card_knowledge[0, 1, weapon] = 1
+    state.board.move_to_room(0, room)
+    state.current_step_kind = StepKind.SUGGESTION
+    state.apply_action(
+        SUGGESTION_ACTION_OFFSET
+        + int(CardState.suggestion_one_hot(person, weapon - 6, room).argmax())
+    )
+    assert state.current_step_kind == StepKind.DISPROVE_SUGGESTION
+    assert state.current_player == 1
+    for seed in range(5):
+        agent = RoomSweep(np.random.default_rng(seed))
+        assert agent.disprove([state], state.legal_actions()[None]) == [
+            DISPROVE_ACTION_OFFSET + weapon
+        ]
+
+
+def test_deduction_accuser_accuses(map_csv_location: str) -> None:
+    state = new_game(map_csv_location, seed=2)
+    for player in range(6):
+        state.player_card_knowledge[0, player] = state.player_card_knowledge[
+            player, player
+        ]
+    state.current_step_kind = StepKind.ACCUSATION
+    assert state.apply_action(DeductionAccuser()(state)) is True
+
+
+def test_make_policy() -> None:
+    assert isinstance(make_policy("sweep"), RoomSweep)
+    assert isinstance(make_policy("deduction"), DeductionAccuser)
+    assert isinstance(make_policy("information"), InformationSeeker)
+
+
+def get_env(env_index: int) -> PettingZooEnv:
+    return PettingZooEnv(ClueEnvironment(max_episode_steps=500, env_index=env_index))
+
+
+def env_fn(env_index: int) -> Callable[[], PettingZooEnv]:
+    return lambda: get_env(env_index)
+
+
+@pytest.mark.parametrize("vector_env", [DummyVectorEnv, SubprocVectorEnv])
+def test_tianshou_adapter(vector_env: Type[BaseVectorEnv]) -> None:
+    envs = vector_env([env_fn(i) for i in range(3)])
+    scripted = ScriptedBasePolicy(KnowledgeGreedy(np.random.default_rng(0)), envs)
+    manager = MultiAgentPolicyManager([scripted] * 6, get_env(0))
+    buffer = VectorReplayBuffer(2000, 3)
+    collector = Collector(manager, envs, buffer)
+
+    result = collector.collect(n_episode=4)
+    assert result["n/ep"] == 4
+    batch, _ = buffer.sample(0)
+    masks = np.asarray(batch.obs.mask)
+    assert masks[np.arange(len(batch)), batch.act].all()
+    # Only the index of the env is kept, not the game
+    assert "env_index" in batch.info.keys()
+    assert "state" not in batch.info.keys()
+    assert scripted.learn(batch) == {}
+    envs.close()
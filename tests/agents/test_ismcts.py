@@ -0,0 +1,109 @@
+from typing import List
+
+import numpy as np
+import pytest
+
+from clue.agents import ismcts
+from clue.agents.ismcts import ISMCTS, SearchConfig, candidate_actions
+from clue.state import (
+    DISPROVE_ACTION_OFFSET,
+    SUGGESTION_ACTION_OFFSET,
+    CardState,
+    StepKind,
+)
+
+
+def new_game(map_csv_location: str, seed: int) -> CardState:
+    return CardState(map_csv_location, max_players=6, log_actions=False, seed=seed)
+
+
+def test_search_leaves_the_game_alone(map_csv_location: str) -> None:
+    state = new_game(map_csv_location, seed=1)
+    knowledge = state.player_card_knowledge.copy()
+    rng_state = state.rng.bit_generator.state
+
+    result = ISMCTS(SearchConfig(iterations=30), seed=0).search(state)
+
+    assert result.iterations == 30
+    assert result.action in candidate_actions(state, max_accusations=4)
+    assert sum(result.visits.values()) == 30
+    assert result.rollouts_per_second > 0
+    assert (state.player_card_knowledge == knowledge).all()
+    assert state.board.player_positions == state.board.player_positions_initial
+    assert state.rng.bit_generator.state == rng_state
+
+
+def test_accuses_when_certain(map_csv_location: str) -> None:
+    state = new_game(map_csv_location, seed=2)
+    # Player 0 has seen everyone's cards
+    for player in range(6):
+        state.player_card_knowledge[0, player] = state.player_card_knowledge[
+            player, player
+        ]
+    state.current_step_kind = StepKind.ACCUSATION
+
+    result = ISMCTS(SearchConfig(iterations=40), seed=0).search(state)
+
+    envelope = CardState.suggestion_one_hot(
+        state.envelope.person.idx,
+        state.envelope.weapon.idx - 6,
+        state.envelope.room.idx - 12,
+    ).argmax()
+    assert result.action == envelope + SUGGESTION_ACTION_OFFSET
+    assert result.values[result.action] == 1
+
+
+def test_parallel_search(map_csv_location: str) -> None:
+    state = new_game(map_csv_location, seed=3)
+    agent = ISMCTS(SearchConfig(iterations=10, workers=2), seed=0)
+    try:
+        result = agent.search(state)
+    finally:
+        agent.close()
+
+    assert result.iterations == 20
+    assert sum(result.visits.values()) == 20
+    assert np.isin(result.action, candidate_actions(state, max_accusations=4))
+
+
+def test_credits_the_player_who_acted(
+    map_csv_location: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    nodes: List[ismcts.Node] = []
+
+    class RecordedNode(ismcts.Node):
+        __slots__ = ()
+
+        def __init__(self) -> None:
+            super().__init__()
+            nodes.append(self)
+
+    # Each player's reward is a different base 256 digit, so a node's reward
+    #  says how many times each player chose the action leading to it
+    monkeypatch.setattr(ismcts, "Node", RecordedNode)
+    monkeypatch.setattr(
+        ismcts, "evaluate", lambda state: 256.0 ** np.arange(CardState.MAX_PLAYERS)
+    )
+    state = new_game(map_csv_location, seed=4)
+    rng = np.random.default_rng(4)
+    while not (
+        state.current_player == 0 and state.current_step_kind == StepKind.SUGGESTION
+    ):
+        state.apply_action(int(rng.choice(np.flatnonzero(state.legal_actions()))))
+    ISMCTS(SearchConfig(iterations=200, max_depth=10), seed=0).search(state)
+
+    def acted(node: ismcts.Node) -> np.ndarray:
+        digits = int(node.reward) // 256 ** np.arange(CardState.MAX_PLAYERS) % 256
+        assert digits.sum() == node.visits
+        return np.asarray(digits)
+
+    # Who disproves depends on the deal, so some card is shown by different
+    #  players in different iterations
+    shown_by = [
+        acted(child)
+        for node in nodes
+        for action, child in node.children.items()
+        if action >= DISPROVE_ACTION_OFFSET
+    ]
+    assert shown_by
+    assert any((players > 0).sum() > 1 for players in shown_by)
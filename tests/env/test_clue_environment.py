@@ -2,7 +2,7 @@ from typing import cast
 
 from pettingzoo.test import api_test
 
-from clue.env import clue_environment_v1, clue_environment_v2
+from clue.env import clue_environment_v1, clue_environment_v2, clue_environment_v3
 
 
 def test_api_test_v1() -> None:
@@ -25,3 +25,14 @@ def test_api_test_v2() -> None:
         with open("test_output.txt", "w") as f:
             f.write(cast(str, env.render()))
         raise e
+
+
+def test_api_test_v3() -> None:
+    env = clue_environment_v3.ClueEnvironment(max_episode_steps=200)
+
+    try:
+        api_test(env, num_cycles=1000, verbose_progress=False)
+    except Exception as e:
+        with open("test_output.txt", "w") as f:
+            f.write(cast(str, env.render()))
+        raise e
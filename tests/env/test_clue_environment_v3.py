@@ -0,0 +1,126 @@
+from typing import List, cast
+
+import numpy as np
+from gymnasium import spaces
+
+from clue.env import clue_environment_v2
+from clue.env.clue_environment_v3 import (
+    ACCUSATION_OFFSET,
+    CARD_OFFSET,
+    NUM_ACTIONS,
+    ClueEnvironment,
+    turn_action,
+)
+from clue.state import StepKind
+
+
+def play_random_game(env: ClueEnvironment, rng: np.random.Generator) -> int:
+    steps = 0
+    while not all(env.terminations.values()) and steps < 20000:
+        observation = cast(dict, env.observe(env.agent_selection))
+        assert observation["observation"].shape == (2194,)
+        mask = observation["action_mask"]
+        space = cast(spaces.Dict, env.observation_space(env.agent_selection))
+        assert space["action_mask"].contains(mask)
+        # Accusations are rare, or the games would end in a few steps
+        legal = np.flatnonzero(mask[:ACCUSATION_OFFSET])
+        if mask[ACCUSATION_OFFSET:CARD_OFFSET].any() and rng.random() < 0.01:
+            legal = ACCUSATION_OFFSET + np.flatnonzero(
+                mask[ACCUSATION_OFFSET:CARD_OFFSET]
+            )
+        if len(legal) == 0:
+            legal = np.flatnonzero(mask)
+        env.step(int(rng.choice(legal)))
+        steps += 1
+    return steps
+
+
+def test_plays_whole_games() -> None:
+    rng = np.random.default_rng(0)
+    for auto_disprove in (False, True):
+        env = ClueEnvironment(auto_disprove=auto_disprove)
+        assert env.action_space("player_0") == spaces.Discrete(NUM_ACTIONS)
+        env.reset(seed=0)
+        play_random_game(env, rng)
+        assert env.clue.game_over
+        assert len(cast(dict, env.observe("player_0"))["action_mask"]) == NUM_ACTIONS
+
+
+def test_fewer_steps_than_v2() -> None:
+    rng = np.random.default_rng(1)
+    v2_steps: List[float] = []
+    v3_steps: List[float] = []
+    for seed in range(3):
+        v2 = clue_environment_v2.ClueEnvironment()
+        v2.reset(seed=seed)
+        steps = 0
+        while not all(v2.terminations.values()):
+            mask = cast(dict, v2.observe(v2.agent_selection))["action_mask"]
+            v2.step(int(rng.choice(np.flatnonzero(mask))))
+            steps += 1
+        v2_steps.append(steps / v2.clue.suggestion_count)
+
+        v3 = ClueEnvironment(auto_disprove=True)
+        v3.reset(seed=seed)
+        v3_steps.append(play_random_game(v3, rng) / v3.clue.suggestion_count)
+    # Per suggestion: a move, the suggestion, disproving and the accusation in
+    #  v2, and just the turn in v3 (plus the moves that don't reach a room)
+    assert np.mean(v3_steps) < np.mean(v2_steps) / 2
+
+
+def reaching_room(env: ClueEnvironment) -> int:
+    """A room the player to move gets into with this roll, or -1"""
+    for room in np.flatnonzero(env.clue.board.legal_move_towards(0)):
+        ahead = env.clue.clone()
+        ahead.apply_action(int(room))
+        if ahead.current_step_kind == StepKind.SUGGESTION:
+            return int(room)
+    return -1
+
+
+def test_disprover_steps_then_the_accusation_is_made() -> None:
+    env = ClueEnvironment(auto_disprove=False)
+    env.reset(seed=3)
+    rng = np.random.default_rng(3)
+    clue = env.clue
+    # Player 0 knows every hand but player 1's, and suggests one of their cards
+    for player in range(2, 6):
+        clue.player_card_knowledge[0, player] = clue.player_card_knowledge[
+            player, player
+        ]
+    card = int(np.flatnonzero(clue.player_card_knowledge[1, 1, :12])[0])
+    person, weapon = (card, 0) if card < 6 else (0, card - 6)
+
+    for _ in range(500):
+        if env.agent_selection == "player_0" and reaching_room(env) >= 0:
+            break
+        # The others don't accuse
+        mask = env.action_mask()
+        mask[ACCUSATION_OFFSET:CARD_OFFSET] = 0
+        env.step(int(rng.choice(np.flatnonzero(mask))))
+    env.step(turn_action(person, weapon, reaching_room(env)))
+
+    assert clue.current_step_kind == StepKind.DISPROVE_SUGGESTION
+    disprover = env.agent_selection
+    assert disprover != "player_0"
+    shown = CARD_OFFSET + int(np.flatnonzero(clue._legal_disprove())[0])
+    env.step(shown)
+    # Showing the card ends player 0's turn
+    assert clue.player_card_knowledge[0, 1, shown - CARD_OFFSET]
+    assert clue.current_step_kind == StepKind.MOVE
+    assert not clue.game_over
+
+    while env.agent_selection != "player_0":
+        mask = env.action_mask()
+        mask[ACCUSATION_OFFSET:CARD_OFFSET] = 0
+        env.step(int(rng.choice(np.flatnonzero(mask))))
+    # Player 0 accuses at the start of their next turn
+    envelope = clue.envelope
+    accusation = ACCUSATION_OFFSET + turn_action(
+        envelope.person.idx, envelope.weapon.idx - 6, envelope.room.idx - 12
+    )
+    assert env.action_mask()[accusation]
+    env.step(accusation)
+    assert clue.game_over and clue.winner == 0
+    assert env.rewards["player_0"] == 100
+    assert all(env.terminations.values())
@@ -0,0 +1,27 @@
+from typing import cast
+
+import numpy as np
+
+from clue.deduction import ENVELOPE
+from clue.env import clue_environment_v2
+from clue.state import CardState
+
+
+def play_random_game(steps: int, seed: int) -> CardState:
+    env = clue_environment_v2.ClueEnvironment(max_players=6)
+    env.reset(seed=seed)
+    rng = np.random.default_rng(seed)
+    for _ in range(steps):
+        if env.clue.game_over:
+            break
+        obs = cast(dict, env.observe(env.agent_selection))
+        mask = obs["action_mask"]
+        env.step(int(rng.choice(np.flatnonzero(mask))))
+    return env.clue
+
+
+def true_holders(state: CardState) -> np.ndarray:
+    holders = np.full(21, ENVELOPE)
+    for player in range(6):
+        holders[state.player_card_knowledge[player, player].astype(bool)] = player
+    return holders
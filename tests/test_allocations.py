@@ -0,0 +1,100 @@
+"""
+Memory budgets for the environment's hot path, per StepKind.
+
+Each observe() and step() of some seeded games runs under tracemalloc, which
+reports the peak memory a call allocated on top of what was already there
+(its transient churn) and the blocks it left allocated (the observation it
+returns, or a leak). tracemalloc can't count the allocations that were freed
+again, so the peak in bytes is what bounds the churn.
+
+When a hot path gets cheaper lower its budget here so it stays that way.
+"""
+import tracemalloc
+from typing import Callable, Dict, List, NamedTuple, Tuple, cast
+
+import numpy as np
+import pytest
+
+from clue.env.clue_environment_v2 import ClueEnvironment
+from clue.state import StepKind
+
+KIB = 1024
+
+
+class Budget(NamedTuple):
+    # An observation is 2194 float64s (17 KiB) and the mask 355 (3 KiB)
+    observe_peak_bytes: int
+    observe_blocks: int
+    step_peak_bytes: int
+    step_blocks: int
+
+
+BUDGETS = {
+    StepKind.MOVE: Budget(32 * KIB, 24, 6 * KIB, 16),
+    StepKind.SUGGESTION: Budget(32 * KIB, 12, 4 * KIB, 16),
+    StepKind.DISPROVE_SUGGESTION: Budget(32 * KIB, 12, 1 * KIB, 16),
+    StepKind.ACCUSATION: Budget(32 * KIB, 16, 8 * KIB, 16),
+}
+
+
+class Usage(NamedTuple):
+    peak_bytes: int
+    blocks: int
+
+
+def traced(function: Callable[[], object]) -> Tuple[object, Usage]:
+    tracemalloc.start()
+    try:
+        result = function()
+        _, peak = tracemalloc.get_traced_memory()
+        blocks = len(tracemalloc.take_snapshot().traces)
+    finally:
+        tracemalloc.stop()
+    return result, Usage(peak, blocks)
+
+
+def measure_games(steps: int, seed: int) -> Dict[StepKind, Dict[str, List[Usage]]]:
+    """Play random legal actions, measuring every observe() and step()"""
+    env = ClueEnvironment(max_episode_steps=200)
+    rng = np.random.default_rng(seed)
+    env.reset(seed=seed)
+    usage: Dict[StepKind, Dict[str, List[Usage]]] = {
+        kind: {"observe": [], "step": []} for kind in StepKind
+    }
+    for _ in range(steps):
+        if env.clue.game_over or any(env.truncations.values()):
+            env.reset()
+        kind = env.clue.current_step_kind
+        obs, observed = traced(lambda: env.observe(env.agent_selection))
+        action = int(rng.choice(np.flatnonzero(cast(dict, obs)["action_mask"])))
+        _, stepped = traced(lambda: env.step(action))
+        usage[kind]["observe"].append(observed)
+        usage[kind]["step"].append(stepped)
+    return usage
+
+
+@pytest.fixture(scope="module")
+def usage() -> Dict[StepKind, Dict[str, List[Usage]]]:
+    return measure_games(steps=800, seed=0)
+
+
+@pytest.mark.parametrize("kind", list(StepKind), ids=lambda kind: kind.name)
+def test_allocation_budget(
+    kind: StepKind, usage: Dict[StepKind, Dict[str, List[Usage]]]
+) -> None:
+    budget = BUDGETS[kind]
+    measured = usage[kind]
+    assert measured["step"], f"no {kind.name} steps were played"
+
+    for call, peak_budget, blocks_budget in (
+        ("observe", budget.observe_peak_bytes, budget.observe_blocks),
+        ("step", budget.step_peak_bytes, budget.step_blocks),
+    ):
+        peak = max(used.peak_bytes for used in measured[call])
+        blocks = max(used.blocks for used in measured[call])
+        assert (
+            peak <= peak_budget
+        ), f"{call} at {kind.name} peaked at {peak} bytes, over {peak_budget}"
+        assert (
+            blocks <= blocks_budget
+        ), f"{call} at {kind.name} kept {blocks} blocks, over {blocks_budget}"
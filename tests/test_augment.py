@@ -0,0 +1,107 @@
+from typing import Tuple, cast
+
+import numpy as np
+import pytest
+from tianshou.data import Batch
+
+from clue.augment import (
+    augment_batch,
+    invert,
+    permute_actions,
+    permute_masks,
+    permute_observations,
+    random_permutations,
+)
+from clue.env.clue_environment_v2 import ClueEnvironment
+from clue.policies import RandomPolicy
+
+
+def played_env(
+    seed: int, steps: int, information_gain: bool = False
+) -> ClueEnvironment:
+    env = ClueEnvironment(max_episode_steps=0, information_gain=information_gain)
+    env.seed(seed)
+    env.reset()
+    policy = RandomPolicy(np.random.default_rng(seed))
+    for _ in range(steps):
+        mask = cast(dict, env.observe(env.agent_selection))["action_mask"]
+        env.step(int(policy.act([env.clue], np.empty((1, 0)), mask[None])[0]))
+    return env
+
+
+def observe(env: ClueEnvironment) -> Tuple[np.ndarray, np.ndarray]:
+    observation = cast(dict, env.observe(env.agent_selection))
+    return observation["observation"], observation["action_mask"]
+
+
+def test_relabels_like_the_game() -> None:
+    rng = np.random.default_rng(0)
+    for seed in range(5):
+        env = played_env(seed, steps=60 + seed * 7)
+        obs, mask = observe(env)
+
+        # Relabel the people and weapons in the game itself. The rooms can't be:
+        #  the board would have to change with them.
+        perm = random_permutations(1, rng, ("people", "weapons"))
+        state = env.clue
+        state.player_card_knowledge[:, :, perm[0]] = state.player_card_knowledge.copy()
+        state.suggestions[:, perm[0]] = state.suggestions[:, :21].copy()
+        relabelled_obs, relabelled_mask = observe(env)
+
+        assert (permute_observations(obs[None], perm)[0] == relabelled_obs).all()
+        assert (permute_masks(mask[None], perm)[0] == relabelled_mask).all()
+
+
+def test_relabels_room_distances() -> None:
+    obs, _ = observe(played_env(1, steps=20))
+    perm = random_permutations(1, np.random.default_rng(1), ("rooms",))
+    rooms = perm[0, 12:] - 12
+    distances = obs[132:240].reshape(6, 18)
+    relabelled = permute_observations(obs[None], perm)[0, 132:240].reshape(6, 18)
+    assert (relabelled[:, rooms] == distances[:, :9]).all()
+    assert (relabelled[:, 9 + rooms] == distances[:, 9:]).all()
+
+
+@pytest.mark.parametrize("information_gain", [False, True])
+def test_round_trip(information_gain: bool) -> None:
+    rng = np.random.default_rng(2)
+    envs = [played_env(seed, seed * 5, information_gain) for seed in range(8)]
+    obs = np.array([observe(env)[0] for env in envs])
+    masks = np.array([observe(env)[1] for env in envs])
+    actions = np.array([rng.choice(np.flatnonzero(mask)) for mask in masks])
+
+    perms = random_permutations(len(envs), rng)
+    new_obs = permute_observations(obs, perms)
+    new_masks = permute_masks(masks, perms)
+    new_actions = permute_actions(actions, perms)
+
+    assert new_masks[np.arange(len(envs)), new_actions].all()
+    assert (new_masks.sum(axis=1) == masks.sum(axis=1)).all()
+    assert new_obs.shape[1] == (2518 if information_gain else 2194)
+    assert (np.sort(new_obs, axis=1) == np.sort(obs, axis=1)).all()
+
+    inverse = invert(perms)
+    assert (permute_observations(new_obs, inverse) == obs).all()
+    assert (permute_masks(new_masks, inverse) == masks).all()
+    assert (permute_actions(new_actions, inverse) == actions).all()
+
+
+def test_augment_batch() -> None:
+    envs = [played_env(seed, steps=30) for seed in range(4)]
+    obs = np.array([observe(env)[0] for env in envs], dtype=np.float16)
+    masks = np.array([observe(env)[1] for env in envs]).astype(bool)
+    actions = np.array([np.flatnonzero(mask)[0] for mask in masks])
+    batch = Batch(
+        obs=Batch(obs=obs.copy(), mask=masks.copy()),
+        obs_next=Batch(obs=obs.copy(), mask=masks.copy()),
+        act=actions.copy(),
+    )
+
+    augment_batch(batch, np.random.default_rng(3))
+    assert batch.obs.obs.dtype == np.float16
+    assert (batch.obs.obs == batch.obs_next.obs).all()
+    assert batch.obs.mask[np.arange(4), batch.act].all()
+    assert not (batch.obs.obs == obs).all()
+
+    with pytest.raises(ValueError):
+        permute_observations(obs[:, :100], random_permutations(4))
@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+from benchmarks.env_throughput import compare, main, run
+
+
+def test_run() -> None:
+    results = run(steps=50, seed=0, versions=["v2"])
+
+    metrics = results["metrics"]
+    assert metrics["v2.steps_per_sec"] > 0
+    assert metrics["v2.step_us"] > 0
+    assert metrics["board.build_distances_us"] > 0
+    assert results["meta"]["seed"] == 0
+    assert not results["errors"]
+
+
+def test_compare() -> None:
+    baseline = {"metrics": {"v2.steps_per_sec": 1000.0, "v2.step_us": 40.0}}
+
+    faster = {"metrics": {"v2.steps_per_sec": 1200.0, "v2.step_us": 30.0}}
+    assert compare(baseline, faster, threshold=0.1)[1] == []
+
+    slower = {"metrics": {"v2.steps_per_sec": 850.0, "v2.step_us": 42.0}}
+    assert compare(baseline, slower, threshold=0.1)[1] == ["v2.steps_per_sec"]
+    assert compare(baseline, slower, threshold=0.2)[1] == []
+
+    missing = {"metrics": {"v2.step_us": 40.0}}
+    assert compare(baseline, missing, threshold=0.1)[1] == ["v2.steps_per_sec"]
+
+
+def test_run_fails_with_a_version(
+    tmp_path: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    out = os.path.join(tmp_path, "bench.json")
+    command = ["env_throughput", "run", "--steps", "20", "--out", out]
+    monkeypatch.setattr(sys, "argv", command + ["--versions", "v0,v2"])
+    with pytest.raises(SystemExit) as exited:
+        main()
+    assert exited.value.code == 1
+    assert os.path.exists(out)
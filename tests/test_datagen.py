@@ -0,0 +1,88 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from clue.agents.heuristic import DeductionAccuser
+from clue.datagen import FIELDS, generate, load_shard
+from clue.policies import RandomPolicy, make_seats
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory: pytest.TempPathFactory) -> str:
+    out_dir = str(tmp_path_factory.mktemp("selfplay"))
+    generate(
+        out_dir,
+        num_games=3,
+        seats=["heuristic", "random", "random", "heuristic", "random", "random"],
+        shard_size=64,
+        lockstep=2,
+        max_steps=50,
+    )
+    return out_dir
+
+
+def load_all(out_dir: str) -> dict:
+    with open(os.path.join(out_dir, "index.json")) as f:
+        index = json.load(f)
+    columns: dict = {field: [] for field in FIELDS}
+    for shard in index["shards"]:
+        arrays = load_shard(out_dir, shard["name"])
+        for field, array in arrays.items():
+            assert len(array) == index["shard_size"]
+            columns[field].append(array[: shard["length"]])
+    return {
+        "index": index,
+        **{field: np.concatenate(arrays) for field, arrays in columns.items()},
+    }
+
+
+def test_transitions(dataset: str) -> None:
+    data = load_all(dataset)
+    index = data["index"]
+
+    assert len(index["shards"]) > 1
+    assert len(data["action"]) == index["transitions"] <= 3 * 50
+    assert set(data["game"]) == {0, 1, 2}
+    assert data["obs"].shape[1:] == (2194,)
+    assert data["obs"].dtype == np.float16
+    assert ((data["obs"] >= 0) & (data["obs"] <= 1)).all()
+    assert data["mask"][np.arange(len(data["action"])), data["action"]].all()
+
+    # Each player's last move in a game is marked done
+    for game in range(3):
+        in_game = data["game"] == game
+        players = set(data["player"][in_game])
+        assert data["done"][in_game].sum() == len(players)
+        assert data["done"][in_game][-1]
+
+
+def test_generate_is_reproducible(dataset: str, tmp_path: str) -> None:
+    generate(
+        str(tmp_path),
+        num_games=3,
+        seats=["heuristic", "random", "random", "heuristic", "random", "random"],
+        shard_size=64,
+        lockstep=2,
+        max_steps=50,
+    )
+    first, second = load_all(dataset), load_all(str(tmp_path))
+    for field in FIELDS:
+        assert (first[field] == second[field]).all()
+
+
+def test_make_seats() -> None:
+    seats = make_seats(["random"])
+    assert len(seats) == 6
+    assert len(set(seats)) == 1
+
+    seats = make_seats(["heuristic", "random"] * 3)
+    assert isinstance(seats[0], DeductionAccuser)
+    assert isinstance(seats[1], RandomPolicy)
+    assert seats[0] is seats[2]
+
+    with pytest.raises(ValueError):
+        make_seats(["random", "random"])
+    with pytest.raises(ValueError):
+        make_seats(["greedy"])
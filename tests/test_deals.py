@@ -0,0 +1,52 @@
+import numpy as np
+
+from clue.deals import DealPool, make_deals, round_robin
+from clue.deduction import hand_sizes
+from clue.state import CardState
+
+
+def test_deals_are_permutations() -> None:
+    deals = make_deals(np.random.default_rng(0), 5000)
+
+    assert (np.sort(deals, axis=1) == np.arange(21)).all()
+    # The envelope is one card of each kind, in order
+    assert (deals[:, -3] < 6).all()
+    assert ((deals[:, -2] >= 6) & (deals[:, -2] < 12)).all()
+    assert (deals[:, -1] >= 12).all()
+
+
+def test_deals_are_uniform() -> None:
+    deals = make_deals(np.random.default_rng(1), 90000)
+
+    rooms = np.bincount(deals[:, -1] - 12, minlength=9) / len(deals)
+    np.testing.assert_allclose(rooms, 1 / 9, atol=0.005)
+    # Every card is equally likely to be first to be dealt, bar the envelope
+    first = np.bincount(deals[:, 0], minlength=21) / len(deals)
+    np.testing.assert_allclose(first.sum(), 1)
+    np.testing.assert_allclose(first[:6], first[:6].mean(), atol=0.005)
+
+
+def test_pool_is_reproducible() -> None:
+    first, second = DealPool(size=4), DealPool(size=4)
+    rng_first, rng_second = np.random.default_rng(5), np.random.default_rng(5)
+
+    for _ in range(10):
+        assert (first.pop(rng_first) == second.pop(rng_second)).all()
+
+
+def test_round_robin() -> None:
+    seats = round_robin((0, 2, 4))
+    assert list(np.bincount(seats, minlength=6)) == hand_sizes([0, 2, 4])
+
+
+def test_new_game_deals_hands(map_csv_location: str) -> None:
+    state = CardState(map_csv_location, max_players=6, seed=0)
+    for players in ([0, 1, 2, 3, 4, 5], [0, 2, 4], [0, 1, 3, 5]):
+        state.new_game(players)
+
+        knowledge = state.player_card_knowledge
+        hands = knowledge[range(6), range(6)]
+        assert list(hands.sum(axis=1)) == hand_sizes(players)
+        assert knowledge.sum() == 18
+        envelope = [state.envelope.person, state.envelope.weapon, state.envelope.room]
+        assert not hands[:, [card.idx for card in envelope]].any()
@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+from helpers import play_random_game, true_holders
+
+from clue.deduction import (
+    ENVELOPE,
+    Contradiction,
+    Deduction,
+    DeductionTracker,
+    card_mask,
+    hand_sizes,
+    mask_to_cards,
+)
+from clue.env import clue_environment_v2
+from clue.state import CardState
+
+
+def test_hand_sizes() -> None:
+    assert hand_sizes([0, 1, 2, 3, 4, 5]) == [3] * 6
+    assert hand_sizes([0, 2, 4]) == [6, 0, 6, 0, 6, 0]
+    assert hand_sizes([0, 1, 2, 3]) == [5, 5, 4, 4, 0, 0]
+
+
+def test_own_hand_rules_out_others() -> None:
+    deduction = Deduction(0, [3] * 6)
+    deduction.add_hand(card_mask([0, 6, 12]))
+
+    knowledge = deduction.knowledge_matrix()
+    assert (knowledge[0, [0, 6, 12]] == 1).all()
+    assert (knowledge[1:, [0, 6, 12]] == -1).all()
+    # A full hand means they lack everything else
+    assert (knowledge[0, 1:6] == -1).all()
+
+
+def test_envelope_by_elimination() -> None:
+    deduction = Deduction(0, [3] * 6)
+    # Every person but Professor Plum has been seen
+    for person in range(5):
+        deduction.add_has(person % 5 + 1, person)
+
+    assert deduction.holder_of(5) == ENVELOPE
+    assert deduction.envelope_candidates()[0] == card_mask([5])
+
+
+def test_clause_resolves_after_lacks() -> None:
+    deduction = Deduction(0, [3] * 6)
+    deduction.add_clause(2, card_mask([1, 7, 13]))
+    deduction.add_lacks(2, 1)
+    assert deduction.holder_of(7) is None
+    deduction.add_lacks(2, 13)
+    assert deduction.holder_of(7) == 2
+
+
+def test_observe_suggestion() -> None:
+    deduction = Deduction(0, [3] * 6)
+    suggestion = CardState.encode_suggestion_history(
+        room_idx=2,
+        person_idx=1,
+        weapon_idx=3,
+        suggestor_idx=1,
+        cant_disprove=np.array([0, 0, 1, 1, 0, 0]),
+        can_disprove_idx=4,
+    )
+    deduction.observe_suggestion(suggestion)
+
+    cards = [1, 6 + 3, 12 + 2]
+    knowledge = deduction.knowledge_matrix()
+    assert (knowledge[2:4, cards] == -1).all()
+    assert deduction.clauses[4] == [card_mask(cards)]
+
+
+def test_contradiction() -> None:
+    deduction = Deduction(0, [3] * 6)
+    deduction.add_has(1, 4)
+    with pytest.raises(Contradiction):
+        deduction.add_has(2, 4)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_deductions_match_the_deal(seed: int) -> None:
+    state = play_random_game(steps=400, seed=seed)
+    holders = true_holders(state)
+
+    for observer in state.players:
+        deduction = Deduction.from_card_state(state, observer)
+        for holder in range(7):
+            for card in mask_to_cards(deduction.has[holder]):
+                assert holders[card] == holder
+            for card in mask_to_cards(deduction.lacks[holder]):
+                assert holders[card] != holder
+
+
+def test_incremental_matches_replay() -> None:
+    state = play_random_game(steps=300, seed=7)
+    observer = 0
+    knowledge = state.player_card_knowledge[observer]
+
+    incremental = Deduction(observer, hand_sizes(state.players))
+    incremental.add_hand(card_mask(np.flatnonzero(knowledge[observer])))
+    for row in state.suggestions[::-1]:
+        incremental.observe_suggestion(row)
+    for holder in range(6):
+        for card in np.flatnonzero(knowledge[holder]):
+            incremental.observe_card_shown(holder, int(card))
+
+    batch = Deduction.from_card_state(state, observer)
+    assert incremental.has == batch.has
+    assert incremental.lacks == batch.lacks
+
+
+def test_tracker_remembers_beyond_the_window() -> None:
+    env = clue_environment_v2.ClueEnvironment(max_players=6)
+    env.reset(seed=4)
+    state = env.clue
+    holders = true_holders(state)
+    tracker = DeductionTracker()
+    rng = np.random.default_rng(4)
+    knows_more = 0
+    while state.suggestion_count < 2 * CardState.SEQUENCE_MEMORY:
+        observer = state.current_player
+        tracked = tracker.get(state, observer)
+        rebuilt = Deduction.from_card_state(state, observer)
+        for holder in range(7):
+            # Knows everything the last 50 suggestions say, and it's all true
+            assert rebuilt.has[holder] & ~tracked.has[holder] == 0
+            assert rebuilt.lacks[holder] & ~tracked.lacks[holder] == 0
+            for card in mask_to_cards(tracked.has[holder]):
+                assert holders[card] == holder
+            for card in mask_to_cards(tracked.lacks[holder]):
+                assert holders[card] != holder
+        # Some of it is from suggestions that have left the window
+        knows_more += tracked.lacks != rebuilt.lacks
+
+        mask = state.legal_actions()
+        env.step(int(rng.choice(np.flatnonzero(mask))))
+    assert knows_more > 0
+
+    # A new game starts afresh
+    env.reset(seed=5)
+    assert tracker.get(state, 0).has == Deduction.from_card_state(state, 0).has
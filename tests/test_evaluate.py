@@ -0,0 +1,104 @@
+import os
+from typing import Dict, List
+
+import numpy as np
+import pytest
+import torch
+from tianshou.utils.net.common import Net
+
+from clue.env.clue_environment_v2 import ClueEnvironment
+from clue.evaluate import (
+    GameResult,
+    checkpoint_spec,
+    evaluate,
+    net_size,
+    play_seated,
+    summarize,
+    wilson_interval,
+)
+from clue.policies import RandomPolicy
+
+
+def test_wilson_interval() -> None:
+    low, high = wilson_interval(50, 100)
+    assert low == pytest.approx(0.4038, abs=1e-4)
+    assert high == pytest.approx(0.5962, abs=1e-4)
+    assert wilson_interval(0, 20)[0] == 0.0
+    assert 0 < wilson_interval(0, 20)[1] < 0.2
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+
+
+def test_specs() -> None:
+    assert checkpoint_spec("log/policy_clue_v2_64.pth") == (
+        "checkpoint:log/policy_clue_v2_64.pth"
+    )
+    assert checkpoint_spec("heuristic") == "heuristic"
+    assert net_size("checkpoint:log/policy_clue_v2_64.pth") == 64
+    assert net_size("heuristic") == 128
+
+
+def test_evaluate_heuristic() -> None:
+    results = evaluate("heuristic", ["random"], 6, lockstep=4, max_steps=300)
+    assert [result.game for result in results] == list(range(6))
+    assert all(result.seat == 0 for result in results)
+
+    summary = summarize(results)
+    assert summary["games"] == 6
+    assert summary["wins"] + summary["opponent_wins"] + summary["truncated"] == 6
+    # Player 0 deduces the envelope well within the limit
+    assert summary["wins"] >= 4
+    assert 0 < summary["win_rate_95"][0] < summary["win_rate"]
+    assert summary["candidate_suggestions_per_game"] > 0
+    assert summary["suggestions_per_game"] >= summary["candidate_suggestions_per_game"]
+
+    again = evaluate("heuristic", ["random"], 6, lockstep=4, max_steps=300)
+    assert [result.steps for result in again] == [result.steps for result in results]
+
+
+def test_evaluate_checkpoint(tmp_path: str) -> None:
+    net = Net(state_shape=2194, action_shape=355, hidden_sizes=[16] * 4)
+    path = os.path.join(tmp_path, "policy_clue_v2_16.pth")
+    torch.save(
+        {f"model.{name}": value for name, value in net.state_dict().items()}, path
+    )
+
+    results = evaluate(path, ["random"], 4, lockstep=4, max_steps=40, rotate_seats=True)
+    assert [result.seat for result in results] == [0, 1, 2, 3]
+    assert all(result.steps <= 40 for result in results)
+
+    with pytest.raises(ValueError):
+        evaluate(path, ["random", "random"], 1)
+
+
+def test_play_seated_hook() -> None:
+    seats = [RandomPolicy(np.random.default_rng(0))] * 6
+    seeds = np.random.SeedSequence(0).spawn(5)
+    # Only taken as there is room for them
+    games = (
+        (GameResult(game, 0, -1, 0, 0, 0, False), seed, seats)
+        for game, seed in enumerate(seeds)
+    )
+    steps: Dict[int, List[int]] = {}
+    ended: List[int] = []
+
+    def on_step(
+        env: ClueEnvironment,
+        result: GameResult,
+        player: int,
+        obs: np.ndarray,
+        mask: np.ndarray,
+        action: int,
+        done: bool,
+    ) -> None:
+        assert mask[action]
+        assert obs.shape == (2194,)
+        steps.setdefault(result.game, []).append(player)
+        if done:
+            ended.append(result.game)
+
+    results = list(play_seated(games, lockstep=2, max_steps=60, on_step=on_step))
+    assert [result.game for result in results] == ended
+    assert sorted(ended) == list(range(5))
+    for result in results:
+        assert len(steps[result.game]) == result.steps
+        assert steps[result.game][0] == 0
@@ -0,0 +1,44 @@
+from clue.events import EventKind, EventLog
+from clue.map import Board
+from clue.state import CardState
+
+
+def test_nothing_logged_when_disabled(map_csv_location: str) -> None:
+    state = CardState(map_csv_location, max_players=6, log_actions=False, seed=0)
+    state.next_move()
+    state.make_accusation(324)
+
+    assert len(state.events) == 0
+    assert state.render() == ""
+
+
+def test_render(map_csv_location: str) -> None:
+    state = CardState(map_csv_location, max_players=6, seed=0)
+    state.make_suggestion(room_idx=1, person_idx=2, weapon_idx=3)
+    state.make_accusation(324)
+
+    text = state.render()
+    assert text.startswith("New game started with 6 players: Miss Scarlet")
+    assert "Miss Scarlet suggested:Mrs White in the lounge with the Wrench" in text
+    assert "decided not to make an accusation" in text
+    # Rendering empties the log
+    assert len(state.events) == 0
+
+
+def test_events_are_rows_of_ints(map_csv_location: str) -> None:
+    log = EventLog(capacity=2)
+    for roll in range(1, 6):
+        log.append(EventKind.ROLLED, 3, roll)
+    log.message("hello")
+
+    events = list(log)
+    assert len(events) == 6
+    assert events[0] == (EventKind.ROLLED, 3, 1, -1, -1, -1, -1, -1)
+    assert log.render(Board(map_csv_location)).split("\n") == [
+        "Mr Green rolled 1",
+        "Mr Green rolled 2",
+        "Mr Green rolled 3",
+        "Mr Green rolled 4",
+        "Mr Green rolled 5",
+        "hello",
+    ]
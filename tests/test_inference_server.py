@@ -0,0 +1,150 @@
+import os
+import socket
+import threading
+from typing import Iterator, List, Tuple
+
+import numpy as np
+import pytest
+import torch
+from tianshou.utils.net.common import Net
+
+from clue.inference_server import (
+    HEADER,
+    Q_VALUES,
+    InferenceClient,
+    InferenceServer,
+    decode_rows,
+    encode_rows,
+)
+from clue.policies import CheckpointPolicy, make_policy
+
+HIDDEN_SIZES = [16] * 4
+
+
+def save_checkpoint(path: str, seed: int) -> str:
+    torch.manual_seed(seed)
+    net = Net(state_shape=2194, action_shape=355, hidden_sizes=HIDDEN_SIZES)
+    torch.save(
+        {f"model.{name}": value for name, value in net.state_dict().items()}, path
+    )
+    return path
+
+
+def observations(rows: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    obs = rng.integers(0, 5, size=(rows, 2194)) / 4
+    masks = rng.random((rows, 355)) < 0.2
+    masks[:, 0] = True
+    return obs, masks
+
+
+@pytest.fixture
+def server(tmp_path: str) -> Iterator[InferenceServer]:
+    server = InferenceServer(
+        save_checkpoint(os.path.join(tmp_path, "first.pth"), 0),
+        os.path.join(tmp_path, "s.sock"),
+        hidden_sizes=HIDDEN_SIZES,
+        max_wait_ms=50,
+        send_timeout=0.2,
+    )
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.stop()
+    thread.join()
+
+
+def test_encoding() -> None:
+    obs, masks = observations(3, 0)
+    decoded_obs, decoded_masks = decode_rows(encode_rows(obs, masks))
+    assert (decoded_obs == obs).all()
+    assert (decoded_masks == masks).all()
+
+    with pytest.raises(ValueError):
+        decode_rows(encode_rows(obs, masks)[:-1])
+    with pytest.raises(ValueError):
+        decode_rows(b"\x01")
+
+
+def test_serves_the_checkpoint(server: InferenceServer, tmp_path: str) -> None:
+    local = CheckpointPolicy(server.checkpoint, 2194, HIDDEN_SIZES)
+    client = InferenceClient(server.socket_path)
+    obs, masks = observations(8, 1)
+
+    assert (client.act(obs, masks) == local.act([], obs, masks)).all()
+    q_values = client.q_values(obs, masks)
+    assert np.isneginf(q_values[~masks]).all()
+    assert np.allclose(q_values[masks], local.q_values(obs, masks)[masks], atol=1e-5)
+
+    # New weights, without reconnecting
+    second = save_checkpoint(os.path.join(tmp_path, "second.pth"), 1)
+    client.reload(second)
+    reloaded = CheckpointPolicy(second, 2194, HIDDEN_SIZES)
+    assert (client.act(obs, masks) == reloaded.act([], obs, masks)).all()
+    assert client.stats()["reloads"] == 1
+
+    with pytest.raises(ValueError):
+        client.reload(os.path.join(tmp_path, "missing.pth"))
+    client.close()
+
+
+def test_micro_batches(server: InferenceServer) -> None:
+    obs, masks = observations(4, 2)
+    replies: List[np.ndarray] = []
+    start = threading.Barrier(4)
+
+    def worker() -> None:
+        client = InferenceClient(server.socket_path)
+        start.wait()
+        replies.append(client.act(obs, masks))
+        client.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(replies) == 4
+    assert all((reply == replies[0]).all() for reply in replies)
+    stats = InferenceClient(server.socket_path).stats()
+    assert stats["requests"] == 4 and stats["rows"] == 16
+    # Requests within max_wait of each other share a forward pass
+    assert stats["batches"] < 4
+
+
+def test_server_policy(server: InferenceServer) -> None:
+    policy = make_policy(f"server:{server.socket_path}")
+    obs, masks = observations(5, 3)
+    actions = policy.act([], obs, masks)
+    assert masks[np.arange(5), actions].all()
+
+
+def test_answers_a_malformed_request(server: InferenceServer) -> None:
+    client = InferenceClient(server.socket_path)
+    obs, masks = observations(2, 4)
+    payload = encode_rows(obs, masks)
+    with pytest.raises(ValueError):
+        client._request(Q_VALUES, payload[:-10])
+    with pytest.raises(ValueError):
+        # Says three rows, holds two
+        client._request(Q_VALUES, b"\x03" + payload[1:])
+    # Still serving
+    assert client.q_values(obs, masks).shape == (2, 355)
+    client.close()
+
+
+def test_drops_a_stalled_worker(server: InferenceServer) -> None:
+    obs, masks = observations(100, 5)
+    request = encode_rows(obs, masks)
+    stalled = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stalled.connect(server.socket_path)
+    # Asks for more than the socket holds, and never reads the replies
+    with pytest.raises(OSError):
+        for _ in range(100):
+            stalled.sendall(HEADER.pack(Q_VALUES, len(request)) + request)
+    stalled.close()
+
+    client = InferenceClient(server.socket_path)
+    assert client.q_values(obs, masks).shape == (100, 355)
+    client.close()
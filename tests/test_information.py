@@ -0,0 +1,94 @@
+from collections import defaultdict
+from typing import Dict, Tuple, cast
+
+import numpy as np
+
+from clue.deduction import ENVELOPE, Deduction
+from clue.env.clue_environment_v2 import ClueEnvironment
+from clue.information import MAX_GAIN, suggestion_gains, suggestion_gains_from_state
+from clue.sampling import sample_weighted_deals
+from clue.state import PLAYER_ORDERBY_PLAYER, CardState
+
+
+def brute_force_gain(
+    deals: np.ndarray, weights: np.ndarray, suggestor: int, cards: Tuple[int, ...]
+) -> float:
+    """I(envelope; outcome) of one suggestion, a deal at a time"""
+    joint: Dict[Tuple, float] = defaultdict(float)
+    for deal, weight in zip(deals, weights / weights.sum()):
+        envelope = tuple(np.flatnonzero(deal == ENVELOPE))
+        for player in PLAYER_ORDERBY_PLAYER[suggestor][1:]:
+            held = [slot for slot, card in enumerate(cards) if deal[card] == player]
+            if held:
+                for slot in held:
+                    joint[(player, slot, envelope)] += weight / len(held)
+                break
+        else:
+            joint[(None, None, envelope)] += weight
+
+    outcome_p: Dict[Tuple, float] = defaultdict(float)
+    envelope_p: Dict[Tuple, float] = defaultdict(float)
+    for (player, slot, envelope), p in joint.items():
+        outcome_p[(player, slot)] += p
+        envelope_p[envelope] += p
+    return sum(
+        float(p * np.log2(p / (outcome_p[(player, slot)] * envelope_p[envelope])))
+        for (player, slot, envelope), p in joint.items()
+    )
+
+
+def test_matches_brute_force(map_csv_location: str) -> None:
+    state = CardState(map_csv_location, max_players=6, log_actions=False, seed=3)
+    rng = np.random.default_rng(0)
+    for suggestor in (0, 4):
+        deduction = Deduction.from_card_state(state, suggestor)
+        deals, weights = sample_weighted_deals(deduction, 200, rng)
+        gains = suggestion_gains(deals, weights, suggestor)
+        for person, weapon, room in [(0, 0, 0), (2, 3, 4), (5, 5, 8)]:
+            expected = brute_force_gain(
+                deals, weights, suggestor, (person, 6 + weapon, 12 + room)
+            )
+            assert np.isclose(gains[person, weapon, room], expected)
+
+        # Seeing only who disproves tells you less
+        without_card = suggestion_gains(deals, weights, suggestor, sees_card=False)
+        assert (without_card <= gains + 1e-9).all()
+
+
+def test_known_cards_are_worth_nothing(map_csv_location: str) -> None:
+    state = CardState(map_csv_location, max_players=6, log_actions=False, seed=1)
+    gains = suggestion_gains_from_state(state, 0, rng=np.random.default_rng(1))
+    assert gains.shape == (6, 6, 9)
+    assert (gains >= 0).all() and (gains <= MAX_GAIN).all()
+
+    # Player 0 holds person 3, weapon 4 and room 0, so no one else can disprove
+    #  that suggestion
+    assert (state.player_card_knowledge[0, 0, [3, 10, 12]] == 1).all()
+    assert gains[3, 4, 0] == 0
+    assert gains[3, 4].max() > 0
+
+
+def test_observation_channel() -> None:
+    env = ClueEnvironment(information_gain=True)
+    env.seed(0)
+    env.reset()
+    observation = cast(dict, env.observe(env.agent_selection))["observation"]
+    assert observation.shape == (2194 + 324,)
+    assert env.flat_obs_space["player_0"]["observation"].shape == (2518,)
+    value = observation[-324:]
+    assert ((value >= 0) & (value <= 1)).all() and value.max() > 0
+
+    # The rest of the observation is unchanged
+    plain = ClueEnvironment()
+    plain.clue.restore(env.clue.snapshot())
+    unchanged = cast(dict, plain.observe(env.agent_selection))["observation"]
+    assert (unchanged == observation[:-324]).all()
+
+
+def test_reset_seed_reproduces_the_values() -> None:
+    env = ClueEnvironment(information_gain=True)
+    observations = []
+    for _ in range(2):
+        env.reset(seed=7)
+        observations.append(cast(dict, env.observe(env.agent_selection))["observation"])
+    assert (observations[0] == observations[1]).all()
@@ -0,0 +1,84 @@
+import json
+from typing import cast
+
+import numpy as np
+
+from clue.env.clue_environment_v2 import ClueEnvironment
+from clue.instrumentation import NUM_BUCKETS, PhaseTimer, Stats
+from clue.state import CardState, StepKind
+
+
+def play(env: ClueEnvironment, steps: int, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    env.reset(seed=seed)
+    for _ in range(steps):
+        if env.clue.game_over or any(env.truncations.values()):
+            env.reset()
+        obs = cast(dict, env.observe(env.agent_selection))
+        env.step(int(rng.choice(np.flatnonzero(obs["action_mask"]))))
+
+
+def test_phase_timer_histogram() -> None:
+    timer = PhaseTimer()
+    for elapsed in (0, 1, 3, 1000, 1 << 40):
+        timer.add(elapsed)
+    assert timer.count == 5
+    assert timer.max_ns == 1 << 40
+    assert timer.histogram[0] == 2
+    assert timer.histogram[1] == 1
+    assert timer.histogram[9] == 1
+    assert timer.histogram[NUM_BUCKETS - 1] == 1
+    assert timer.as_dict()["histogram_ns"] == [
+        [0, 2],
+        [2, 1],
+        [512, 1],
+        [1 << 30, 1],
+    ]
+
+
+def test_env_stats() -> None:
+    env = ClueEnvironment(max_episode_steps=100, collect_stats=True)
+    play(env, 300, seed=3)
+    stats = env.get_stats()
+
+    assert set(stats["phases"]) == {
+        "legal_actions",
+        "make_suggestion",
+        "move_towards_room",
+        "observe",
+        "step",
+    }
+    steps = sum(timer["count"] for timer in stats["phases"]["step"].values())
+    assert steps == 300
+    assert set(stats["phases"]["move_towards_room"]) == {"MOVE"}
+    assert set(stats["phases"]["make_suggestion"]) == {"SUGGESTION"}
+    step = stats["phases"]["step"]["MOVE"]
+    assert sum(count for _, count in step["histogram_ns"]) == step["count"]
+    assert step["max_us"] >= step["mean_us"] > 0
+
+    events = stats["events"]
+    assert events["suggestions"] == (
+        stats["phases"]["make_suggestion"]["SUGGESTION"]["count"]
+    )
+    assert events["truncations"] >= 2
+    assert events["games"] >= 3
+    # Plain JSON, to be logged as it is
+    json.dumps(stats)
+
+    assert env.get_stats(reset=True) == stats
+    assert env.get_stats() == {"phases": {}, "events": {}}
+
+
+def test_stats_are_off_by_default(map_csv_location: str) -> None:
+    env = ClueEnvironment(max_episode_steps=100)
+    play(env, 50, seed=3)
+    assert env.clue.stats is None
+    assert env.get_stats() == {}
+
+    state = CardState(map_csv_location, max_players=6, seed=0)
+    state.stats = Stats()
+    clone = state.clone()
+    assert clone.stats is None
+    clone.legal_actions()
+    state.legal_actions()
+    assert [kind for _, kind in state.stats.timers] == [StepKind.MOVE]
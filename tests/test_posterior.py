@@ -0,0 +1,120 @@
+from itertools import combinations
+from typing import List
+
+import numpy as np
+import pytest
+from helpers import play_random_game, true_holders
+
+from clue.deduction import (
+    ALL_CARDS,
+    CATEGORY_MASKS,
+    ENVELOPE,
+    Deduction,
+    card_mask,
+    mask_to_cards,
+    popcount,
+)
+from clue.posterior import (
+    MAX_HAND_PAIRS,
+    _count,
+    _count_by_hands,
+    _count_by_quota,
+    _inclusion_exclusion_terms,
+    _key,
+    count_consistent_deals,
+    envelope_posterior,
+)
+
+
+def brute_force_counts(deduction: Deduction) -> np.ndarray:
+    """Enumerate every deal of the unknown cards"""
+    counts = np.zeros((6, 6, 9), dtype=np.int64)
+    unknown = ALL_CARDS & ~deduction.known_cards()
+
+    def deal(holder: int, remaining: int, hands: List[int]) -> None:
+        if holder == 7:
+            envelope = deduction.has[ENVELOPE] | hands[ENVELOPE]
+            if any(popcount(envelope & category) != 1 for category in CATEGORY_MASKS):
+                return
+            person, weapon, room = mask_to_cards(envelope)
+            counts[person, weapon - 6, room - 12] += 1
+            return
+        quota = deduction.sizes[holder] - popcount(deduction.has[holder])
+        allowed = remaining & ~deduction.lacks[holder]
+        for cards in combinations(mask_to_cards(allowed), quota):
+            hand = card_mask(cards)
+            if all(hand & clause for clause in deduction.clauses[holder]):
+                deal(holder + 1, remaining & ~hand, hands + [hand])
+
+    deal(0, unknown, [])
+    return counts
+
+
+def test_counts_at_the_start_of_the_game() -> None:
+    deduction = Deduction(0, [3] * 6)
+    deduction.add_hand(card_mask([0, 6, 12]))
+
+    counts = count_consistent_deals(deduction)
+
+    # 5 * 5 * 8 envelopes, then 15 cards in five hands of three
+    assert counts.sum() == 5 * 5 * 8 * 168168000
+    assert counts[0].sum() == 0
+    assert counts[1, 1, 1] == 168168000
+
+
+@pytest.mark.parametrize("seed", [1, 4])
+def test_counts_match_brute_force(seed: int) -> None:
+    state = play_random_game(steps=150, seed=seed)
+    for observer in state.players:
+        deduction = Deduction.from_card_state(state, observer)
+        if popcount(ALL_CARDS & ~deduction.known_cards()) > 11:
+            continue
+        assert (
+            count_consistent_deals(deduction) == brute_force_counts(deduction)
+        ).all()
+
+
+@pytest.mark.parametrize("seed", [2, 5, 8])
+def test_counting_methods_agree(seed: int) -> None:
+    state = play_random_game(steps=60, seed=seed)
+    for observer in state.players:
+        deduction = Deduction.from_card_state(state, observer)
+        if popcount(ALL_CARDS & ~deduction.known_cards()) > 15:
+            continue
+        has, lacks = tuple(deduction.has), tuple(deduction.lacks)
+        clauses = tuple(
+            (player, clause)
+            for player in range(6)
+            for clause in deduction.clauses[player]
+        )
+        terms = _inclusion_exclusion_terms(lacks, clauses)
+
+        by_quota = _count_by_quota(
+            deduction.sizes, has, lacks[ENVELOPE], tuple(terms.items())
+        )
+        by_hands = _count_by_hands(deduction.sizes, has, lacks, clauses)
+        assert (by_quota == by_hands).all()
+
+
+def test_posterior_includes_the_envelope() -> None:
+    state = play_random_game(steps=200, seed=3)
+    holders = true_holders(state)
+    person, weapon, room = np.flatnonzero(holders == ENVELOPE)
+
+    for observer in state.players:
+        posterior = envelope_posterior(Deduction.from_card_state(state, observer))
+        assert posterior.sum() == pytest.approx(1)
+        assert posterior[person, weapon - 6, room - 12] > 0
+
+
+def test_posterior_estimated_when_slow_to_count() -> None:
+    state = play_random_game(steps=45, seed=7)
+    deduction = Deduction.from_card_state(state, 0)
+    assert _count(*_key(deduction), MAX_HAND_PAIRS) is None
+
+    estimate = envelope_posterior(deduction, np.random.default_rng(0))
+    counts = count_consistent_deals(deduction)
+    exact = counts / counts.sum()
+    assert estimate.sum() == pytest.approx(1)
+    assert (estimate[exact == 0] == 0).all()
+    assert np.abs(estimate - exact).sum() < 0.5
@@ -0,0 +1,77 @@
+import os
+import pstats
+from typing import List
+
+import pytest
+from tianshou.data import Collector
+from tianshou.env import DummyVectorEnv
+from tianshou.env.pettingzoo_env import PettingZooEnv
+from tianshou.policy import MultiAgentPolicyManager, RandomPolicy
+
+from clue.env import clue_environment_v2
+from clue.profiling import CATEGORIES, CollectorProfile, categorize, make_profiler
+
+
+def get_env() -> PettingZooEnv:
+    return PettingZooEnv(clue_environment_v2.env())
+
+
+def random_collector() -> Collector:
+    env = get_env()
+    policy = MultiAgentPolicyManager([RandomPolicy() for _ in range(6)], env)
+    return Collector(policy, DummyVectorEnv([get_env]))
+
+
+def test_categorize() -> None:
+    assert categorize(clue_environment_v2.__file__) == "clue"
+    assert categorize(pstats.__file__) == "other"
+    assert categorize(os.path.join("site-packages", "tianshou", "data", "x.py")) == (
+        "tianshou"
+    )
+
+
+@pytest.mark.parametrize("profiler", ["cprofile", "sampling"])
+def test_collector_window(profiler: str, tmp_path: str) -> None:
+    collector = random_collector()
+    reports: List[str] = []
+    out = os.path.join(tmp_path, "profile.out")
+    profile = CollectorProfile(
+        collector, 200, out, start_step=100, profiler=profiler, report=reports.append
+    )
+
+    collector.collect(n_step=100)
+    assert profile.started_at is None
+    collector.collect(n_step=100)
+    assert profile.started_at == 100 and not profile.done
+    collector.collect(n_step=150)
+    assert profile.done
+    # Done with, the collector is as it was
+    assert collector.collect != profile.collect
+
+    assert len(reports) == 1
+    assert reports[0].startswith(f"Profiled 250 collector steps into {out}")
+    breakdown = profile.profiler.breakdown()
+    assert list(breakdown) == CATEGORIES
+    if profiler == "cprofile":
+        assert breakdown["clue"] > 0
+        assert pstats.Stats(out).total_calls > 0
+    else:
+        with open(out) as f:
+            for line in f:
+                stack, count = line.rsplit(" ", 1)
+                assert int(count) > 0
+
+
+def test_finish_is_idempotent(tmp_path: str) -> None:
+    collector = random_collector()
+    reports: List[str] = []
+    profile = CollectorProfile(
+        collector, 10_000, os.path.join(tmp_path, "p"), report=reports.append
+    )
+    collector.collect(n_step=20)
+    profile.finish()
+    profile.finish()
+    assert len(reports) == 1
+
+    with pytest.raises(ValueError):
+        make_profiler("perf")
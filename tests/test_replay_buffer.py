@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+from tianshou.data import Batch, ReplayBuffer, VectorReplayBuffer
+
+from clue.datagen import generate, shard_path
+from clue.replay_buffer import MemmapReplayBuffer, MemmapVectorReplayBuffer, load_shards
+
+
+def transitions(rng: np.random.Generator, count: int) -> Batch:
+    """Transitions shaped like those tianshou collects from a PettingZooEnv"""
+
+    def observation() -> Batch:
+        return Batch(
+            agent_id=np.array([f"player_{i}" for i in rng.integers(6, size=count)]),
+            obs=rng.integers(0, 5, size=(count, 2194)) / 4,
+            mask=rng.random((count, 355)) < 0.1,
+        )
+
+    return Batch(
+        obs=observation(),
+        act=rng.integers(355, size=count),
+        rew=rng.integers(-1, 2, size=(count, 6)).astype(float),
+        terminated=rng.random(count) < 0.1,
+        truncated=np.zeros(count, dtype=bool),
+        obs_next=observation(),
+        info=Batch(env_id=np.arange(count)),
+    )
+
+
+def test_vector_buffer_matches_tianshou(tmp_path: str) -> None:
+    rng = np.random.default_rng(0)
+    memmap = MemmapVectorReplayBuffer(100, 2, str(tmp_path))
+    plain = VectorReplayBuffer(100, 2)
+    for _ in range(70):
+        batch = transitions(rng, 2)
+        memmap.add(batch)
+        plain.add(batch)
+
+    assert len(memmap) == len(plain) == 100
+    assert isinstance(memmap._meta.obs.obs, np.memmap)
+    assert memmap._meta.obs.obs.dtype == np.float16
+    assert os.path.exists(os.path.join(tmp_path, "obs_next.mask.npy"))
+
+    stored, expected = memmap[:], plain[:]
+    assert (stored.obs.agent_id == expected.obs.agent_id).all()
+    assert (stored.obs.obs == expected.obs.obs).all()
+    assert (stored.obs_next.mask == expected.obs_next.mask).all()
+    assert (stored.rew == expected.rew).all()
+    assert (stored.done == expected.done).all()
+    assert (memmap.prev(np.arange(100)) == plain.prev(np.arange(100))).all()
+
+    sample, indices = memmap.sample(16)
+    assert len(sample) == 16
+    assert (sample.act == plain.act[indices]).all()
+
+
+def test_single_buffer(tmp_path: str) -> None:
+    rng = np.random.default_rng(1)
+    memmap = MemmapReplayBuffer(10, str(tmp_path), dtypes={"obs.obs": "float32"})
+    plain = ReplayBuffer(10)
+    batch = transitions(rng, 12)
+    for i in range(12):
+        memmap.add(batch[i])
+        plain.add(batch[i])
+
+    assert memmap._meta.obs.obs.dtype == np.float32
+    assert (memmap[:].obs.obs == plain[:].obs.obs).all()
+    assert (memmap[:].act == plain[:].act).all()
+
+
+def test_load_datagen_shards(tmp_path: str) -> None:
+    out_dir = str(tmp_path)
+    generate(out_dir, num_games=2, seats=["random"], shard_size=64, max_steps=40)
+
+    buffers = load_shards(out_dir)
+    assert sum(len(buffer) for buffer in buffers) == 80
+    first = buffers[0]
+    # The buffer reads the shard's own files
+    assert first._meta.obs.obs.filename == os.path.realpath(
+        shard_path(out_dir, "w00_0000", "obs")
+    )
+
+    batch, indices = first.sample(8)
+    actions = np.load(shard_path(out_dir, "w00_0000", "action"))
+    assert (batch.act == actions[indices]).all()
+    assert batch.obs_next.obs.shape == (8, 2194)
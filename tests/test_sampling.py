@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from helpers import play_random_game, true_holders
+
+from clue.deduction import ENVELOPE, Deduction, card_mask, hand_sizes
+from clue.posterior import envelope_posterior
+from clue.sampling import (
+    estimate_envelope_posterior,
+    sample_deals,
+    sample_weighted_deals,
+)
+
+
+def assert_consistent(deals: np.ndarray, deduction: Deduction) -> None:
+    for holder in range(7):
+        held = deals == holder
+        assert (held.sum(axis=1) == deduction.sizes[holder]).all()
+        for card in range(21):
+            if deduction.has[holder] & (1 << card):
+                assert held[:, card].all()
+            if deduction.lacks[holder] & (1 << card):
+                assert not held[:, card].any()
+        for clause in deduction.clauses[holder]:
+            cards = [card for card in range(21) if clause & (1 << card)]
+            assert held[:, cards].any(axis=1).all()
+
+
+@pytest.mark.parametrize("steps", [0, 40, 150])
+def test_deals_are_consistent(steps: int) -> None:
+    state = play_random_game(steps=steps, seed=11)
+    for observer in state.players:
+        deduction = Deduction.from_card_state(state, observer)
+        deals = sample_deals(deduction, 500, np.random.default_rng(observer))
+
+        assert deals.shape == (500, 21)
+        assert_consistent(deals, deduction)
+
+
+def test_uniform_without_facts() -> None:
+    deduction = Deduction(0, hand_sizes(range(6)))
+    deduction.add_hand(card_mask([0, 6, 12]))
+
+    deals, weights = sample_weighted_deals(deduction, 1000, np.random.default_rng(0))
+    # Only hand sizes to respect, so every proposal is equally likely
+    np.testing.assert_allclose(weights, 1 / len(deals))
+
+
+def test_estimate_matches_exact_posterior() -> None:
+    state = play_random_game(steps=60, seed=2)
+    deduction = Deduction.from_card_state(state, 0)
+
+    deals, weights = sample_weighted_deals(deduction, 20000, np.random.default_rng(0))
+    estimate = estimate_envelope_posterior(deals, weights)
+
+    assert estimate.sum() == pytest.approx(1)
+    assert np.abs(estimate - envelope_posterior(deduction)).sum() < 0.1
+
+
+def test_load_deal() -> None:
+    state = play_random_game(steps=100, seed=5)
+    deduction = Deduction.from_card_state(state, 0)
+    deal = sample_deals(deduction, 1, np.random.default_rng(0))[0]
+    knowledge = state.player_card_knowledge[0].copy()
+
+    state.load_deal(deal)
+
+    assert (true_holders(state) == deal).all()
+    envelope = np.flatnonzero(deal == ENVELOPE)
+    assert state.envelope.person.idx == envelope[0]
+    assert state.envelope.room.idx == envelope[2]
+    # The observer's knowledge was consistent so it survives
+    assert (state.player_card_knowledge[0] == knowledge).all()
@@ -0,0 +1,79 @@
+from typing import Any, List
+
+import numpy as np
+import torch
+from tianshou.data import Batch, Collector, VectorReplayBuffer
+from tianshou.env import DummyVectorEnv
+from tianshou.env.pettingzoo_env import PettingZooEnv
+from tianshou.policy import BasePolicy, DQNPolicy, MultiAgentPolicyManager
+from tianshou.utils.net.common import Net
+
+from clue.env import clue_environment_v2
+from clue.shared_policy import SharedPolicyManager
+
+
+def get_env() -> PettingZooEnv:
+    return PettingZooEnv(clue_environment_v2.env())
+
+
+class CountingNet(Net):
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.calls: List[int] = []
+
+    def forward(self, obs: Any, *args: Any, **kwargs: Any) -> Any:
+        self.calls.append(len(obs))
+        return super().forward(obs, *args, **kwargs)
+
+
+def dqn(seed: int) -> DQNPolicy:
+    torch.manual_seed(seed)
+    net = CountingNet(state_shape=2194, action_shape=355, hidden_sizes=[16, 16])
+    policy = DQNPolicy(
+        model=net, optim=torch.optim.Adam(net.parameters()), discount_factor=0.9
+    )
+    policy.set_eps(0.0)
+    return policy
+
+
+def seats() -> List[BasePolicy]:
+    first, second = dqn(0), dqn(1)
+    return [first] * 4 + [second] * 2
+
+
+def test_same_actions_in_fewer_passes() -> None:
+    env = get_env()
+    plain_seats, shared_seats = seats(), seats()
+    plain = MultiAgentPolicyManager(plain_seats, env)
+    shared = SharedPolicyManager(shared_seats, env)
+
+    buffer = VectorReplayBuffer(400, 4)
+    Collector(plain, DummyVectorEnv([get_env] * 4), buffer).collect(n_step=200)
+    batch, _ = buffer.sample(64)
+    assert len(set(batch.obs.agent_id)) == 6
+
+    plain_seats[0].model.calls.clear()
+    expected = plain(batch).act
+    actions = shared(batch).act
+    assert (actions == expected).all()
+    # Once per policy rather than per seat
+    assert len(shared_seats[0].model.calls) == 1
+    assert len(plain_seats[0].model.calls) == 4
+    assert shared_seats[0].model.calls[0] == sum(plain_seats[0].model.calls)
+
+    noisy = shared.exploration_noise(actions.copy(), batch)
+    assert (noisy == expected).all()
+
+
+def test_collects_and_learns() -> None:
+    env = get_env()
+    shared = SharedPolicyManager(seats(), env)
+    buffer = VectorReplayBuffer(400, 2)
+    collector = Collector(shared, DummyVectorEnv([get_env] * 2), buffer)
+    result = collector.collect(n_step=100)
+    assert result["n/st"] == 100
+
+    losses = shared.update(32, buffer)
+    assert {key.split("/")[0] for key in losses} <= set(env.agents)
+    assert np.isfinite([value for value in losses.values()]).all()
+    assert isinstance(shared(buffer.sample(4)[0]).out["player_0"], Batch)
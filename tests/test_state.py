@@ -1,5 +1,8 @@
+from typing import List, cast
+
 import numpy as np
 
+from clue.env import clue_environment_v2
 from clue.state import CardState, StepKind
 
 
@@ -118,3 +121,124 @@ def test_legal_suggestion(map_csv_location: str) -> None:
             assert (
                 room_decoded == room
             ), "Can only make suggestion about the room you are in"
+
+
+def play(env: clue_environment_v2.ClueEnvironment, actions: List[int]) -> List[int]:
+    """Step through the actions, returning the die rolls along the way"""
+    rolls = []
+    for action in actions:
+        env.step(action)
+        rolls.append(env.clue.current_die_roll)
+    return rolls
+
+
+def random_actions(
+    env: clue_environment_v2.ClueEnvironment, steps: int, seed: int
+) -> List[int]:
+    rng = np.random.default_rng(seed)
+    actions = []
+    for _ in range(steps):
+        mask = cast(dict, env.observe(env.agent_selection))["action_mask"]
+        actions.append(int(rng.choice(np.flatnonzero(mask))))
+        env.step(actions[-1])
+    return actions
+
+
+def test_snapshot_and_restore() -> None:
+    env = clue_environment_v2.ClueEnvironment(max_players=6)
+    env.reset(seed=3)
+    random_actions(env, steps=60, seed=3)
+
+    snapshot = env.clue.snapshot()
+    positions = env.clue.board.player_positions.copy()
+    knowledge = env.clue.player_card_knowledge.copy()
+    actions = random_actions(env, steps=40, seed=4)
+    after = env.clue.snapshot()
+
+    env.clue.restore(snapshot)
+    assert env.clue.board.player_positions == positions
+    assert (env.clue.player_card_knowledge == knowledge).all()
+
+    # The same actions and the same die rolls lead to the same game
+    env.agent_selection = env.possible_agents[env.clue.current_player]
+    play(env, actions)
+    assert env.clue.board.player_positions == list(after.player_positions)
+    assert (env.clue.player_card_knowledge == after.player_card_knowledge).all()
+    assert (env.clue.suggestions == after.suggestions).all()
+    assert env.clue.current_die_roll == after.current_die_roll
+
+
+def test_restore_gives_the_same_future(map_csv_location: str) -> None:
+    state = CardState(map_csv_location, max_players=6, log_actions=False, seed=8)
+    # A roll waiting to be used, as when replaying a trace
+    state.next_roll = 6
+    snapshot = state.snapshot()
+
+    rolls = [state.roll_die() for _ in range(5)]
+    games = []
+    for _ in range(3):
+        state.new_game(state.pick_players())
+        games.append((state.envelope, state.player_card_knowledge.copy()))
+
+    state.restore(snapshot)
+    assert [state.roll_die() for _ in range(5)] == rolls
+    assert rolls[0] == 6
+    for envelope, knowledge in games:
+        state.new_game(state.pick_players())
+        assert state.envelope == envelope
+        assert (state.player_card_knowledge == knowledge).all()
+
+
+def test_clone_is_independent() -> None:
+    env = clue_environment_v2.ClueEnvironment(max_players=6)
+    env.reset(seed=5)
+    random_actions(env, steps=50, seed=5)
+    original = env.clue
+    clone = original.clone()
+    positions = original.board.player_positions.copy()
+    knowledge = original.player_card_knowledge.copy()
+
+    env.clue = clone
+    random_actions(env, steps=50, seed=6)
+
+    assert original.board.player_positions == positions
+    assert (original.player_card_knowledge == knowledge).all()
+    assert (original.board.player_position_matrix.argmax(axis=1) == positions).all()
+    # The map itself is shared
+    assert clone.board.distances is original.board.distances
+
+
+def test_seeded_games_are_reproducible(map_csv_location: str) -> None:
+    first = CardState(map_csv_location, max_players=6, seed=7)
+    second = CardState(map_csv_location, max_players=6, seed=7)
+    # Games don't share a random stream, so using one doesn't disturb the other
+    other = CardState(map_csv_location, max_players=6, seed=7)
+    for _ in range(10):
+        other.next_move()
+
+    for _ in range(5):
+        assert first.envelope == second.envelope
+        assert (first.player_card_knowledge == second.player_card_knowledge).all()
+        assert [first.roll_die() for _ in range(20)] == [
+            second.roll_die() for _ in range(20)
+        ]
+        first.new_game(first.pick_players())
+        second.new_game(second.pick_players())
+
+
+def test_spawned_seeds_give_different_games(map_csv_location: str) -> None:
+    seeds = np.random.SeedSequence(3).spawn(4)
+    games = [CardState(map_csv_location, max_players=6, seed=s) for s in seeds]
+    deals = {game.player_card_knowledge.tobytes() for game in games}
+    assert len(deals) == len(games)
+
+
+def test_environment_reset_seed() -> None:
+    env = clue_environment_v2.ClueEnvironment(max_players=6)
+    env.reset(seed=11)
+    first = random_actions(env, steps=30, seed=0)
+    knowledge = env.clue.player_card_knowledge.copy()
+
+    env.reset(seed=11)
+    assert random_actions(env, steps=30, seed=0) == first
+    assert (env.clue.player_card_knowledge == knowledge).all()
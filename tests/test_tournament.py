@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from clue.tournament import (
+    INITIAL_RATING,
+    Ladder,
+    MatchGame,
+    chunks,
+    load_results,
+    run,
+    schedule,
+)
+
+
+def test_seats_alternate() -> None:
+    assert MatchGame("a", "b", 0).seats() == ["a", "b"] * 3
+    assert MatchGame("a", "b", 1).seats() == ["b", "a"] * 3
+
+
+def test_ladder() -> None:
+    ladder = Ladder(k_factor=32)
+    ladder.add(MatchGame("a", "b", 0, winner="a"))
+    assert ladder.ratings["a"] == pytest.approx(INITIAL_RATING + 16)
+    assert ladder.ratings["b"] == pytest.approx(INITIAL_RATING - 16)
+
+    ladder.add(MatchGame("a", "b", 1))
+    # A draw moves the stronger entrant down
+    assert ladder.ratings["a"] < INITIAL_RATING + 16
+    assert ladder.record == {"a": [1, 1, 0], "b": [0, 1, 1]}
+    assert ladder.table().splitlines()[1].endswith("a")
+
+
+def test_schedule() -> None:
+    pending = schedule(["c", "a", "b"], 2, {("a", "b", 0)})
+    assert [game.key for game in pending] == [
+        ("a", "b", 1),
+        ("a", "c", 0),
+        ("a", "c", 1),
+        ("b", "c", 0),
+        ("b", "c", 1),
+    ]
+    assert [len(chunk) for chunk in chunks(pending, 1)] == [1] * 5
+    assert [len(chunk) for chunk in chunks(pending, 4)] == [1, 2, 2]
+
+
+def test_run_is_incremental(tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "results.jsonl")
+    ladder = run(["heuristic", "random"], path, games_per_pair=4, max_steps=300)
+    games = load_results(path)
+    assert len(games) == 4
+    assert sum(ladder.record["heuristic"]) == 4
+    # The heuristic wins from seat 0, random almost never does
+    assert ladder.ratings["heuristic"] > ladder.ratings["random"]
+
+    # Only the games not played yet are played
+    run(["random", "heuristic"], path, games_per_pair=4)
+    assert load_results(path) == games
+    ladder = run(["heuristic", "random"], path, games_per_pair=6, max_steps=300)
+    assert load_results(path)[:4] == games
+    assert [game.round for game in load_results(path)[4:]] == [4, 5]
+    assert sum(ladder.record["random"]) == 6
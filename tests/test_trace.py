@@ -0,0 +1,93 @@
+from typing import List, Tuple
+
+import numpy as np
+import pytest
+
+from clue.state import CardState, CardStateSnapshot
+from clue.trace import (
+    GameTrace,
+    TraceRecorder,
+    load_traces,
+    replay,
+    replay_steps,
+    save_traces,
+)
+
+
+def record_game(
+    map_csv: str, seed: int, max_steps: int = 400
+) -> Tuple[GameTrace, List[CardStateSnapshot]]:
+    state = CardState(map_csv, max_players=6, seed=seed)
+    state.should_log_actions = False
+    state.new_game(state.pick_players())
+    recorder = TraceRecorder(state, hash_masks=True)
+    rng = np.random.default_rng(seed)
+    snapshots = [state.snapshot()]
+    for _ in range(max_steps):
+        if state.game_over:
+            break
+        action = int(rng.choice(np.flatnonzero(state.legal_actions())))
+        recorder.record(state, action)
+        state.apply_action(action)
+        snapshots.append(state.snapshot())
+    return recorder.finish(state), snapshots
+
+
+def assert_same_game(state: CardState, snapshot: CardStateSnapshot) -> None:
+    replayed = state.snapshot()
+    assert replayed.players == snapshot.players
+    assert replayed.envelope == snapshot.envelope
+    assert replayed.player_positions == snapshot.player_positions
+    assert (replayed.player_card_knowledge == snapshot.player_card_knowledge).all()
+    assert (replayed.suggestions == snapshot.suggestions).all()
+    assert replayed.current_player == snapshot.current_player
+    assert replayed.current_step_kind == snapshot.current_step_kind
+    assert replayed.current_die_roll == snapshot.current_die_roll
+    assert replayed.game_over == snapshot.game_over
+    assert replayed.winner == snapshot.winner
+
+
+def test_replay_every_step(map_csv_location: str) -> None:
+    trace, snapshots = record_game(map_csv_location, seed=3)
+
+    steps = 0
+    for state, snapshot in zip(replay_steps(trace, map_csv_location), snapshots):
+        assert_same_game(state, snapshot)
+        steps += 1
+    assert steps == len(snapshots) == len(trace) + 1
+
+    for step in (0, 1, len(trace) // 2, len(trace)):
+        assert_same_game(replay(trace, step, map_csv_location), snapshots[step])
+
+
+def test_save_and_load(map_csv_location: str, tmp_path: str) -> None:
+    games = [record_game(map_csv_location, seed) for seed in range(5)]
+    path = f"{tmp_path}/games.npz"
+    save_traces(path, [trace for trace, _ in games])
+
+    traces = load_traces(path)
+    assert len(traces) == 5
+    for (trace, snapshots), loaded in zip(games, traces):
+        assert (loaded.players == trace.players).all()
+        assert (loaded.actions == trace.actions).all()
+        assert_same_game(replay(loaded, map_csv=map_csv_location), snapshots[-1])
+
+
+def test_divergence_is_detected(map_csv_location: str) -> None:
+    trace, _ = record_game(map_csv_location, seed=1)
+    assert trace.mask_hashes is not None
+    trace.mask_hashes[5] ^= 1
+
+    with pytest.raises(ValueError):
+        replay(trace, map_csv=map_csv_location)
+
+
+def test_new_game_with_deal(map_csv_location: str) -> None:
+    state = CardState(map_csv_location, max_players=6, seed=0)
+    holders = state.deal_holders()
+    state.new_game([0, 1, 2, 3, 4, 5])
+    assert (state.deal_holders() != holders).any()
+
+    state.new_game([0, 1, 2, 3, 4, 5], holders=holders)
+    assert (state.deal_holders() == holders).all()
+    assert state.player_card_knowledge.sum() == 18
@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+
+from clue.policies import CheckpointPolicy
+from clue.train_league import Transitions, train
+
+
+def test_transitions() -> None:
+    transitions = Transitions()
+    turn = {"obs": np.full(4, 0.5), "mask": np.ones(3, dtype=bool), "act": 2}
+    transitions.add(
+        3, turn, -100.0, np.ones(4), np.zeros(3, dtype=bool), terminated=True
+    )
+    arrays = transitions.arrays()
+    assert len(transitions) == 1
+    assert arrays["obs"].shape == arrays["obs_next"].shape == (1, 4)
+    assert arrays["lane"][0] == 3
+    assert arrays["terminated"][0] and not arrays["truncated"][0]
+
+
+def test_league(tmp_path: str) -> None:
+    out_dir = str(tmp_path)
+    stats = train(
+        out_dir,
+        actors=1,
+        updates=40,
+        net_size=16,
+        lockstep=4,
+        batch_size=16,
+        warmup=64,
+        publish_every=10,
+        snapshot_every=20,
+        max_steps=120,
+        report_every=0,
+        send_every=32,
+    )
+    assert stats["updates"] == 40
+    assert stats["transitions"] >= 64
+    assert stats["pool"][:2] == ["random", "heuristic"]
+    assert len(stats["pool"]) == 4
+    assert sorted(os.listdir(os.path.join(out_dir, "pool"))) == [
+        "snapshot_00000020.pth",
+        "snapshot_00000040.pth",
+    ]
+    # Saved like train_agents_v2.py saves a checkpoint
+    CheckpointPolicy(stats["model"], 2194, [16] * 4)
@@ -0,0 +1,85 @@
+from typing import cast
+
+import numpy as np
+
+from clue import zobrist
+from clue.env.clue_environment_v2 import ClueEnvironment
+from clue.policies import RandomPolicy
+from clue.state import CardState
+
+
+def rehashed(state: CardState) -> CardState:
+    fresh = state.clone()
+    fresh.rehash()
+    return fresh
+
+
+def test_hashes_kept_up_to_date(map_csv_location: str) -> None:
+    random = RandomPolicy(np.random.default_rng(0))
+    for seed in range(3):
+        state = CardState(map_csv_location, max_players=6, log_actions=False, seed=seed)
+        hashes = set()
+        while not state.game_over:
+            fresh = rehashed(state)
+            assert state.state_hash() == fresh.state_hash()
+            for player_idx in range(6):
+                assert state.information_hash(player_idx) == fresh.information_hash(
+                    player_idx
+                )
+            hashes.add(state.state_hash())
+            masks = state.legal_actions()[None]
+            state.apply_action(int(random.act([state], np.empty((1, 0)), masks)[0]))
+        # Long enough for the suggestion history to roll over
+        assert state.suggestion_count > CardState.SEQUENCE_MEMORY
+        assert len(hashes) > 100
+
+
+def test_snapshots_and_clones_keep_hashes(map_csv_location: str) -> None:
+    state = CardState(map_csv_location, max_players=6, log_actions=False, seed=3)
+    random = RandomPolicy(np.random.default_rng(3))
+    for _ in range(80):
+        masks = state.legal_actions()[None]
+        state.apply_action(int(random.act([state], np.empty((1, 0)), masks)[0]))
+    snapshot = state.snapshot()
+    before = state.state_hash()
+    clone = state.clone()
+
+    for _ in range(20):
+        masks = state.legal_actions()[None]
+        state.apply_action(int(random.act([state], np.empty((1, 0)), masks)[0]))
+    assert state.state_hash() != before
+    assert clone.state_hash() == before
+    state.restore(snapshot)
+    assert state.state_hash() == before
+
+
+def test_information_hash_hides_the_others_knowledge(map_csv_location: str) -> None:
+    state = CardState(map_csv_location, max_players=6, log_actions=False, seed=4)
+    other = state.clone()
+    # Player 3 has been shown one of player 1's cards
+    card = np.flatnonzero(state.player_card_knowledge[1, 1])[0]
+    other.player_card_knowledge[3, 1, card] = 1
+    other.rehash()
+
+    assert other.state_hash() != state.state_hash()
+    assert other.information_hash(3) != state.information_hash(3)
+    for player_idx in (0, 1, 2, 4, 5):
+        assert other.information_hash(player_idx) == state.information_hash(player_idx)
+    assert state.information_hash(0) != state.information_hash(1)
+
+
+def test_duplicate_counts() -> None:
+    hashes = np.array([5, 7, 5, 9, 5], dtype=np.uint64)
+    assert zobrist.duplicate_counts(hashes).tolist() == [3, 1, 3, 1, 3]
+
+
+def test_hash_in_info() -> None:
+    env = ClueEnvironment(hash_in_info=True)
+    env.reset(seed=5)
+    rng = np.random.default_rng(5)
+    for _ in range(50):
+        _, _, _, _, info = env.last()
+        player_idx = env.agent_map[env.agent_selection]
+        assert info["information_hash"] == env.clue.information_hash(player_idx)
+        mask = cast(dict, env.observe(env.agent_selection))["action_mask"]
+        env.step(int(rng.choice(np.flatnonzero(mask))))